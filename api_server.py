@@ -0,0 +1,169 @@
+"""
+魔釣 予報 JSON API（Streamlit を介さない軽量サーバー）
+
+    python api_server.py --port 8080
+    curl 'http://127.0.0.1:8080/forecast?date=2026-10-17'
+
+取得・スコア計算・戦術は画面と同じ pipeline.run_day を使う（段階ごとのメモも画面と共有）。
+スナップショット (snapshots.py) に当日分があればその JSON をそのまま使う。
+レスポンスは日付ごとに JSON 本文・gzip 版・ETag を作り置きし、
+API_TTL 秒の間はバイト列をそのまま返す（If-None-Match なら 304）。
+
+GET /forecast?date=YYYY-MM-DD   省略時は明日
+GET /healthz
+"""
+import argparse
+import collections
+import datetime
+import gzip
+import hashlib
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+import pipeline
+import prefetch
+import snapshots
+import telemetry
+import upstream
+
+# --- 設定（環境変数で上書き可） ---
+API_TTL = float(os.environ.get("MATSURI_API_TTL", 600))
+API_CACHE_ENTRIES = int(os.environ.get("MATSURI_API_CACHE_ENTRIES", 64))
+MAX_DAYS_AHEAD = 16  # Open-Meteo の予報期間
+
+logger = logging.getLogger("matsuri.api")
+
+
+def forecast_payload(target_date):
+    """1日分の予報を JSON にできる dict で返す（画面の「予報を解析する」と同じ内容）"""
+    snap = snapshots.load(target_date)
+    if snap is not None:
+        return snap.payload
+    return pipeline.payload(pipeline.run_day(target_date, draw=False))
+
+
+Response = collections.namedtuple("Response", "body gzipped etag expires")
+
+
+class ResponseCache:
+    """日付ごとの完成済みレスポンス（LRU）。作成は single-flight で1本にまとめる"""
+
+    def __init__(self, ttl=API_TTL, entries=API_CACHE_ENTRIES, build=forecast_payload):
+        self.ttl = ttl
+        self.entries = entries
+        self.build = build
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, target_date):
+        now = time.monotonic()
+        with self._lock:
+            res = self._items.get(target_date)
+            if res is not None and res.expires > now:
+                self._items.move_to_end(target_date)
+                self.hits += 1
+                return res
+        return upstream.SINGLE_FLIGHT.do(("api", target_date), lambda: self._build(target_date))
+
+    def _build(self, target_date):
+        with telemetry.run("api_forecast", date=str(target_date)):
+            payload = self.build(target_date)
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        res = Response(body, gzip.compress(body, 6), etag, time.monotonic() + self.ttl)
+        with self._lock:
+            self._items[target_date] = res
+            self._items.move_to_end(target_date)
+            while len(self._items) > self.entries:
+                self._items.popitem(last=False)
+            self.builds += 1
+        return res
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "builds": self.builds}
+
+
+class ApiServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 8080), cache=None):
+        super().__init__(address, _Handler)
+        self.cache = cache or ResponseCache()
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "matsuri-api"
+    disable_nagle_algorithm = True  # ヘッダーと本文を別々に書くため、遅延ACK待ちを避ける
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        if parts.path == "/healthz":
+            return self._send_json(200, {"ok": True, "cache": self.server.cache.stats(),
+                                         "single_flight": upstream.SINGLE_FLIGHT.stats(),
+                                         "breakers": upstream.BREAKERS.stats()}, "no-store")
+        if parts.path != "/forecast":
+            return self._send_json(404, {"error": "not found"}, "no-store")
+
+        q = urllib.parse.parse_qs(parts.query)
+        today = datetime.date.today()
+        try:
+            target_date = datetime.date.fromisoformat(q["date"][0]) if "date" in q else today + datetime.timedelta(days=1)
+        except ValueError:
+            return self._send_json(400, {"error": "date は YYYY-MM-DD で指定してください"}, "no-store")
+        if not -1 <= (target_date - today).days <= MAX_DAYS_AHEAD:
+            return self._send_json(400, {"error": f"date は昨日から {MAX_DAYS_AHEAD} 日先までです"}, "no-store")
+
+        try:
+            res = self.server.cache.get(target_date)
+        except Exception:
+            # 内部の詳細（例外の文面・パスなど）は応答に載せず、ログにだけ残す
+            logger.exception("forecast %s の作成に失敗", target_date)
+            return self._send_json(500, {"error": "予期せぬエラーが発生しました"}, "no-store")
+
+        max_age = max(0, int(res.expires - time.monotonic()))
+        headers = {"ETag": res.etag, "Cache-Control": f"public, max-age={max_age}", "Vary": "Accept-Encoding"}
+        if self.headers.get("If-None-Match") == res.etag:
+            return self._send(304, b"", headers)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return self._send(200, res.gzipped, headers)
+        self._send(200, res.body, headers)
+
+    def _send_json(self, status, payload, cache_control):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self._send(status, body, {"Cache-Control": cache_control})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="魔釣 予報 JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    prefetch.start_default()
+    server = ApiServer((args.host, args.port))
+    print(f"serving http://{args.host}:{args.port}/forecast?date=YYYY-MM-DD")
+    server.serve_forever()
@@ -0,0 +1,113 @@
+"""
+魔釣 天文計算（日の出・月齢）
+
+日の出は NOAA の太陽位置計算式、月齢は Meeus の朔(新月)時刻の級数で求める。
+外部APIに依存せず、日付の配列に対してベクトル演算で一括計算できる。
+精度はいずれも数分以内（日の出は大気差 0.833° 込み、標高・地形は考慮しない）。
+"""
+import numpy as np
+
+SYNODIC_MONTH = 29.530588861
+JST_HOURS = 9
+_UNIX_EPOCH_JD = 2440587.5
+_J2000 = 2451545.0
+
+
+def julian_day(dates):
+    """日付(の配列)を 0時UTC のユリウス日に変換"""
+    days = np.asarray(dates, dtype="datetime64[D]").astype("int64")
+    return days + _UNIX_EPOCH_JD
+
+
+def _sun(jd):
+    # NOAA Solar Calculator の式。赤緯(deg) と均時差(分) を返す
+    t = (jd - _J2000) / 36525.0
+    l0 = np.radians((280.46646 + t * (36000.76983 + t * 0.0003032)) % 360)
+    m = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    e = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+    c = (np.sin(m) * (1.914602 - t * (0.004817 + 0.000014 * t))
+         + np.sin(2 * m) * (0.019993 - 0.000101 * t)
+         + np.sin(3 * m) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * t)
+    app_long = np.radians(np.degrees(l0) + c - 0.00569 - 0.00478 * np.sin(omega))
+    obliq0 = 23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+    obliq = np.radians(obliq0 + 0.00256 * np.cos(omega))
+    decl = np.arcsin(np.sin(obliq) * np.sin(app_long))
+    y = np.tan(obliq / 2) ** 2
+    eq_time = 4 * np.degrees(
+        y * np.sin(2 * l0) - 2 * e * np.sin(m) + 4 * e * y * np.sin(m) * np.cos(2 * l0)
+        - 0.5 * y * y * np.sin(4 * l0) - 1.25 * e * e * np.sin(2 * m)
+    )
+    return decl, eq_time
+
+
+def sunrise_minutes(dates, lat, lon, tz_hours=JST_HOURS):
+    """
+    日の出時刻を現地0時からの分（小数）で返す。白夜・極夜はNaN
+    """
+    jd0 = julian_day(dates)
+    phi = np.radians(lat)
+    utc_min = np.full(jd0.shape, 360.0 - tz_hours * 60.0)  # 初期値: 現地6時
+    # 日の出時刻の太陽位置で2回詰め直す
+    for _ in range(3):
+        decl, eq_time = _sun(jd0 + utc_min / 1440.0)
+        with np.errstate(invalid="ignore"):
+            ha = np.degrees(np.arccos(
+                np.cos(np.radians(90.833)) / (np.cos(phi) * np.cos(decl)) - np.tan(phi) * np.tan(decl)
+            ))
+        utc_min = 720.0 - 4.0 * (lon + ha) - eq_time
+    return utc_min + tz_hours * 60.0
+
+
+def sunrise_hour(dates, lat, lon, tz_hours=JST_HOURS, default=7):
+    """スコア計算用の日の出「時」（分単位で丸めてから切り捨て）"""
+    minutes = np.round(sunrise_minutes(dates, lat, lon, tz_hours))
+    return np.where(np.isfinite(minutes), minutes // 60, default).astype(int)
+
+
+def sunrise_label(minutes):
+    """分 → 'H:MM'"""
+    m = int(round(minutes))
+    return f"{m // 60}:{m % 60:02d}"
+
+
+def _new_moon_jde(k):
+    # Meeus『天文アルゴリズム』49章。k は2000年1月の朔を0とした朔望番号
+    t = k / 1236.85
+    jde = (2451550.09766 + SYNODIC_MONTH * k + 0.00015437 * t ** 2
+           - 0.000000150 * t ** 3 + 0.00000000073 * t ** 4)
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    m = np.radians(2.5534 + 29.10535670 * k - 0.0000014 * t ** 2)
+    mp = np.radians(201.5643 + 385.81693528 * k + 0.0107582 * t ** 2)
+    f = np.radians(160.7108 + 390.67050284 * k - 0.0016118 * t ** 2)
+    om = np.radians(124.7746 - 1.56375588 * k + 0.0020672 * t ** 2)
+    jde += (-0.40720 * np.sin(mp)
+            + 0.17241 * e * np.sin(m)
+            + 0.01608 * np.sin(2 * mp)
+            + 0.01039 * np.sin(2 * f)
+            + 0.00739 * e * np.sin(mp - m)
+            - 0.00514 * e * np.sin(mp + m)
+            + 0.00208 * e * e * np.sin(2 * m)
+            - 0.00111 * np.sin(mp - 2 * f)
+            - 0.00057 * np.sin(mp + 2 * f)
+            + 0.00056 * e * np.sin(2 * mp + m)
+            - 0.00042 * np.sin(3 * mp)
+            + 0.00042 * e * np.sin(m + 2 * f)
+            + 0.00038 * e * np.sin(m - 2 * f)
+            - 0.00024 * e * np.sin(2 * mp - m)
+            - 0.00017 * np.sin(om))
+    return jde - 69.0 / 86400.0  # TT → UT (ΔT ≒ 69秒)
+
+
+def moon_age(dates, hour=12, tz_hours=JST_HOURS):
+    """
+    現地 hour 時（既定は正午）時点の月齢（直前の朔からの経過日数, 小数）
+    """
+    jd = julian_day(dates) + (hour - tz_hours) / 24.0
+    k = np.floor((jd - 2451550.09766) / SYNODIC_MONTH)
+    nm = _new_moon_jde(k)
+    # 平均朔望月からの推定が前後にずれた場合を補正
+    nm = np.where(nm > jd, _new_moon_jde(k - 1), nm)
+    nxt = _new_moon_jde(k + 1)
+    nm = np.where(nxt <= jd, nxt, nm)
+    return jd - nm
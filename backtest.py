@@ -0,0 +1,253 @@
+"""
+魔釣 バックテスト（過去データで v1.9 スコアを一括計算）
+
+手元に保存した Open-Meteo 形式の時別データ（海水温・雲量・風速・雨量）を読み込み、
+期間内の全日について 5〜15時 のスコアと戦術を計算して列指向(.npz)で保存する。
+月ごとのチャンクに分けてプロセスプールで並列計算する。
+
+    python backtest.py archive/ --start 2015-01-01 --end 2024-12-31 --out backtest.npz
+    python backtest.py archive/ --labels catches.csv   # 釣果と突き合わせ
+
+archive/ には Open-Meteo の JSON（*.json / *.json.gz, "hourly" と "utc_offset_seconds" を含むもの）を置く。
+海洋API・気象API・年ごとなどファイルの分け方は自由で、項目ごとに時刻を揃えて結合する。
+単位はアプリと同じ（Open-Meteo の既定: 風速 km/h, 雨量 mm）。
+"""
+import argparse
+import calendar
+import concurrent.futures
+import datetime
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import astronomy
+import climatology
+import forecast_engine
+import hourly_series
+import spots
+import strategy_rules
+import tide_table
+
+FIELDS = ("sea_surface_temperature", "cloud_cover", "wind_speed_10m", "rain")
+
+# 時間単位で保存する列と、日単位で保存する列
+HOURLY_COLUMNS = ("score", "temp", "tdiff", "cloud", "wind", "rain", "slack",
+                  "weather_code", "wind_code", "low_temp_code")
+DAILY_COLUMNS = ("use_historical", "diff_day", "trend_code", "min_temp", "max_temp")
+
+
+# --- 過去データの読み込み ---
+def _read_json(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Archive(hourly_series.HourlySeries):
+    """項目ごとに UTC の毎時で揃えた配列。欠損は NaN"""
+
+    @classmethod
+    def load(cls, paths):
+        records = []
+        for path in paths:
+            data = _read_json(path)
+            records.extend(data if isinstance(data, list) else [data])
+        archive = cls.merge(records, FIELDS)
+        if not len(archive):
+            raise ValueError("時別データ (hourly) を含むファイルがありません")
+        return archive.fill_gaps("sea_surface_temperature", forecast_engine.SST_MAX_GAP)
+
+    @classmethod
+    def from_dir(cls, directory):
+        paths = sorted(glob.glob(os.path.join(directory, "*.json")) + glob.glob(os.path.join(directory, "*.json.gz")))
+        return cls.load(paths)
+
+    def date_range(self):
+        first = np.datetime64(int(self.start_hour), "h").astype("datetime64[D]").astype(object)
+        last = np.datetime64(int(self.start_hour) + len(self.series[FIELDS[0]]) - 1, "h").astype("datetime64[D]").astype(object)
+        return first + datetime.timedelta(days=1), last
+
+
+# --- 計算 ---
+def month_chunks(start, end):
+    """[start, end] を月ごとの (初日, 日数) に分ける"""
+    chunks = []
+    d = start
+    while d <= end:
+        last = datetime.date(d.year, d.month, calendar.monthrange(d.year, d.month)[1])
+        stop = min(last, end)
+        chunks.append((d, (stop - d).days + 1))
+        d = stop + datetime.timedelta(days=1)
+    return chunks
+
+
+def chunk_inputs(archive, first_day, n_days):
+    """1チャンク分の入力。海水温は前日0時UTCから48h、気象は当日0時JSTから24h（アプリと同じ窓）"""
+    dates = np.arange(np.datetime64(first_day, "D"), np.datetime64(first_day, "D") + n_days)
+    return forecast_engine.day_inputs(archive, dates)
+
+
+def score_chunk(first_day, n_days, temps, weather, has_full, spot):
+    """月1チャンクをスコアリング（ワーカープロセスで実行）。列名 → 配列 の dict を返す"""
+    dates = np.arange(np.datetime64(first_day, "D"), np.datetime64(first_day, "D") + n_days)
+    hours = forecast_engine.HOURS
+    mages = astronomy.moon_age(dates)
+    sun_hs = astronomy.sunrise_hour(dates, spot.lat, spot.lon)
+    month = dates.astype("datetime64[M]").astype(int) % 12 + 1
+    fallback = climatology.for_spot(spot).window(dates)
+
+    # 当該時刻と1時間前をまとめて1回で推算
+    shifted = hours - spot.tide_offset / 60.0
+    level, slack = tide_table.build_hourly(dates, np.concatenate([shifted, shifted - 1]))
+    n_hours = len(hours)
+    level, prev_level, slack = level[:, :n_hours], level[:, n_hours:], slack[:, :n_hours]
+
+    fc = forecast_engine.forecast(temps, *weather, mages, sun_hs, fallback, has_full, (level, prev_level, slack))
+    codes = strategy_rules.evaluate(hours[None, :], sun_hs[:, None], fc.score, fc.tdiff, month[:, None],
+                                    fc.temp, fc.cloud, fc.rain, fc.slack)
+
+    out = {"date": dates, "moon_age": mages, "sun_h": sun_hs}
+    out.update({name: getattr(fc, name) for name in DAILY_COLUMNS + HOURLY_COLUMNS})
+    out.update({f"strategy_{name}": np.asarray(codes[name], dtype=np.int8) for name in strategy_rules.EVALUATOR.outputs})
+    return out
+
+
+def run(archive, start, end, spot=spots.DEFAULT_SPOT, workers=None):
+    """
+    期間の全日をスコアリングし、列名 → 配列 の dict を返す。
+    日単位の列は (D,)、時間単位の列は (D, H)。workers=1 なら並列化しない
+    """
+    chunks = month_chunks(start, end)
+    jobs = [(first, n) + chunk_inputs(archive, first, n) + (spot,) for first, n in chunks]
+    if workers == 1 or len(jobs) == 1:
+        parts = [score_chunk(*job) for job in jobs]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(score_chunk, *zip(*jobs)))
+    result = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    result["hour"] = forecast_engine.HOURS
+    return result
+
+
+def save(result, path):
+    """列指向で保存（.npz は列ごとの配列、.csv は 日×時間 の縦持ち）"""
+    if path.endswith(".csv"):
+        to_frame(result).to_csv(path, index=False)
+    else:
+        np.savez_compressed(path, **result)
+
+
+def load(path):
+    with np.load(path) as data:
+        return {k: data[k] for k in data.files}
+
+
+def to_frame(result):
+    """日×時間 を1行にした DataFrame（日単位の列は各時間に複製）"""
+    n_days, n_hours = result["score"].shape
+    frame = {
+        "date": np.repeat(result["date"], n_hours),
+        "hour": np.tile(result["hour"], n_days),
+    }
+    for name, arr in result.items():
+        if name in ("date", "hour"):
+            continue
+        frame[name] = arr.reshape(-1) if arr.ndim == 2 else np.repeat(arr, n_hours)
+    return pd.DataFrame(frame)
+
+
+# --- 集計 ---
+def daily_frame(result):
+    score = result["score"]
+    return pd.DataFrame({
+        "date": pd.to_datetime(result["date"]),
+        "best": score.max(axis=1),
+        "mean": score.mean(axis=1),
+        "best_hour": result["hour"][score.argmax(axis=1)],
+        "historical": result["use_historical"],
+        "moon_age": result["moon_age"],
+    }).set_index("date")
+
+
+def _spearman(a, b):
+    # 順位相関（pandas の method="spearman" は scipy が要るため順位のピアソン相関で計算）
+    return float(a.rank().corr(b.rank()))
+
+
+def summarize(result, labels=None):
+    """年別・月別の集計と、時刻別の平均スコア。labels があれば釣果との相関も"""
+    daily = daily_frame(result)
+    out = {
+        "days": len(daily),
+        "historical_days": int(daily["historical"].sum()),
+        "by_year": daily.groupby(daily.index.year).agg(best=("best", "mean"), mean=("mean", "mean"),
+                                                       good_days=("best", lambda s: int((s >= 80).sum()))),
+        "by_month": daily.groupby(daily.index.month).agg(best=("best", "mean"), mean=("mean", "mean")),
+        "by_hour": pd.Series(result["score"].mean(axis=0), index=result["hour"], name="mean_score"),
+        "best_hour": daily["best_hour"].value_counts().sort_index(),
+    }
+    if labels is not None:
+        joined = daily.join(labels.rename("catch"), how="inner").dropna(subset=["catch"])
+        if len(joined) >= 3:
+            q = joined["best"].quantile([0.25, 0.75])
+            out["labels"] = {
+                "days": len(joined),
+                "spearman_best": _spearman(joined["best"], joined["catch"]),
+                "spearman_mean": _spearman(joined["mean"], joined["catch"]),
+                "catch_top_quartile": float(joined.loc[joined["best"] >= q[0.75], "catch"].mean()),
+                "catch_bottom_quartile": float(joined.loc[joined["best"] <= q[0.25], "catch"].mean()),
+            }
+    return out
+
+
+def read_labels(path):
+    """釣果CSV（1列目: 日付, 2列目: 数値）→ 日付インデックスの Series"""
+    df = pd.read_csv(path)
+    return pd.Series(df.iloc[:, 1].astype(float).values, index=pd.to_datetime(df.iloc[:, 0]))
+
+
+def print_summary(summary, out=sys.stdout):
+    print(f"日数: {summary['days']}  (平年値で代用: {summary['historical_days']}日)", file=out)
+    print("\n[年別] 日ベストの平均 / 日平均 / 80点以上の日数", file=out)
+    print(summary["by_year"].round(1).to_string(), file=out)
+    print("\n[月別]", file=out)
+    print(summary["by_month"].round(1).to_string(), file=out)
+    print("\n[時刻別の平均スコア]", file=out)
+    print(summary["by_hour"].round(1).to_string(), file=out)
+    print("\n[ベスト時間の分布]", file=out)
+    print(summary["best_hour"].to_string(), file=out)
+    if "labels" in summary:
+        lab = summary["labels"]
+        print(f"\n[釣果との比較] {lab['days']}日", file=out)
+        print(f"  順位相関 (日ベスト): {lab['spearman_best']:+.3f}", file=out)
+        print(f"  順位相関 (日平均):   {lab['spearman_mean']:+.3f}", file=out)
+        print(f"  釣果平均 上位25%の日: {lab['catch_top_quartile']:.2f} / 下位25%の日: {lab['catch_bottom_quartile']:.2f}", file=out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="魔釣 バックテスト")
+    parser.add_argument("archive", help="Open-Meteo 形式の JSON を置いたディレクトリ")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="既定はデータの先頭日")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="既定はデータの最終日")
+    parser.add_argument("--spot", default=spots.DEFAULT_SPOT.key, choices=list(spots.SPOTS))
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数（1で並列化なし）")
+    parser.add_argument("--out", default="backtest.npz", help=".npz または .csv")
+    parser.add_argument("--labels", help="釣果CSV（日付, 数値）")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    archive = Archive.from_dir(args.archive)
+    first, last = archive.date_range()
+    start, end = args.start or first, args.end or last
+    t1 = time.perf_counter()
+    result = run(archive, start, end, spots.get(args.spot), args.workers)
+    t2 = time.perf_counter()
+    save(result, args.out)
+    print(f"{start}〜{end} 読込 {t1 - t0:.2f}s / 計算 {t2 - t1:.2f}s → {args.out}", file=sys.stderr)
+    print_summary(summarize(result, read_labels(args.labels) if args.labels else None))
@@ -0,0 +1,122 @@
+"""
+Open-Meteo の代役（オフライン計測用のローカルHTTPサーバー）
+
+fixtures/ の記録済みJSON（海洋API・気象API）を、リクエストされた期間に合わせて
+1日単位で並べ直して返す。遅延(ms)を指定して上流の応答時間を再現できる。
+
+    python bench/open_meteo_stub.py --port 8765 --latency 150
+
+複数地点（座標のカンマ区切り）にも対応。
+/v1/marine と /v1/forecast を受け付けるので、forecast_data.MARINE_URL / WEATHER_URL を
+http://127.0.0.1:PORT/v1/marine などに向ければアプリ側はそのまま動く。
+"""
+import argparse
+import datetime
+import gzip
+import http.server
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _tile(record, fields, start, end):
+    """記録データの1日分(最後の24時間)を期間の日数ぶん並べる"""
+    days = (end - start).days + 1
+    out = {k: v for k, v in record.items() if k != "hourly"}
+    hourly = {"time": [
+        f"{start + datetime.timedelta(days=d):%Y-%m-%d}T{h:02d}:00" for d in range(days) for h in range(24)
+    ]}
+    for name in fields:
+        day = record["hourly"][name][-24:]
+        hourly[name] = day * days
+    out["hourly"] = hourly
+    return out
+
+
+class OpenMeteoStub(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.marine = _load("marine.json")
+        self.forecast = _load("forecast.json")
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="open-meteo-stub", daemon=True).start()
+        return self
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 遅延ACK待ちが計測値に乗らないように
+
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        parts = urllib.parse.urlsplit(self.path)
+        q = dict(urllib.parse.parse_qsl(parts.query))
+        try:
+            start = datetime.date.fromisoformat(q["start_date"])
+            end = datetime.date.fromisoformat(q["end_date"])
+            fields = q["hourly"].split(",")
+            if parts.path.endswith("/marine"):
+                payload = _tile(server.marine, fields, start, end)
+            elif parts.path.endswith("/forecast"):
+                payload = _tile(server.forecast, fields, start, end)
+            else:
+                return self._send(404, {"error": True, "reason": "not found"})
+            # 座標がカンマ区切りなら Open-Meteo と同じく地点ごとのリストで返す
+            n = len(q.get("latitude", "").split(","))
+            if n > 1:
+                payload = [payload] * n
+        except (KeyError, ValueError) as e:
+            return self._send(400, {"error": True, "reason": str(e)})
+        self._send(200, payload)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        gz = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gz:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if gz:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open-Meteo のオフライン代役サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答遅延[ms]")
+    args = parser.parse_args()
+    stub = OpenMeteoStub((args.host, args.port), latency=args.latency / 1000.0)
+    print(f"serving {stub.base_url}/v1/marine , {stub.base_url}/v1/forecast")
+    stub.serve_forever()
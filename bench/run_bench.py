@@ -0,0 +1,287 @@
+"""
+魔釣 ベンチマーク
+
+上流（Open-Meteo）はローカルの代役サーバーに差し替えて計測するため、ネットワーク不要。
+結果は JSON で出力し、--compare で過去の結果と比べて遅くなった項目を検出できる。
+
+    python bench/run_bench.py --out bench_main.json
+    python bench/run_bench.py --compare bench_main.json --threshold 1.25
+    python bench/run_bench.py --only fetch --latency 150
+    python bench/run_bench.py --only startup
+
+startup.* は新しいプロセスでの import 時間（コールドスタート）。meta.heavy_on_import に
+import だけで読み込まれてしまった重いライブラリが出る（空であるべき）。
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("MATSURI_TELEMETRY_LOG", "0")  # 計測ログが結果表示に混ざらないように
+
+import numpy as np
+
+import fishing_windows
+import forecast_data
+import forecast_engine
+import http_cache
+import pipeline
+import render
+import strategy_rules
+import tidal_current
+import tide_table
+import whatif
+from open_meteo_stub import OpenMeteoStub
+
+TARGET = datetime.date(2026, 10, 17)
+KAIHO_PAGE = os.path.join(ROOT, "bench", "fixtures", "kaiho_currenttide.html")  # 保存した潮流情報ページ
+
+
+def measure(fn, min_time=0.3, max_runs=2000, min_runs=5):
+    """fn() を min_time 秒以上（または max_runs 回）繰り返し、1回ごとの所要時間[秒]を返す"""
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_runs or (time.perf_counter() - start < min_time and len(times) < max_runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def summarize(times):
+    us = sorted(t * 1e6 for t in times)
+    return {
+        "runs": len(us),
+        "mean_us": round(statistics.fmean(us), 2),
+        "median_us": round(statistics.median(us), 2),
+        "p95_us": round(us[min(len(us) - 1, int(len(us) * 0.95))], 2),
+        "min_us": round(us[0], 2),
+    }
+
+
+# --- 計測対象 ---
+def sample_inputs():
+    """代役サーバーと同じ記録データから1日分の入力を作る"""
+    marine = json.load(open(os.path.join(ROOT, "bench", "fixtures", "marine.json"), encoding="utf-8"))
+    weather = json.load(open(os.path.join(ROOT, "bench", "fixtures", "forecast.json"), encoding="utf-8"))
+    return marine, weather
+
+
+def micro_benchmarks():
+    sd, wd = sample_inputs()
+    r_temps = sd["hourly"]["sea_surface_temperature"]
+    r_clouds, r_winds, r_rains = (wd["hourly"][k] for k in ("cloud_cover", "wind_speed_10m", "rain"))
+    mage = forecast_data.get_moon_age(TARGET)
+    sun_h = 6
+    fallback = forecast_data.HISTORICAL_TEMPS[TARGET.month]
+    fc = forecast_engine.forecast_day(r_temps, r_clouds, r_winds, r_rains, mage, sun_h, fallback)
+    hours = forecast_engine.HOURS
+    codes = strategy_rules.evaluate(hours, sun_h, fc.score, fc.tdiff, TARGET.month, fc.temp, fc.cloud, fc.rain, fc.slack)
+    rows = [(int(h), sun_h, int(fc.score[i]), float(fc.tdiff[i]), TARGET.month, float(fc.temp[i]),
+             float(fc.cloud[i]), float(fc.rain[i]), bool(fc.slack[i])) for i, h in enumerate(hours)]
+
+    # 1年分（365日）のバッチ入力
+    n = 365
+    temps = np.tile(forecast_engine.to_array(r_temps, 48), (n, 1))
+    weather = [np.tile(forecast_engine.to_array(v, 24), (n, 1)) for v in (r_clouds, r_winds, r_rains)]
+    dates = [TARGET + datetime.timedelta(days=i) for i in range(n)]
+    mages = [forecast_data.get_moon_age(d) for d in dates]
+
+    range_fc = forecast_engine.forecast(temps[:16], *(w[:16] for w in weather), mages[:16], [sun_h] * 16, [fallback] * 16)
+    sun_mins = [sun_h * 60.0] * 16
+
+    page = tidal_current.read_local(KAIHO_PAGE)
+    currents = tidal_current.parse_page(page)
+    minutes = fishing_windows.minute_grid()
+
+    day = pipeline.run_day(TARGET, lambda d: (sd, wd), draw=False)
+    slack_sets = whatif.sweep("slack")
+    weight_grid = whatif.grid(slack=[0, 20, 40, 60], sunrise=[0, 15, 30, 45], tide_change=[0, 30])
+    range_scenario = whatif.scenario(dates[:7], mages[:7], forecast_engine.Forecast._make(f[:7] for f in range_fc))
+
+    chart_title = iter(range(10 ** 6))
+
+    def chart():
+        # タイトルを毎回変えてキャッシュに当てない（描画 + PNG化の実費）
+        render.score_chart_png(hours.tolist(), fc.score.tolist(), fc.temp.tolist(), f"bench {next(chart_title)}")
+
+    return {
+        "get_moon_age": lambda: forecast_data.get_moon_age(TARGET),
+        "estimate_okayama_tide.11h": lambda: [forecast_engine.estimate_okayama_tide(mage, h) for h in range(5, 16)],
+        "suggest_strategy.scalar_11h": lambda: [strategy_rules.suggest_strategy(*r) for r in rows],
+        "suggest_strategy.batch_11h": lambda: strategy_rules.evaluate(hours, sun_h, fc.score, fc.tdiff, TARGET.month, fc.temp, fc.cloud, fc.rain, fc.slack),
+        "scoring.1day": lambda: forecast_engine.forecast_day(r_temps, r_clouds, r_winds, r_rains, mage, sun_h, fallback),
+        "scoring.365days": lambda: forecast_engine.forecast(temps, *weather, mages, [sun_h] * n, [fallback] * n),
+        "climatology.window_365days": lambda: forecast_data.fallback_temps(dates),
+        "scoring.365days_no_sst": lambda: forecast_engine.forecast(np.full((n, 48), np.nan), *weather, mages, [sun_h] * n, forecast_data.fallback_temps(dates)),
+        "html.hourly_table": lambda: render.table_html(render.HOURLY_HEADERS, render.hourly_rows_html(fc, codes, "")),
+        "chart.matplotlib_png": chart,
+        "chart.cached_png": lambda: render.score_chart_png(hours.tolist(), fc.score.tolist(), fc.temp.tolist(), "bench"),
+        "pipeline.rerun_1day": lambda: pipeline.run_day(TARGET, lambda d: (sd, wd)),
+        "windows.1day_5min": lambda: fishing_windows.for_day(TARGET, fc, mage),
+        "windows.16days_5min": lambda: fishing_windows.search(dates[:16], mages[:16], range_fc, sun_mins, k=5),
+        "currents.parse_page": lambda: tidal_current.parse_page(page),
+        "currents.unchanged_page": lambda: tidal_current.INGEST.update(page),
+        "currents.lookup_16days_5min": lambda: currents.hourly(dates[:16], minutes / 60.0),
+        "whatif.sweep_1day": lambda: whatif.evaluate(whatif.for_day(day), slack_sets),
+        "whatif.grid32_7days": lambda: whatif.evaluate(range_scenario, weight_grid),
+    }
+
+
+def fetch_benchmarks(stub):
+    """上流取得。cold は毎回別の日付（キャッシュに無いURL）、warm は同じURLの繰り返し"""
+    counter = iter(range(1, 10 ** 6))  # 0日目は warm 用に先に取得済み
+    url = forecast_data.weather_urls(TARGET, TARGET)[0]
+
+    def cold_one():
+        d = TARGET + datetime.timedelta(days=next(counter))
+        forecast_data.fetch_cached(forecast_data.weather_urls(d, d)[0])
+
+    def cold_pair():
+        d = TARGET + datetime.timedelta(days=next(counter))
+        forecast_data.fetch_weather_range(d, d)
+
+    def cold_spots():
+        d = TARGET + datetime.timedelta(days=next(counter))
+        forecast_data.forecast_spots(d)
+
+    forecast_data.fetch_cached(url)
+    forecast_data.fetch_weather_range(TARGET, TARGET)
+    return {
+        "make_request.cold": cold_one,
+        "make_request.warm": lambda: forecast_data.fetch_cached(url),
+        "get_weather_data.cold": cold_pair,
+        "get_weather_data.warm": lambda: forecast_data.fetch_weather_range(TARGET, TARGET),
+        "forecast_spots.cold": cold_spots,
+    }
+
+
+# 起動時に読み込まれていてはいけない（グラフ・診断を開いたときに読み込む）ライブラリ
+HEAVY_MODULES = ("matplotlib", "pandas")
+STARTUP_MODULES = {
+    "import.pipeline": "pipeline",
+    "import.api_server": "api_server",
+    "import.streamlit_app": "streamlit_app",
+}
+
+
+def _import_in_subprocess(module):
+    code = f"import sys, json; import {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=120, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def startup_benchmarks():
+    """新しいプロセスで import するまでの時間（streamlit が無い環境では streamlit_app を飛ばす）"""
+    cases = {}
+    for name, module in STARTUP_MODULES.items():
+        if module == "streamlit_app" and importlib.util.find_spec("streamlit") is None:
+            continue
+        cases[name] = lambda module=module: _import_in_subprocess(module)
+    return cases
+
+
+def heavy_on_import():
+    """import しただけで読み込まれた重いライブラリ（モジュール名 → ライブラリ名のリスト）"""
+    result = {}
+    for name in startup_benchmarks():
+        loaded = _import_in_subprocess(STARTUP_MODULES[name])
+        if loaded:
+            result[STARTUP_MODULES[name]] = loaded
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run(only=None, latency=0.05, min_time=0.3):
+    results = {}
+    stub = OpenMeteoStub(latency=latency).start()
+    forecast_data.MARINE_URL = f"{stub.base_url}/v1/marine"
+    forecast_data.WEATHER_URL = f"{stub.base_url}/v1/forecast"
+    tidal_current.SOURCE = KAIHO_PAGE
+    tide_table.load_default()  # アプリでは先読みが作る・取り込む。計測には含めない
+    forecast_data.fetch_currents(max_age=0)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        forecast_data.use_disk_cache(http_cache.DiskCache(cache_dir))
+        suites = {"micro": micro_benchmarks(), "fetch": fetch_benchmarks(stub), "startup": startup_benchmarks()}
+        for suite, cases in suites.items():
+            for name, fn in cases.items():
+                full = f"{suite}.{name}"
+                if only and not any(o in full for o in only):
+                    continue
+                # 通信・プロセス起動を伴う計測は回数を絞る
+                limit = {"fetch": 30, "startup": 10}.get(suite, 2000)
+                results[full] = summarize(measure(fn, min_time=min_time, max_runs=limit))
+        stub.shutdown()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "stub_latency_ms": latency * 1000,
+            "heavy_on_import": heavy_on_import() if not only or any("startup" in o for o in only) else None,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """中央値が threshold 倍を超えて遅くなった項目を返す"""
+    regressions = []
+    for name, cur in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        ratio = cur["median_us"] / old["median_us"] if old["median_us"] else float("inf")
+        flag = "  << 遅化" if ratio > threshold else ""
+        print(f"{name:45s} {old['median_us']:>12.1f} → {cur['median_us']:>12.1f} us  x{ratio:.2f}{flag}", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="魔釣 ベンチマーク")
+    parser.add_argument("--out", help="結果JSONの出力先（省略時は標準出力）")
+    parser.add_argument("--only", action="append", help="名前に含まれる文字列で絞り込み（複数可）")
+    parser.add_argument("--latency", type=float, default=50.0, help="代役サーバーの応答遅延[ms]")
+    parser.add_argument("--min-time", type=float, default=0.3, help="1項目あたりの最低計測時間[秒]")
+    parser.add_argument("--compare", help="比較対象の過去の結果JSON")
+    parser.add_argument("--threshold", type=float, default=1.25, help="遅化とみなす中央値の倍率")
+    args = parser.parse_args()
+
+    result = run(args.only, args.latency / 1000.0, args.min_time)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
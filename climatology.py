@@ -0,0 +1,211 @@
+"""
+魔釣 海水温の平年値（通日 × 時刻 の気候値）
+
+過去の時別海水温から 通日(1〜366) × UTC時刻(0〜23) の平均とばらつきを求め、
+0.01℃単位の int16 配列（約35KB）として保存する。np.load(mmap_mode="r") で開くので読み込みは一瞬。
+
+海洋APIから水温が取れなかった日は、月別の定数(HISTORICAL_TEMPS)を48時間並べる代わりに
+この気候値の前日・当日ぶんを使う。日内変化が残るので、時間ごとの水温差(tdiff)や前日比の判定もそのまま働く。
+
+    python climatology.py archive/ --spot shimotsui   # backtest.py と同じ形式の過去データから作成
+    python climatology.py archive/ --spot shimotsui --fetch 2022   # 海洋APIの過去データを年ごとに取得してから作成
+
+ポイントの気候値ファイルが無い場合は、そのポイントの月別平年値を月の中日で結んだ
+季節変化だけの気候値（日内変化なし）で代用する。
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+import urllib.parse
+
+import numpy as np
+
+import spots
+
+DAYS = 366
+CLIMATOLOGY_DIR = os.environ.get("MATSURI_CLIMATOLOGY_DIR", os.path.dirname(os.path.abspath(__file__)))
+RECORD = np.dtype([("mean", "<i2"), ("spread", "<u2")])  # 0.01℃単位
+SMOOTH_DAYS = 15
+
+
+def _fill_circular(values):
+    """通日方向(axis 0)の欠損を、年をまたいで前後の値から線形補間で埋める"""
+    out = values.copy()
+    idx = np.arange(DAYS)
+    for h in range(values.shape[1]):
+        ok = np.isfinite(values[:, h])
+        if not ok.any():
+            continue
+        xs, ys = idx[ok], values[ok, h]
+        out[:, h] = np.interp(idx, np.concatenate([xs - DAYS, xs, xs + DAYS]), np.tile(ys, 3))
+    return out
+
+
+def _smooth_circular(values, days):
+    """通日方向の移動平均（年をまたいで循環）"""
+    if days <= 1:
+        return values
+    kernel = np.ones(days) / days
+    pad = days // 2
+    ext = np.concatenate([values[-pad:], values, values[:pad]])
+    return np.apply_along_axis(lambda col: np.convolve(col, kernel, mode="valid"), 0, ext)[:DAYS]
+
+
+def _day_positions(days, hod=0):
+    """
+    日付(datetime64[D]) と UTC時刻 → 気候値の行位置（小数）。時刻は日の端数として連続に扱い、
+    平年は365日を366行に伸ばして補間する
+    """
+    years = days.astype("datetime64[Y]")
+    doy = (days - years.astype("datetime64[D]")).astype(np.int64) + np.asarray(hod) / 24
+    year_len = ((years + 1).astype("datetime64[D]") - years.astype("datetime64[D]")).astype(np.int64)
+    return doy * (DAYS - 1) / (year_len - 1)
+
+
+def _spread_rows(pos):
+    """行位置（小数）→ 前後2行の番号と重み（年をまたいで循環）"""
+    i0 = np.floor(pos).astype(int)
+    w = pos - i0
+    return i0 % DAYS, (i0 + 1) % DAYS, w
+
+
+class Climatology:
+    """
+    行 r・列 h は「通日 r の0時UTC を基準にした季節変化」と「UTC h時の日内変化」の和として持つ。
+    作成も参照も 通日 + 時刻/24 の連続した位置で前後の行に按分するので、日付の変わり目（0時UTC）に段差が出ない
+    """
+
+    def __init__(self, mean, spread):
+        self.mean = mean          # (366, 24) ℃
+        self.spread = spread      # (366, 24) ℃（標準偏差）
+
+    @classmethod
+    def build(cls, archive, smooth_days=SMOOTH_DAYS):
+        """backtest.Archive の海水温から作る"""
+        sst = archive.series["sea_surface_temperature"]
+        hours = archive.start_hour + np.arange(len(sst))
+        days = (hours // 24).astype("datetime64[D]")
+        hod = hours % 24
+
+        ok = np.isfinite(sst)
+        r0, r1, w = _spread_rows(_day_positions(days[ok], hod[ok]))
+        hod, sst = hod[ok], sst[ok]
+        count = np.zeros((DAYS, 24))
+        total = np.zeros((DAYS, 24))
+        square = np.zeros((DAYS, 24))
+        for row, weight in ((r0, 1 - w), (r1, w)):
+            np.add.at(count, (row, hod), weight)
+            np.add.at(total, (row, hod), weight * sst)
+            np.add.at(square, (row, hod), weight * sst ** 2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            spread = np.sqrt(np.maximum(square / count - mean ** 2, 0.0))
+
+        mean = _smooth_circular(_fill_circular(mean), smooth_days)
+        spread = _smooth_circular(_fill_circular(spread), smooth_days)
+        return cls(mean, np.nan_to_num(spread))
+
+    @classmethod
+    def from_monthly(cls, monthly):
+        """月別平年値 {月: ℃} を各月15日に置き、通日方向に線形補間した季節変化だけの気候値"""
+        anchors = np.array([_day_positions(np.array([np.datetime64(f"2001-{m:02d}-15")]))[0] for m in range(1, 13)])
+        values = np.array([monthly.get(m, 15.0) for m in range(1, 13)])
+        idx = np.arange(DAYS)
+        curve = np.interp(idx, np.concatenate([anchors - DAYS, anchors, anchors + DAYS]), np.tile(values, 3))
+        return cls(np.repeat(curve[:, None], 24, axis=1), np.zeros((DAYS, 24)))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, mmap_mode="r")
+        return cls(data["mean"] / 100.0, data["spread"] / 100.0)
+
+    def save(self, path):
+        data = np.empty((DAYS, 24), dtype=RECORD)
+        data["mean"] = np.rint(self.mean * 100)
+        data["spread"] = np.rint(np.clip(self.spread, 0, 600) * 100)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, data)
+        os.replace(tmp, path)
+
+    def window(self, dates, table=None):
+        """
+        日付 (D,) ごとに 前日0時〜当日23時(UTC) の48時間ぶん (D, 48)。海洋APIの水温と同じ並び
+        """
+        table = self.mean if table is None else table
+        steps = np.arange(48)
+        days = np.asarray(dates, dtype="datetime64[D]")[:, None] - 1 + steps // 24
+        hod = steps % 24
+        r0, r1, w = _spread_rows(_day_positions(days, hod))
+        return (1 - w) * table[r0, hod] + w * table[r1, hod]
+
+    def spread_window(self, dates):
+        return self.window(dates, self.spread)
+
+
+def fetch_archive(directory, spot, first_year, last_year):
+    """海洋APIの過去の時別海水温を1年ずつ directory に保存する（取得済みの年は飛ばす）"""
+    import forecast_data
+    import upstream
+
+    os.makedirs(directory, exist_ok=True)
+    today = datetime.date.today()
+    for year in range(first_year, last_year + 1):
+        path = os.path.join(directory, f"marine_{spot.key}_{year}.json")
+        if os.path.exists(path):
+            continue
+        end = min(datetime.date(year, 12, 31), today - datetime.timedelta(days=1))
+        params = {"latitude": spot.lat, "longitude": spot.lon, "hourly": "sea_surface_temperature",
+                  "start_date": f"{year}-01-01", "end_date": end.isoformat()}
+        data = upstream.fetch_json(f"{forecast_data.MARINE_URL}?{urllib.parse.urlencode(params)}")
+        if data is None:
+            raise SystemExit(f"{year}年の海水温を取得できませんでした")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+def default_path(spot):
+    return os.path.join(CLIMATOLOGY_DIR, f"climatology_{spot.key}.npy")
+
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def for_spot(spot=None):
+    """ポイントの気候値（ファイルが無ければ月別平年値から作った代用品）。プロセス内で使い回す"""
+    spot = spot or spots.DEFAULT_SPOT
+    with _lock:
+        clim = _loaded.get(spot.key)
+        if clim is None:
+            path = default_path(spot)
+            try:
+                clim = Climatology.load(path) if os.path.exists(path) else None
+            except (OSError, ValueError):
+                clim = None
+            if clim is None:
+                clim = Climatology.from_monthly(spot.historical_temps)
+            _loaded[spot.key] = clim
+        return clim
+
+
+if __name__ == "__main__":
+    import backtest
+
+    parser = argparse.ArgumentParser(description="過去の海水温から 通日×時刻 の気候値を作る")
+    parser.add_argument("archive", help="Open-Meteo 形式の JSON を置いたディレクトリ（backtest.py と同じ）")
+    parser.add_argument("--spot", default=spots.DEFAULT_SPOT.key, choices=list(spots.SPOTS))
+    parser.add_argument("--smooth", type=int, default=SMOOTH_DAYS, help="通日方向の移動平均の幅[日]")
+    parser.add_argument("--fetch", type=int, default=None, metavar="YEAR",
+                        help="YEAR〜今年の過去データを海洋APIから archive に取得してから作る")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    if args.fetch is not None:
+        fetch_archive(args.archive, spots.get(args.spot), args.fetch, datetime.date.today().year)
+    clim = Climatology.build(backtest.Archive.from_dir(args.archive), args.smooth)
+    out = args.out or default_path(spots.get(args.spot))
+    clim.save(out)
+    today = datetime.date.today()
+    print(f"{out}  ({today:%m/%d} の平年値 {clim.window([today])[0, 24:].mean():.2f}℃)")
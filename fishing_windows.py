@@ -0,0 +1,136 @@
+"""
+魔釣 ベスト時間帯の探索（分単位）
+
+表は 5〜15時 の毎正時だけなので、時間別の入力（水温・雲量・風・雨）を step 分刻みに
+線形補間し、潮（転流）と日の出はその時刻で評価し直して forecast_engine.score_hours で採点する。
+そのうえで length 分の窓の平均点を累積和で一度に求め、重ならない上位 k 窓を選ぶ。
+1日でも期間（D日）でも同じ配列演算で扱う。Streamlit に依存しない。
+"""
+import collections
+
+import numpy as np
+
+import astronomy
+import forecast_data
+import forecast_engine
+import spots
+import telemetry
+
+STEP_MINUTES = 5
+WINDOW_MINUTES = 90
+TOP_K = 3
+SUNRISE_MINUTES = 30  # 日の出の前後この分数を日の出加点の対象にする
+TIE_BREAK = 1e-3  # 平均点の刻み (1/窓の個数) より十分小さい
+
+Window = collections.namedtuple("Window", ["date", "start", "end", "score", "peak", "slack", "sunrise"])
+
+
+def minute_grid(step=STEP_MINUTES):
+    """5:00〜15:59 を step 分刻みにした 0時からの分"""
+    return np.arange(forecast_engine.START_HOUR * 60, (forecast_engine.END_HOUR + 1) * 60, step)
+
+
+def interp_hourly(values, minutes):
+    """毎正時の (D, H) を minutes (M,) の (D, M) に線形補間（範囲外は端の値）"""
+    values = np.asarray(values, dtype=float)
+    pos = np.clip((minutes - forecast_engine.START_HOUR * 60) / 60.0, 0, values.shape[-1] - 1)
+    i0 = np.minimum(pos.astype(int), values.shape[-1] - 2)
+    w = pos - i0
+    return values[:, i0] * (1 - w) + values[:, i0 + 1] * w
+
+
+def fine_scores(fc, moon_ages, sun_min, minutes, tide=None, weights=forecast_engine.WEIGHTS):
+    """
+    Forecast (D, H) を minutes (M,) の分単位スコアに展開する。(スコア, 転流, 日の出) を (D, M) で返す
+    tide: minutes で引いた (潮位, 1時間前の潮位, 転流[, 潮が動いているか])。None なら月齢からの推定
+    weights: forecast_engine.Weights（what-if では日ごとに (D, 1) の重み）
+    """
+    hours = minutes / 60.0
+    n = len(moon_ages)
+    ct, tdiff, cloud, wind, rain = (interp_hourly(a, minutes) for a in (fc.temp, fc.tdiff, fc.cloud, fc.wind, fc.rain))
+    with np.errstate(invalid="ignore"):
+        sunrise = np.abs(minutes[None, :] - np.asarray(sun_min, dtype=float)[:, None]) <= SUNRISE_MINUTES
+    # 平年値の定数で埋めた日は tdiff が 0 なので、水温の時間差の判定は tdiff に任せてよい
+    sc, _, slack, _, _, _ = forecast_engine.score_hours(
+        hours, moon_ages, np.full(n, -1), ct, tdiff, cloud, wind, rain,
+        np.zeros(n, dtype=bool), fc.trend_score, tide, sunrise=sunrise, weights=weights,
+    )
+    return sc, np.broadcast_to(slack, sc.shape), sunrise
+
+
+def window_means(scores, n):
+    """(D, M) の各位置から n 個ぶんの平均点 (D, M-n+1)。累積和の差で求める"""
+    cs = np.zeros((scores.shape[0], scores.shape[1] + 1))
+    np.cumsum(scores, axis=-1, out=cs[:, 1:])
+    return (cs[:, n:] - cs[:, :-n]) / n
+
+
+def top_windows(means, n, k):
+    """
+    重ならない上位 k 窓を (日, 開始位置, 平均点) で返す。高い窓から順に取り、同じ日の重なる位置を外す
+    同点なら早い日・早い時刻を優先
+    """
+    means = np.array(means, dtype=float)
+    picks = []
+    for _ in range(k):
+        flat = int(np.argmax(means))
+        d, s = np.unravel_index(flat, means.shape)
+        if not np.isfinite(means[d, s]):
+            break
+        picks.append((int(d), int(s), float(means[d, s])))
+        means[d, max(0, s - n + 1):s + n] = -np.inf
+    return picks
+
+
+def rank(sc, slack, sunrise, n):
+    """n 個ぶんの窓の (平均点, 順位付けの値) を (D, M-n+1) で"""
+    means = window_means(sc, n)
+    # スコアは100で頭打ちになり同点が多いので、同点なら転流・日の出を多く含む窓を上にする
+    return means, means + TIE_BREAK * (window_means(slack, n) + window_means(sunrise, n))
+
+
+def to_windows(dates, minutes, step, n, picks, sc, slack, sunrise, means):
+    """top_windows の (日, 開始位置, 値) を Window にする"""
+    return [
+        Window(dates[d], int(minutes[s]), int(minutes[s + n - 1]) + step, round(float(means[d, s]), 1),
+               int(sc[d, s:s + n].max()), bool(slack[d, s:s + n].any()), bool(sunrise[d, s:s + n].any()))
+        for d, s, _ in picks
+    ]
+
+
+def window_count(length, step, minutes):
+    """length 分の窓に入る刻みの数"""
+    return max(1, min(len(minutes), int(round(length / step))))
+
+
+def search(dates, moon_ages, fc, sun_min, tide=None, length=WINDOW_MINUTES, k=TOP_K, step=STEP_MINUTES, minutes=None):
+    """D日分の Forecast からベスト時間帯を k 個（全日通しての順位）返す"""
+    minutes = minute_grid(step) if minutes is None else minutes
+    n = window_count(length, step, minutes)
+    with telemetry.span("windows", days=len(dates)):
+        sc, slack, sunrise = fine_scores(fc, moon_ages, sun_min, minutes, tide)
+        means, ranked = rank(sc, slack, sunrise, n)
+        picks = top_windows(ranked, n, k)
+    return to_windows(dates, minutes, step, n, picks, sc, slack, sunrise, means)
+
+
+def _tide(dates, offset, minutes):
+    return forecast_data.tide_inputs(dates, offset, minutes / 60.0)
+
+
+def for_day(target_date, fc, moon_age, spot=None, length=WINDOW_MINUTES, k=TOP_K, step=STEP_MINUTES):
+    """1日分（日次元のない Forecast。pipeline.run_day の fc）のベスト時間帯"""
+    spot = spot or spots.DEFAULT_SPOT
+    minutes = minute_grid(step)
+    fc = forecast_engine.Forecast._make(np.asarray(f)[None] for f in fc)
+    sun_min = astronomy.sunrise_minutes([target_date], spot.lat, spot.lon)
+    return search([target_date], [moon_age], fc, sun_min, _tide([target_date], spot.tide_offset, minutes),
+                  length, k, step, minutes)
+
+
+def for_range(dates, moon_ages, fc, spot=None, length=WINDOW_MINUTES, k=TOP_K, step=STEP_MINUTES):
+    """期間予報（forecast_data.score_range の結果）全体でのベスト時間帯。日の出・潮は spot の値で評価する"""
+    spot = spot or spots.DEFAULT_SPOT
+    minutes = minute_grid(step)
+    sun_min = astronomy.sunrise_minutes(dates, spot.lat, spot.lon)
+    return search(dates, moon_ages, fc, sun_min, _tide(dates, spot.tide_offset, minutes), length, k, step, minutes)
@@ -0,0 +1,287 @@
+"""
+魔釣 予報データ層（Streamlit非依存）
+
+Open-Meteo からの取得（永続キャッシュ + single-flight + 並列取得）と、
+取得データの日別切り出し・スコアリングをまとめる。
+画面(streamlit_app.py)・バックグラウンド処理の両方から使う。
+"""
+import datetime
+import threading
+import urllib.parse
+
+import numpy as np
+
+import astronomy
+import climatology
+import forecast_engine
+import hourly_series
+import http_cache
+import spots
+import telemetry
+import tidal_current
+import tide_table
+import upstream
+
+# --- 定数（岡山・下津井エリア設定。ポイント別の値は spots.py） ---
+OKAYAMA_LAT = spots.DEFAULT_SPOT.lat
+OKAYAMA_LON = spots.DEFAULT_SPOT.lon
+
+HISTORICAL_TEMPS = spots.DEFAULT_SPOT.historical_temps
+
+MARINE_URL = "https://marine-api.open-meteo.com/v1/marine"
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+
+_NOT_OPENED = object()
+_disk_cache = _NOT_OPENED
+_disk_cache_lock = threading.Lock()
+
+
+def disk_cache():
+    """
+    再起動・レプリカ間で共有される永続キャッシュ（st.cache_data の下の2段目）。
+    import 時にはファイルを作らず、初回の利用で開く。書き込めない環境では None
+    """
+    global _disk_cache
+    if _disk_cache is _NOT_OPENED:
+        with _disk_cache_lock:
+            if _disk_cache is _NOT_OPENED:
+                _disk_cache = http_cache.open_default()
+    return _disk_cache
+
+
+def use_disk_cache(cache):
+    """永続キャッシュを差し替える（ベンチ・テスト用。None ならキャッシュ無し）"""
+    global _disk_cache
+    _disk_cache = cache
+
+
+def fetch_cached(url, fetcher=upstream.fetch_json):
+    # 同じURLを同時に取りに来たセッションは1本の取得結果を共有する
+    with telemetry.span("fetch", api=upstream.endpoint(url)) as attrs:
+        cache = disk_cache()
+        if cache is None:
+            value = upstream.SINGLE_FLIGHT.do(http_cache.normalize_url(url), lambda: fetcher(url))
+        else:
+            value = upstream.SINGLE_FLIGHT.do(http_cache.normalize_url(url), lambda: cache.fetch(url, fetcher))
+        attrs["ok"] = value is not None
+        return value
+
+
+def fetch_many(urls):
+    """独立したリクエストを並列に発行（全体の締め切り付き）"""
+    return upstream.fetch_many(fetch_cached, urls)
+
+
+def weather_urls(start_date, end_date, locations=None):
+    """
+    期間全体を取得する (海洋API, 気象API) のURL。海水温は前日分から。
+    locations に複数ポイントを渡すと座標をカンマ区切りにした1本のURLになる（応答は地点ごとのリスト）
+    """
+    s_str = start_date.strftime("%Y-%m-%d")
+    e_str = end_date.strftime("%Y-%m-%d")
+    y_str = (start_date - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    if locations is None:
+        lat, lon = OKAYAMA_LAT, OKAYAMA_LON
+    else:
+        lat = ",".join(str(s.lat) for s in locations)
+        lon = ",".join(str(s.lon) for s in locations)
+
+    p_temp = {"latitude": lat, "longitude": lon, "hourly": "sea_surface_temperature", "start_date": y_str, "end_date": e_str}
+
+    p_weather = {
+        "latitude": lat,
+        "longitude": lon,
+        "hourly": "cloud_cover,wind_speed_10m,rain",
+        "start_date": s_str,
+        "end_date": e_str,
+        "timezone": "Asia/Tokyo"
+    }
+
+    return f"{MARINE_URL}?{urllib.parse.urlencode(p_temp)}", f"{WEATHER_URL}?{urllib.parse.urlencode(p_weather)}"
+
+
+def fetch_weather_range(start_date, end_date):
+    """期間全体を海洋API・気象APIそれぞれ1回（並列）で取得"""
+    sd, wd = fetch_many(weather_urls(start_date, end_date))
+    return sd, wd
+
+
+def fetch_currents(max_age=tidal_current.REFRESH):
+    """
+    海保の潮流予測ページを取り込んで最新の CurrentTable を返す（本文が変わっていなければ解析しない）。
+    前回取りに行ってから max_age 秒たっていなければ通信せず、取り込み済みの表を返す。
+    取れなければ前回の表のまま（一度も取れていなければ None）
+    """
+    if not tidal_current.INGEST.claim(max_age):
+        return tidal_current.latest()
+    source = tidal_current.SOURCE
+    with telemetry.span("get_currents"):
+        text = tidal_current.read_local(source) if tidal_current.is_local(source) else fetch_cached(source, upstream.fetch_text)
+        return tidal_current.INGEST.update(text)
+
+
+def data_status(start_date, end_date, missing=()):
+    """
+    API ごとの取得状況 {"marine": {...}, "forecast": {...}}。
+    ok: 今回データが取れたか（missing に名前が無いか） / state: 遮断器の状態 / age: キャッシュ上のデータの古さ[秒]
+    """
+    out = {}
+    cache = disk_cache()
+    for url in weather_urls(start_date, end_date):
+        api = upstream.endpoint(url)
+        age = cache.age(http_cache.normalize_url(url)) if cache else None
+        out[api] = {"ok": api not in missing, "state": upstream.BREAKERS.state(url),
+                    "age": None if age is None else round(age)}
+    return out
+
+
+def _per_location(data, n):
+    # 複数地点の応答はリスト、1地点だと dict。件数が合わなければ全地点 None 扱い
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or len(data) != n:
+        return [None] * n
+    return data
+
+
+def fetch_spots_weather(spot_list, start_date, end_date):
+    """全ポイント分を 海洋API・気象API 各1回で取得し、ポイント順の (sd リスト, wd リスト) を返す"""
+    sd, wd = fetch_many(weather_urls(start_date, end_date, spot_list))
+    return _per_location(sd, len(spot_list)), _per_location(wd, len(spot_list))
+
+
+def get_moon_age(date):
+    """正午(JST)時点の月齢（小数）"""
+    return float(astronomy.moon_age([date])[0])
+
+
+def get_sunrise_minutes(date, spot=None):
+    """日の出時刻（0時からの分）"""
+    spot = spot or spots.DEFAULT_SPOT
+    return float(astronomy.sunrise_minutes([date], spot.lat, spot.lon)[0])
+
+
+def get_sinker_fixed():
+    return {
+        "15m": "30g",
+        "20m": "30g",
+        "30m": "45g",
+        "45m": "60g"
+    }
+
+
+def get_seasonal_bait(month):
+    if month in [12, 1, 2, 3]:
+        return "海苔・アミ", "定番ピンク・黒・緑"
+    elif month in [4, 5]:
+        return "真鯛の乗っ込み", "赤オレ・オレンジ・ピンク"
+    elif month in [6, 7, 8]:
+        return "イワシ・イカ", "ゴールド・チャート・グロー"
+    elif month in [9, 10, 11]:
+        return "広範囲ベイト", "赤オレ・オレンジ・エビオレ"
+    else:
+        return "混合", "赤オレ"
+
+
+def get_tide_name(moon_age):
+    # 月齢による潮名判定（月齢は四捨五入した日数で判定）
+    age_norm = round(moon_age) % 15
+    if age_norm <= 2 or age_norm >= 13: return "大潮(激)"
+    elif 3 <= age_norm <= 5 or 10 <= age_norm <= 12: return "中潮(速)"
+    else: return "小潮(緩)"
+
+
+def fallback_temps(dates, spot=None):
+    """水温が取れなかった日に使う平年値。前日0時〜当日23時(UTC)の気候値 (D, 48)"""
+    return climatology.for_spot(spot).window(dates)
+
+
+def tide_inputs(dates, offset=0, hours=None):
+    """
+    潮汐表から 5〜15時 の (正規化潮位, 1時間前の潮位, 転流, 潮が動いているか) を (D, H) で引く。表が使えなければ None。
+    取り込み済みの潮流予測 (tidal_current) の範囲内の時刻は、転流・潮の動きを潮流の値で置き換える。
+    offset は下津井に対する潮時差[分]（その分だけずらした時刻の潮を引く）
+    hours を渡すとその時刻（小数可）で引く。表の生成は先読み (prefetch) に任せ、ここでは作らない
+    """
+    table = tide_table.load_default(build=False)
+    if table is None:
+        return None
+    hours = (forecast_engine.HOURS if hours is None else np.asarray(hours)) - offset / 60.0
+    level, slack = table.hourly(dates, hours)
+    prev_level, _ = table.hourly(dates, hours - 1)
+    moving = np.abs(level - prev_level) > forecast_engine.TIDE_CHANGE
+    currents = tidal_current.latest()
+    if currents is not None:
+        speed, c_slack, covered = currents.hourly(dates, hours)
+        slack = np.where(covered, c_slack, slack)
+        moving = np.where(covered, np.abs(speed) >= tidal_current.MOVING_KNOTS, moving)
+    return level, prev_level, slack, moving
+
+
+def parse(sd, wd):
+    """海洋API・気象API の応答（1地点ぶん）を時刻を揃えた HourlySeries にする。短い水温の欠損は補間"""
+    series = hourly_series.HourlySeries.from_response(sd, wd)
+    return series.fill_gaps("sea_surface_temperature", forecast_engine.SST_MAX_GAP)
+
+
+def score_days(series, dates, spot=None):
+    """HourlySeries から dates の各日を切り出し、forecast_engine でまとめてスコアリング。(月齢, Forecast)"""
+    spot = spot or spots.DEFAULT_SPOT
+    temps, weather, has_full = forecast_engine.day_inputs(series, dates)
+
+    # 日の出・月齢は通信不要のローカル計算
+    sun_hs = astronomy.sunrise_hour(dates, spot.lat, spot.lon)
+    mages = astronomy.moon_age(dates).tolist()
+    fallback = fallback_temps(dates, spot)
+
+    with telemetry.span("tide", days=len(dates)):
+        tide = tide_inputs(dates, spot.tide_offset)
+    with telemetry.span("scoring", days=len(dates)):
+        fc = forecast_engine.forecast(temps, *weather, mages, sun_hs, fallback, has_full, tide)
+    return mages, fc
+
+
+def score_range(start_date, n_days, sd, wd):
+    """
+    一括取得したデータを日別に切り出し、forecast_engine でまとめてスコアリング
+    """
+    dates = [start_date + datetime.timedelta(days=i) for i in range(n_days)]
+    mages, fc = score_days(parse(sd, wd), dates)
+    return dates, mages, fc
+
+
+def forecast_range(start_date, n_days, fetch=None):
+    """期間の予報。fetch(開始日, 終了日) で取得元を差し替えられる（アプリのキャッシュ等）"""
+    end_date = start_date + datetime.timedelta(days=n_days - 1)
+    sd, wd = (fetch or fetch_weather_range)(start_date, end_date)
+    return score_range(start_date, n_days, sd, wd)
+
+
+def score_spots(target_date, spot_list, sds, wds):
+    """
+    1日分を全ポイントまとめてスコアリング（ポイントを日の次元に並べて forecast_engine に渡す）
+    """
+    n = len(spot_list)
+    inputs = [forecast_engine.day_inputs(parse(sd, wd), [target_date]) for sd, wd in zip(sds, wds)]
+    temps = np.concatenate([i[0] for i in inputs])
+    weather = [np.concatenate([i[1][k] for i in inputs]) for k in range(3)]
+    has_full = np.concatenate([i[2] for i in inputs])
+
+    sun_hs = [int(astronomy.sunrise_hour([target_date], s.lat, s.lon)[0]) for s in spot_list]
+    mage = get_moon_age(target_date)
+    fallback = np.concatenate([fallback_temps([target_date], s) for s in spot_list])
+
+    with telemetry.span("tide", days=n):
+        tides = [tide_inputs([target_date], s.tide_offset) for s in spot_list]
+        tide = None if any(t is None for t in tides) else tuple(np.concatenate(parts) for parts in zip(*tides))
+    with telemetry.span("scoring", days=n):
+        fc = forecast_engine.forecast(temps, *weather, [mage] * n, sun_hs, fallback, has_full, tide)
+    return mage, fc
+
+
+def forecast_spots(target_date, spot_list=None, fetch=None):
+    """全ポイントの1日分の予報。(ポイントのリスト, 月齢, Forecast(N, H))。fetch は fetch_spots_weather と同じ引数"""
+    spot_list = list(spot_list or spots.SPOTS.values())
+    sds, wds = (fetch or fetch_spots_weather)(spot_list, target_date, target_date)
+    mage, fc = score_spots(target_date, spot_list, sds, wds)
+    return spot_list, mage, fc
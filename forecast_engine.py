@@ -0,0 +1,237 @@
+"""
+魔釣 予報エンジン（ヘッドレス / NumPyベクトル化）
+
+main() の 5:00〜15:00 スコア計算ループと同じ結果を、
+任意の日数 × 時間について1回の配列演算でまとめて計算する。
+Streamlit に依存しないため、バッチ処理やバックテストからも呼び出せる。
+"""
+import collections
+import math
+
+import numpy as np
+
+# --- 定数 ---
+START_HOUR = 5
+END_HOUR = 15
+HOURS = np.arange(START_HOUR, END_HOUR + 1)
+
+# 海水温は前日0時(UTC)から48時間分、気象は当日0時(JST)から24時間分（hourly_series で時刻から切り出す）
+# 海水温の窓で当日h時(JST)は OFF + h 番目
+TZ_HOURS = 9
+OFF = 24 - TZ_HOURS
+TEMP_SPAN = 48
+WEATHER_SPAN = 24
+SST_MAX_GAP = 3  # これ以下の時間の海水温の欠損は前後から補間する
+TIDE_CHANGE = 0.3  # 1時間の潮位変化（正規化）がこれを超えたら「潮が動く」
+
+WEATHER_ICONS = ("⛅", "☔", "☁️", "☀️")
+WIND_LABELS = ("静穏", "最適", "やや強", "強風", "爆風")
+LOW_TEMP_LABELS = ("", "低水温", "激渋")
+TREND_LABELS = ("", "⚠️前日比↓", "前日比↑")
+
+# スコアの重み（加点・減点と低水温の倍率）。what-if (whatif.py) では各項目を (N, 1) の配列にして
+# 複数の組をまとめて評価する。区分の境界（風速・雲量・水温のしきい値）は固定
+Weights = collections.namedtuple("Weights", [
+    "base", "sunrise", "slack", "tide_change", "temp_rise", "temp_drop", "trend_drop", "trend_rise",
+    "rain", "cloudy", "sunny", "wind_calm", "wind_light", "wind_moderate", "wind_strong",
+    "low_temp", "very_low_temp",
+])
+WEIGHTS = Weights(
+    base=40, sunrise=30, slack=40, tide_change=30, temp_rise=20, temp_drop=-20, trend_drop=-20, trend_rise=10,
+    rain=10, cloudy=10, sunny=-5, wind_calm=-20, wind_light=20, wind_moderate=5, wind_strong=-10,
+    low_temp=0.5, very_low_temp=0.2,
+)
+
+Forecast = collections.namedtuple("Forecast", [
+    # 日単位 (D,)
+    "use_historical", "diff_day", "trend_score", "trend_code", "min_temp", "max_temp",
+    # 時間単位 (D, H)
+    "score", "temp", "tdiff", "cloud", "wind", "rain",
+    "tide_level", "slack", "weather_code", "wind_code", "low_temp_code",
+])
+
+
+def to_array(values, length):
+    """Open-Meteo の値リスト(None混在)を長さ固定の float64 配列(欠損はNaN)に変換"""
+    out = np.full(length, np.nan)
+    vals = [np.nan if v is None else v for v in (values or [])[:length]]
+    out[:len(vals)] = vals
+    return out
+
+
+def estimate_okayama_tide(moon_age, hour):
+    base_high = 9.0; delay = 0.8
+    high_tide = (base_high + (moon_age % 15) * delay) % 12
+    diff = abs(hour - high_tide)
+    if diff > 6: diff = 12 - diff
+    level = math.cos(diff * (math.pi / 6))
+    is_slack = (diff < 1.0 or abs(diff - 6.0) < 1.0)
+    return level, is_slack
+
+
+def tide_level(moon_age, hours):
+    """estimate_okayama_tide のベクトル版。(潮位, 転流フラグ) を返す"""
+    high_tide = (9.0 + (moon_age % 15) * 0.8) % 12
+    diff = np.abs(hours - high_tide)
+    diff = np.where(diff > 6, 12 - diff, diff)
+    level = np.cos(diff * (np.pi / 6))
+    slack = (diff < 1.0) | (np.abs(diff - 6.0) < 1.0)
+    return level, slack
+
+
+def _seq_mean(x, mask):
+    # 元ループの sum()/len() と同じ丸めになるよう逐次加算(cumsum)で平均を取る
+    n = mask.sum(axis=-1)
+    total = np.cumsum(np.where(mask, x, 0.0), axis=-1)[..., -1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / n, n
+
+
+def trend_points(trend_code, weights=WEIGHTS):
+    """前日比トレンドのコード (D,) → 加点 (D,)。重みは score_hours と同じくスカラーか (D, 1) の配列"""
+    drop, rise = (np.asarray(v).reshape(-1) if np.ndim(v) else v for v in (weights.trend_drop, weights.trend_rise))
+    return np.select([trend_code == 1, trend_code == 2], [drop, rise], 0)
+
+
+def prepare_temps(temps, fallback_temp, has_full=True, weights=WEIGHTS):
+    """
+    海水温(D, 48)から平年値フォールバック・前日比トレンド・当日の時間別水温を求める
+    fallback_temp: 日ごとの定数 (D,) か、気候値の48時間ぶん (D, 48)。
+    定数のときは従来どおり平坦な1日として扱い、時間差・前日比は評価しない
+    weights: 前日比の加点に使う Weights（score_hours と同じ形）
+    """
+    temps = np.array(temps, dtype=float)
+    fallback_temp = np.asarray(fallback_temp, dtype=float)
+    profile = fallback_temp.ndim == 2
+    if profile:
+        fallback_temp = np.broadcast_to(fallback_temp, temps.shape)
+    else:
+        fallback_temp = np.broadcast_to(fallback_temp, temps.shape[:1])[:, None]
+    has_full = np.broadcast_to(np.asarray(has_full, dtype=bool), temps.shape[:1])
+
+    # 有効な水温が1つもなければ平年値で48時間埋める
+    use_hist = ~(np.isfinite(temps) & (temps > 0)).any(axis=-1)
+    temps[use_hist] = np.broadcast_to(fallback_temp, temps.shape)[use_hist]
+    flat = use_hist & (not profile)
+
+    # 前日比トレンド（気候値で埋めた日は48時間揃っている）
+    ok = np.isfinite(temps)
+    avg_y, n_y = _seq_mean(temps[:, :24], ok[:, :24])
+    avg_t, n_t = _seq_mean(temps[:, 24:48], ok[:, 24:48])
+    has_trend = ~flat & (has_full | use_hist) & (n_y > 0) & (n_t > 0)
+    diff_day = np.where(has_trend, avg_t - avg_y, np.nan)
+    trend_code = np.select([has_trend & (diff_day <= -0.5), has_trend & (diff_day >= 0.5)], [1, 2], 0)
+    trend_score = trend_points(trend_code, weights)
+
+    # 当日 5〜15時 の水温（欠損は当日最初の値、それも無ければ15.0）
+    win = temps[:, OFF + START_HOUR:OFF + END_HOUR + 1]
+    win_ok = np.isfinite(win)
+    has_any = win_ok.any(axis=-1)
+    first = np.where(has_any, win[np.arange(len(win)), win_ok.argmax(axis=-1)], 15.0)
+    ct = np.where(win_ok, win, first[:, None])
+
+    prev = temps[:, OFF + START_HOUR - 1:OFF + END_HOUR]
+    pt = np.where(np.isfinite(prev), prev, ct)
+    tdiff = np.where(flat[:, None], 0.0, ct - pt)
+
+    min_t = np.where(has_any, np.where(win_ok, win, np.inf).min(axis=-1), 0.0)
+    max_t = np.where(has_any, np.where(win_ok, win, -np.inf).max(axis=-1), 0.0)
+
+    return use_hist, flat, diff_day, trend_score, trend_code, min_t, max_t, ct, tdiff
+
+
+def score_hours(hours, moon_age, sun_h, ct, tdiff, cloud, wind, rain, use_hist, trend_score, tide=None, sunrise=None,
+                weights=WEIGHTS):
+    """
+    時間別スコア本体。引数はすべて (D, H) にブロードキャスト可能な配列
+    use_hist: 水温の時間差を評価しない日（平年値の定数で埋めた日）
+    tide: (潮位, 1時間前の潮位, 転流[, 潮が動いているか]) の (D, H) 配列。None なら月齢からの推定を使う。
+          4つ目（潮流の実測・予測から）が無ければ潮位の変化から判定する
+    sunrise: 日の出加点の対象 (D, H)。None なら hours == sun_h（分単位の評価で使う）
+    weights: Weights。各項目はスカラーか (D, 1) の配列（日ごとに別の重み）
+    """
+    w = weights
+    moon_age = np.asarray(moon_age, dtype=float)[:, None]
+    sun_h = np.asarray(sun_h)[:, None]
+    use_hist = np.asarray(use_hist, dtype=bool)[:, None]
+    trend_score = np.asarray(trend_score)[:, None]
+
+    if tide is None:
+        tlev, slack = tide_level(moon_age, hours)
+        prev_lev, _ = tide_level(moon_age, hours - 1)
+    else:
+        tlev, prev_lev, slack = tide[:3]
+    moving = tide[3] if tide is not None and len(tide) > 3 else np.abs(tlev - prev_lev) > TIDE_CHANGE
+
+    sc = np.full(np.broadcast(ct, moon_age).shape, 0.0) + w.base  # 基礎点
+    sc += np.where(hours == sun_h if sunrise is None else sunrise, w.sunrise, 0)
+    tide_change = (hours > START_HOUR) & moving
+    sc += np.where(slack, w.slack, np.where(tide_change, w.tide_change, 0))
+    sc += np.where(use_hist, 0, np.select([tdiff >= 0.1, tdiff <= -0.1], [w.temp_rise, w.temp_drop], 0))
+    sc += trend_score
+
+    weather_code = np.select([rain >= 0.5, cloud >= 60, cloud <= 20], [1, 2, 3], 0)
+    sc += np.select([weather_code == 1, weather_code == 2, weather_code == 3], [w.rain, w.cloudy, w.sunny], 0)
+
+    wind_code = np.select([wind >= 10.0, wind >= 7.0, wind >= 5.0, wind >= 2.0], [4, 3, 2, 1], 0)
+    sc += np.select([wind_code == 3, wind_code == 2, wind_code == 1, wind_code == 0],
+                    [w.wind_strong, w.wind_moderate, w.wind_light, w.wind_calm], 0)
+    sc = np.where(wind_code == 4, 0.0, sc)
+
+    low_temp_code = np.select([ct <= 10.0, ct <= 12.0], [2, 1], 0)
+    sc = np.select([low_temp_code == 2, low_temp_code == 1], [np.trunc(sc * w.very_low_temp), np.trunc(sc * w.low_temp)], sc)
+
+    sc = np.clip(sc, 0, 100).astype(int)
+    return sc, tlev, slack, weather_code, wind_code, low_temp_code
+
+
+def forecast(temps, clouds, winds, rains, moon_age, sun_h, fallback_temp, has_full=True, tide=None, weights=WEIGHTS):
+    """
+    D日分を一括でスコアリングする
+    temps: (D, 48) 前日0時〜当日23時(UTC)の海水温 / clouds, winds, rains: (D, 24) 当日の気象(JST)
+    fallback_temp: 水温が取れなかった日の平年値。(D,) の定数か (D, 48) の気候値
+    tide: 潮汐表から引いた (潮位, 1時間前の潮位, 転流) の (D, H) 配列（省略時は月齢から推定）
+    weights: スコアの重み（score_hours と同じ。前日比の加点にも使う）
+    """
+    use_hist, flat, diff_day, trend_score, trend_code, min_t, max_t, ct, tdiff = prepare_temps(
+        temps, fallback_temp, has_full, weights
+    )
+
+    def hourly(a):
+        a = np.asarray(a, dtype=float)[:, HOURS]
+        return np.where(np.isfinite(a), a, 0.0)
+
+    cloud, wind, rain = hourly(clouds), hourly(winds), hourly(rains)
+    sc, tlev, slack, weather_code, wind_code, low_temp_code = score_hours(
+        HOURS, moon_age, sun_h, ct, tdiff, cloud, wind, rain, flat, trend_score, tide, weights=weights
+    )
+    return Forecast(
+        use_hist, diff_day, trend_score, trend_code, min_t, max_t,
+        sc, ct, tdiff, cloud, wind, rain, tlev, slack, weather_code, wind_code, low_temp_code,
+    )
+
+
+def day_inputs(series, dates):
+    """
+    HourlySeries から日付ごとの入力を切り出す。
+    (海水温 (D, 48), [雲量, 風速, 雨量] 各 (D, 24), 海水温の48時間が応答の範囲内か (D,))
+    """
+    temps, has_full = series.days("sea_surface_temperature", dates, TEMP_SPAN, start=-24)
+    weather = [series.days(name, dates, WEATHER_SPAN, tz_hours=TZ_HOURS)[0]
+               for name in ("cloud_cover", "wind_speed_10m", "rain")]
+    return temps, weather, has_full
+
+
+def forecast_day(r_temps, r_clouds, r_winds, r_rains, moon_age, sun_h, fallback_temp, tide=None, weights=WEIGHTS):
+    """1日分(Open-Meteoのリストそのまま)を計算し、日次元を外した Forecast を返す"""
+    fc = forecast(
+        to_array(r_temps, TEMP_SPAN)[None],
+        to_array(r_clouds, WEATHER_SPAN)[None],
+        to_array(r_winds, WEATHER_SPAN)[None],
+        to_array(r_rains, WEATHER_SPAN)[None],
+        [moon_age], [sun_h], [fallback_temp],
+        has_full=len(r_temps or []) >= TEMP_SPAN,
+        tide=tide,
+        weights=weights,
+    )
+    return Forecast._make(f[0] for f in fc)
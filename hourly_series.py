@@ -0,0 +1,109 @@
+"""
+魔釣 時別データの入れ物（Open-Meteo の hourly を配列で持つ）
+
+応答の "hourly" は 値 or None の Python リストで、時刻は API ごとに UTC だったり現地時刻だったりする。
+ここで一度だけ UTC の毎時に揃えた float64 配列（欠損は NaN）へ変換し、以後は
+「日付の現地 h 時から span 時間」を時刻で切り出す（添字のずれを呼び出し側で数えない）。
+
+- 1970年からの UTC 経過時間 start_hour を先頭に、項目ごとに同じ長さの配列を持つ
+- 複数の応答（海洋API + 気象API、年ごとのファイルなど）は時刻を揃えて結合する
+- 範囲外は NaN。切り出しは範囲内だったかのフラグも返す
+- 短い欠損は前後から線形補間で埋められる (fill_gaps)
+"""
+import numpy as np
+
+
+def utc_hours(times, offset_seconds=0):
+    """Open-Meteo の time（現地ISO文字列 or unixtime）→ 1970年からのUTC経過時間"""
+    if len(times) and isinstance(times[0], (int, float)):
+        return np.asarray(times, dtype=np.int64) // 3600
+    local = np.asarray(times, dtype="datetime64[h]").astype(np.int64)
+    return local - offset_seconds // 3600
+
+
+def date_hours(dates):
+    """日付 (D,) → その日の 0時(UTC) の 1970年からの経過時間"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64) * 24
+
+
+class HourlySeries:
+    """項目ごとに UTC の毎時で揃えた配列。欠損は NaN"""
+
+    def __init__(self, start_hour, series):
+        self.start_hour = start_hour
+        self.series = series
+
+    def __len__(self):
+        return max((len(v) for v in self.series.values()), default=0)
+
+    @classmethod
+    def merge(cls, records, fields=None):
+        """
+        Open-Meteo の応答（dict か、複数地点のリスト）を結合する。None や hourly の無い応答は飛ばす
+        fields を省略すると応答に含まれる項目すべて。重なる時刻は後の応答を優先
+        """
+        chunks = {}
+        for record in records:
+            hourly = (record or {}).get("hourly") or {}
+            if "time" not in hourly:
+                continue
+            hours = utc_hours(hourly["time"], record.get("utc_offset_seconds", 0))
+            for name, values in hourly.items():
+                if name == "time" or (fields is not None and name not in fields):
+                    continue
+                # None は float への変換で NaN になる
+                chunks.setdefault(name, []).append((hours, np.array(values, dtype=float)))
+
+        all_hours = [h for parts in chunks.values() for h, _ in parts if len(h)]
+        if not all_hours:
+            return cls(0, {name: np.empty(0) for name in (fields or ())})
+        start = int(min(h.min() for h in all_hours))
+        end = int(max(h.max() for h in all_hours)) + 1
+        series = {}
+        for name in fields or chunks:
+            arr = np.full(end - start, np.nan)
+            for hours, values in chunks.get(name, ()):
+                arr[hours - start] = values
+            series[name] = arr
+        return cls(start, series)
+
+    @classmethod
+    def from_response(cls, *records):
+        """1地点ぶんの応答（いくつでも）から作る"""
+        return cls.merge(records)
+
+    def window(self, name, first_hour, n_days, span):
+        """UTC時刻 first_hour から 24時間刻みで span 幅を切り出した (D, span)。(配列, 範囲内か)"""
+        return self._take(name, first_hour + 24 * np.arange(n_days), span)
+
+    def days(self, name, dates, span, start=0, tz_hours=0):
+        """
+        各日付の現地 start 時（UTC から tz_hours 進んだ時刻。負なら前日）から span 時間を (D, span) で。
+        (配列, 範囲内か)。項目が無ければすべて NaN・範囲外
+        """
+        return self._take(name, date_hours(dates) - tz_hours + start, span)
+
+    def _take(self, name, first_hours, span):
+        arr = self.series.get(name)
+        idx = np.asarray(first_hours, dtype=np.int64)[:, None] - self.start_hour + np.arange(span)[None, :]
+        if arr is None or not len(arr):
+            return np.full(idx.shape, np.nan), np.zeros(len(idx), dtype=bool)
+        inside = (idx >= 0) & (idx < len(arr))
+        return np.where(inside, arr[np.clip(idx, 0, len(arr) - 1)], np.nan), inside.all(axis=1)
+
+    def fill_gaps(self, name, max_gap):
+        """max_gap 時間以下の欠損を前後の値から線形補間で埋める（両端や長い欠損は NaN のまま）。self を返す"""
+        arr = self.series.get(name)
+        if arr is None:
+            return self
+        ok = np.isfinite(arr)
+        if ok.all() or not ok.any():
+            return self
+        idx = np.arange(len(arr))
+        out = np.interp(idx, idx[ok], arr[ok])
+        # 欠損の連続長を求め、長いものと両端は埋めない
+        prev_ok = np.maximum.accumulate(np.where(ok, idx, -1))
+        next_ok = np.minimum.accumulate(np.where(ok, idx, len(arr))[::-1])[::-1]
+        fill = ~ok & (prev_ok >= 0) & (next_ok < len(arr)) & (next_ok - prev_ok - 1 <= max_gap)
+        self.series[name] = np.where(ok | fill, out, np.nan)
+        return self
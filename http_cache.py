@@ -0,0 +1,203 @@
+"""
+魔釣 永続HTTPキャッシュ（SQLite）
+
+st.cache_data はプロセス内メモリのため、再起動・レプリカ追加のたびに空になる。
+同一ホスト上のプロセス間で共有できるよう、正規化URLをキーに
+レスポンス(JSON)をSQLiteへ保存する。
+
+- TTL 内はそのまま返す (hit)
+- TTL 切れでも STALE 期間内なら古い値を即返し、裏で再取得する (stale)
+- 合計サイズが上限を超えたら最終アクセスが古い順に削除 (LRU)
+- STALE も過ぎていても、取り直しに失敗したら（上流の障害・遮断中）残っている値を返す (expired)
+
+接続はスレッドごとに1本を使い回す（PRAGMA は接続時の1回だけ）。
+裏での取り直しは REFRESH_WORKERS 本のスレッドプールで、同じキーは同時に1本だけ
+"""
+import concurrent.futures
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import telemetry
+
+# --- 設定（環境変数で上書き可） ---
+CACHE_DIR = os.environ.get("MATSURI_CACHE_DIR", os.path.join(tempfile.gettempdir(), "matsuri-cache"))
+CACHE_TTL = float(os.environ.get("MATSURI_CACHE_TTL", 3600))
+CACHE_STALE = float(os.environ.get("MATSURI_CACHE_STALE", 86400))
+CACHE_MAX_BYTES = int(float(os.environ.get("MATSURI_CACHE_MAX_MB", 64)) * 1024 * 1024)
+REFRESH_WORKERS = int(os.environ.get("MATSURI_CACHE_REFRESH_WORKERS", 2))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def normalize_url(url):
+    """スキーム/ホストの大文字小文字とクエリの順序を正規化したキャッシュキー"""
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+
+
+class DiskCache:
+    def __init__(self, directory=None, ttl=None, stale=None, max_bytes=None):
+        self.directory = directory or CACHE_DIR
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.stale = CACHE_STALE if stale is None else stale
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.path = os.path.join(self.directory, "http_cache.sqlite3")
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=REFRESH_WORKERS,
+                                                               thread_name_prefix="cache-refresh")
+        os.makedirs(self.directory, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        """このスレッドの接続（初回だけ開く）。複数プロセスから同時に読み書きできるよう WAL モード"""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _bump(self, con, name, n=1):
+        con.execute(
+            "INSERT INTO stats(name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, n, n),
+        )
+
+    def get(self, key):
+        """(値, 保存からの経過秒) を返す。無ければ None"""
+        now = time.time()
+        con = self._connect()
+        row = con.execute("SELECT body, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        con.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), now - row[1]
+
+    def age(self, key):
+        """保存からの経過秒（LRU順は更新しない）。無ければ None"""
+        row = self._connect().execute("SELECT stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def set(self, key, value):
+        body = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        now = time.time()
+        con = self._connect()
+        con.execute(
+            "INSERT OR REPLACE INTO responses(key, body, size, stored_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, body, len(body.encode()), now, now),
+        )
+        self._evict(con)
+
+    def _evict(self, con):
+        total = 0
+        drop = []
+        for key, size in con.execute("SELECT key, size FROM responses ORDER BY last_access DESC"):
+            total += size
+            if total > self.max_bytes:
+                drop.append((key,))
+        if drop:
+            con.executemany("DELETE FROM responses WHERE key = ?", drop)
+            self._bump(con, "evictions", len(drop))
+
+    def _refresh(self, url, key, fetcher):
+        try:
+            value = fetcher(url)
+            if value is not None:
+                self.set(key, value)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def fetch(self, url, fetcher):
+        """
+        キャッシュ経由で fetcher(url) の結果を返す（stale-while-revalidate）
+        """
+        key = normalize_url(url)
+        entry = self.get(key)
+        if entry is not None:
+            value, age = entry
+            if age < self.ttl:
+                self.count("hits")
+                telemetry.annotate(cache="hit", age=round(age))
+                return value
+            if age < self.ttl + self.stale:
+                self.count("stale_hits")
+                telemetry.annotate(cache="stale", age=round(age))
+                with self._lock:
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    self._executor.submit(self._refresh, url, key, fetcher)
+                return value
+
+        self.count("misses")
+        telemetry.annotate(cache="miss")
+        value = fetcher(url)
+        if value is not None:
+            self.set(key, value)
+        elif entry is not None:
+            # 取れなかったときは古すぎる値でも無いよりよい
+            self.count("expired_hits")
+            telemetry.annotate(cache="expired", age=round(entry[1]))
+            return entry[0]
+        return value
+
+    def refresh(self, url, fetcher, max_age=0):
+        """
+        保存から max_age 秒以上経っていれば取り直す（先読み用）。取り直して保存できたら True
+        """
+        key = normalize_url(url)
+        age = self.age(key)
+        if age is not None and age < max_age:
+            return False
+        value = fetcher(url)
+        if value is None:
+            return False
+        self.set(key, value)
+        self.count("refreshes")
+        return True
+
+    def count(self, name):
+        self._bump(self._connect(), name)
+
+    def stats(self):
+        con = self._connect()
+        out = {"hits": 0, "stale_hits": 0, "expired_hits": 0, "misses": 0, "evictions": 0}
+        out.update(dict(con.execute("SELECT name, value FROM stats")))
+        out["entries"], out["bytes"] = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return out
+
+    def clear(self):
+        con = self._connect()
+        con.execute("DELETE FROM responses")
+        con.execute("DELETE FROM stats")
+
+
+def open_default():
+    """既定ディレクトリのキャッシュを開く。書き込めない環境では None（キャッシュ無しで動作）"""
+    try:
+        return DiskCache()
+    except (OSError, sqlite3.Error):
+        return None
@@ -0,0 +1,164 @@
+"""
+魔釣 画面の静的部品（CSS・ヘッダー・免責事項）
+
+Streamlit は操作のたびに streamlit_app.py を頭から実行し直すが、import したモジュールは
+プロセスに1回しか読み込まれない。変わらない HTML/CSS はここに置き、再実行ごとに作り直さない。
+"""
+
+PAGE_TITLE = "魔釣 - 岡山・下津井タイラバ予報 v1.9"
+PAGE_ICON = "🍑"
+
+# --- CSS (プレミアムデザイン設定) ---
+CSS = """
+    <style>
+    @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+JP:wght@400;700;900&family=Roboto:wght@500;700&display=swap');
+
+    /* 全体の背景：桃色グラデーション */
+    .stApp {
+        background: linear-gradient(180deg, #fff0f5 0%, #ffffff 100%);
+        font-family: 'Noto Sans JP', sans-serif;
+    }
+
+    /* タイトルロゴ風デザイン（修正：漢字で見やすく） */
+    .title-logo {
+        font-family: 'Noto Sans JP', sans-serif;
+        font-weight: 900;
+        font-size: 2.4rem; /* 少し大きく */
+        background: linear-gradient(45deg, #ff6b81, #ff9f43);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
+        margin-bottom: 0;
+        line-height: 1.2;
+    }
+    
+    .subtitle {
+        font-size: 0.9rem;
+        color: #777;
+        margin-top: -5px;
+        margin-bottom: 25px;
+        font-weight: 700;
+        letter-spacing: 1px;
+    }
+
+    /* カード（グラスモーフィズム） */
+    .glass-card {
+        background: rgba(255, 255, 255, 0.7);
+        backdrop-filter: blur(10px);
+        -webkit-backdrop-filter: blur(10px);
+        border-radius: 16px;
+        border: 1px solid rgba(255, 255, 255, 0.8);
+        box-shadow: 0 8px 32px 0 rgba(255, 105, 135, 0.10);
+        padding: 20px;
+        margin-bottom: 20px;
+    }
+
+    /* 注目情報の強調 */
+    .highlight-box {
+        background: linear-gradient(135deg, #fff5f7 0%, #ffeef2 100%);
+        border-left: 5px solid #ff6b81;
+        padding: 15px;
+        border-radius: 8px;
+        color: #444;
+        margin-bottom: 15px;
+        box-shadow: 0 2px 5px rgba(0,0,0,0.05);
+    }
+
+    /* テーブルデザイン（モダン） */
+    table.matsuri-table {
+        width: 100%;
+        border-collapse: separate;
+        border-spacing: 0;
+        border-radius: 12px;
+        overflow: hidden;
+        font-family: 'Roboto', 'Noto Sans JP', sans-serif;
+        font-size: 13px;
+        color: #333;
+        margin-bottom: 20px;
+        background-color: #ffffff;
+        box-shadow: 0 4px 15px rgba(0,0,0,0.05);
+    }
+    table.matsuri-table th {
+        background: linear-gradient(to bottom, #ffe6eb, #ffccd5);
+        color: #444;
+        font-weight: 700;
+        padding: 12px 6px;
+        text-align: center;
+        border-bottom: 1px solid #ffccd5;
+        white-space: nowrap;
+    }
+    table.matsuri-table td {
+        padding: 10px 6px;
+        text-align: center;
+        border-bottom: 1px solid #f0f0f0;
+        vertical-align: middle;
+        line-height: 1.4;
+        transition: background-color 0.2s;
+    }
+    /* 行のホバーエフェクト */
+    table.matsuri-table tr:hover td {
+        background-color: #fff0f5;
+    }
+    table.matsuri-table tr:last-child td {
+        border-bottom: none;
+    }
+
+    /* 列ごとのスタイル */
+    .col-time { width: 15%; font-weight: bold; font-size: 12px; color: #555; }
+    .col-honmei { width: 25%; color: #d63031; font-weight: bold; font-size: 14px; }
+    .col-osae { width: 25%; color: #0984e3; font-size: 13px; }
+    .col-tac { width: 15%; font-size: 12px; font-weight: 500; }
+    .col-note { width: 20%; font-size: 11px; text-align: left; color: #666; }
+
+    /* ボタンのカスタマイズ */
+    div.stButton > button {
+        background: linear-gradient(45deg, #ff6b81, #ff4757);
+        color: white;
+        border: none;
+        border-radius: 50px;
+        padding: 10px 24px;
+        font-weight: bold;
+        box-shadow: 0 4px 10px rgba(255, 71, 87, 0.3);
+        transition: all 0.3s ease;
+    }
+    div.stButton > button:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 6px 15px rgba(255, 71, 87, 0.4);
+    }
+
+    /* スマホ調整 */
+    @media (max-width: 640px) {
+        table.matsuri-table { font-size: 11px; }
+        .col-time { font-size: 10px; }
+        .col-tac { font-size: 10px; }
+        .col-honmei { font-size: 12px; }
+    }
+    </style>
+"""
+
+HEADER_HTML = """
+        <div style='text-align: center; margin-bottom: 20px;'>
+            <h1 class="title-logo">🍑 魔釣 <span style='font-size:1.6rem; color:#444;'>岡山</span></h1>
+            <p class="subtitle">下津井タイラバ予報 | 潮流×独自理論</p>
+        </div>
+    """
+
+DISCLAIMER_HTML = """
+            <div style='background-color: #fff0f5; padding: 15px; border-radius: 8px; color: #666; font-size: 11px; border: 1px solid #ffccd5;'>
+                <strong>【⚠️ 免責事項・利用規約】</strong><br><br>
+                <strong>1. 情報の正確性</strong><br>
+                本アプリの予報は独自の計算ロジックに基づく推測値であり、実際の気象・海況とは異なる場合があります。<br><br>
+                <strong>2. 安全の確保（重要）</strong><br>
+                出船の可否や現場での安全判断については、必ず<strong>海上保安庁の警報</strong>や<strong>船長の指示</strong>を最優先してください。<br>
+                本アプリを航海用海図（ナビゲーション）の代わりに使用することは絶対にお止めください。<br><br>
+                <strong>3. 責任の所在</strong><br>
+                本アプリの利用に起因するいかなる損失・損害についても、開発者は一切の責任を負わず、補償等は行いません。<br><br>
+                <strong>4. 営利利用の禁止</strong><br>
+                本アプリのデータを<strong>第三者へ販売、再配布、または営利目的で利用することを固く禁じます。</strong><br>
+                本アプリは個人の趣味の範囲でご利用ください。<br><br>
+                <div style='text-align: right; margin-top: 10px;'>
+                    <a href="https://open-meteo.com/" target="_blank" style="text-decoration: none; color: #555;">Weather data by Open-Meteo.com</a><br>
+                    © 2026 魔釣 - Matsuri Fishing Forecast (Okayama Edition)
+                </div>
+            </div>
+            """
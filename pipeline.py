@@ -0,0 +1,190 @@
+"""
+魔釣 1日予報のパイプライン（段階ごとのメモ化）
+
+取得 → 整形 → スコア → 戦術 → 表示 の各段階を、その段階の入力をキーにしてメモ化する。
+取得結果は中身のハッシュ(fingerprint)で識別するので、同じデータでの再実行では
+スコア計算・戦術評価・HTML/グラフ生成をすべて省略し、データが更新されたときだけ作り直す。
+メモはプロセス内で共有（セッションをまたいで同じ日付なら再利用）。
+"""
+import collections
+import datetime
+import hashlib
+import json
+import threading
+
+import astronomy
+import fishing_windows
+import forecast_data
+import forecast_engine
+import render
+import spots
+import strategy_rules
+import telemetry
+import tidal_current
+import tide_table
+
+STAGE_ENTRIES = 64
+
+DayResult = collections.namedtuple("DayResult", [
+    "date", "spot", "fingerprint", "moon_age", "tide_name", "sun_min", "sun_h",
+    "fc", "codes", "trend_label", "rows_html", "chart_png", "missing",
+])
+
+
+class StageCache:
+    """段階ごとの LRU メモ"""
+
+    def __init__(self, entries=STAGE_ENTRIES):
+        self.entries = entries
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                telemetry.annotate(memo="hit")
+                return self._items[key]
+            self.misses += 1
+        telemetry.annotate(memo="miss")
+        value = compute()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.entries:
+                self._items.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+STAGES = collections.OrderedDict((name, StageCache()) for name in ("normalize", "score", "strategy", "render"))
+
+
+def stats():
+    return {name: cache.stats() for name, cache in STAGES.items()}
+
+
+def fingerprint(payload):
+    """取得結果の中身のハッシュ（同じデータなら同じ値）"""
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(text.encode(), digest_size=12).hexdigest()
+
+
+def _stage(name, key, compute):
+    with telemetry.span(name):
+        return STAGES[name].get(key, compute)
+
+
+def normalize(sd, wd):
+    """Open-Meteo の応答を時刻を揃えた HourlySeries にする（取得データごとに1回だけ）"""
+    return forecast_data.parse(sd, wd)
+
+
+def _score(target_date, spot, series):
+    mage = forecast_data.get_moon_age(target_date)
+    sun_min = forecast_data.get_sunrise_minutes(target_date, spot)
+    sun_h = int(round(sun_min)) // 60
+    _, fc = forecast_data.score_days(series, [target_date], spot)
+    return mage, sun_min, sun_h, forecast_engine.Forecast._make(f[0] for f in fc)
+
+
+def run_day(target_date, fetch=None, spot=None, draw=True):
+    """
+    1日分の予報を段階ごとのメモを使って作る。fetch(date) → (sd, wd)（省略時は forecast_data から取得）
+    draw=False なら表示段階（表HTML・グラフ）を省く（JSON API 用）
+    """
+    spot = spot or spots.DEFAULT_SPOT
+    fetch = fetch or (lambda d: forecast_data.fetch_weather_range(d, d))
+    with telemetry.span("get_weather_data"):
+        sd, wd = fetch(target_date)
+    currents = tidal_current.latest()  # 取り込みは先読みが受け持つ（ここでは通信しない）
+    tides = tide_table.load_default(build=False)
+    # 潮流の表が更新されたとき・潮汐表が用意できたとき（それまでは月齢から推定）もスコアを作り直す
+    fp = fingerprint([sd, wd, currents and currents.digest, tides and tides.signature])
+    # 取れなかった API（水温は平年値、天気は未反映で計算する）
+    missing = tuple(api for api, data in (("marine", sd), ("forecast", wd)) if not data)
+
+    series = _stage("normalize", fp, lambda: normalize(sd, wd))
+    mage, sun_min, sun_h, fc = _stage("score", (fp, target_date, spot.key), lambda: _score(target_date, spot, series))
+    codes = _stage("strategy", (fp, target_date, spot.key), lambda: strategy_rules.evaluate(
+        forecast_engine.HOURS, sun_h, fc.score, fc.tdiff, target_date.month, fc.temp, fc.cloud, fc.rain, fc.slack
+    ))
+    trend_label = forecast_engine.TREND_LABELS[fc.trend_code]
+
+    def build_render():
+        rows_html = render.hourly_rows_html(fc, codes, trend_label)
+        title = f"{target_date} Okayama Forecast (Moon:{mage:.1f})"
+        png = render.score_chart_png(forecast_engine.HOURS.tolist(), fc.score.tolist(), fc.temp.tolist(), title)
+        return rows_html, png
+
+    rows_html, png = _stage("render", (fp, target_date, spot.key), build_render) if draw else (None, None)
+    return DayResult(target_date, spot, fp, mage, forecast_data.get_tide_name(mage), sun_min, sun_h,
+                     fc, codes, trend_label, rows_html, png, missing)
+
+
+def payload(day, windows=None):
+    """run_day の結果を JSON にできる dict にする（API・スナップショット共通）。windows 省略時は既定の長さで探す"""
+    fc, codes = day.fc, day.codes
+    if windows is None:
+        windows = fishing_windows.for_day(day.date, fc, day.moon_age, day.spot)
+
+    trend = day.trend_label
+    hours = []
+    for i, h in enumerate(forecast_engine.HOURS.tolist()):
+        honmei, osae, speed, hook, tactics = strategy_rules.EVALUATOR.format_row(codes, i)
+        hours.append({
+            "hour": h,
+            "score": int(fc.score[i]),
+            "temp": round(float(fc.temp[i]), 2),
+            "cloud_cover": float(fc.cloud[i]),
+            "wind_speed": float(fc.wind[i]),
+            "rain": float(fc.rain[i]),
+            "weather": forecast_engine.WEATHER_ICONS[fc.weather_code[i]],
+            "wind": forecast_engine.WIND_LABELS[fc.wind_code[i]],
+            "slack": bool(fc.slack[i]),
+            "honmei": honmei,
+            "osae": osae,
+            "speed": speed,
+            "hook": hook,
+            "tactics": tactics,
+            "notes": render.hour_notes(fc, i, trend),
+        })
+
+    best_windows = [
+        {
+            "start": astronomy.sunrise_label(w.start),
+            "end": astronomy.sunrise_label(w.end),
+            "score": w.score,
+            "peak": w.peak,
+            "slack": w.slack,
+            "sunrise": w.sunrise,
+        }
+        for w in windows
+    ]
+
+    bait, colors = forecast_data.get_seasonal_bait(day.date.month)
+    diff_day = float(fc.diff_day)
+    return {
+        "date": day.date.isoformat(),
+        "moon_age": round(day.moon_age, 2),
+        "tide_name": day.tide_name,
+        "sunrise": astronomy.sunrise_label(day.sun_min),
+        "water_temp": {
+            "min": round(float(fc.min_temp), 2),
+            "source": "historical" if bool(fc.use_historical) else "forecast",
+            "diff_day": None if diff_day != diff_day else round(diff_day, 2),
+            "trend": trend,
+        },
+        "sinker": forecast_data.get_sinker_fixed(),
+        "seasonal": {"bait": bait, "colors": colors},
+        "hourly": hours,
+        "best_windows": best_windows,
+        "upstream": forecast_data.data_status(day.date, day.date, day.missing),
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
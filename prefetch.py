@@ -0,0 +1,123 @@
+"""
+魔釣 キャッシュ先読み（バックグラウンド）
+
+ユーザーはほぼ「明日」（st.date_input の既定値）か数日先を見るため、
+今日から HORIZON 日分の取得結果を永続キャッシュへ定期的に先読みし、
+画面・API と同じ pipeline.run_day を一度通して段階ごとのメモ（スコア・戦術・表・グラフ）も作っておく。
+TTL(3600s) が切れる前に一巡するよう間隔を調整するので、ボタン押下時は常にキャッシュから返せる。
+MATSURI_SNAPSHOT_DIR があれば、一巡ごとにスナップショット (snapshots.py) も書き直す。
+"""
+import datetime
+import logging
+import os
+import random
+import threading
+
+import forecast_data
+import pipeline
+import snapshots
+import tidal_current
+import tide_table
+import upstream
+
+# --- 設定（環境変数で上書き可） ---
+PREFETCH_ENABLED = os.environ.get("MATSURI_PREFETCH", "1") != "0"
+PREFETCH_INTERVAL = float(os.environ.get("MATSURI_PREFETCH_INTERVAL", 2700))
+PREFETCH_DAYS = int(os.environ.get("MATSURI_PREFETCH_DAYS", 7))
+PREFETCH_JITTER = float(os.environ.get("MATSURI_PREFETCH_JITTER", 300))
+RANGE_DAYS = 7  # 期間予報の既定（明日から7日）
+
+logger = logging.getLogger("matsuri.prefetch")
+
+
+class _Loop(threading.Thread):
+    """run_once を interval 秒（±jitter）ごとに繰り返すスレッド。stop() で待ちを打ち切って終わる"""
+    interval = 60.0
+    jitter = 0.0
+
+    def __init__(self, name):
+        super().__init__(name=name, daemon=True)
+        self._stop_event = threading.Event()
+
+    def run_once(self, today=None):
+        raise NotImplementedError
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                # 一巡の失敗でスレッドを止めない（次の周期で取り直す）
+                logger.exception("%s: 一巡に失敗", self.name)
+            self._stop_event.wait(max(1.0, self.interval + random.uniform(-self.jitter, self.jitter)))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class Prefetcher(_Loop):
+    def __init__(self, interval=PREFETCH_INTERVAL, days=PREFETCH_DAYS, jitter=PREFETCH_JITTER, cache=None):
+        super().__init__("matsuri-prefetch")
+        self.cache = cache or forecast_data.disk_cache()
+        self.days = days
+        self.jitter = jitter
+        # 次の一巡がジッター込みでも TTL 切れより前に終わるよう間隔を詰める
+        self.interval = max(60.0, min(interval, self.cache.ttl - jitter - 120))
+        # これより新しいエントリは他レプリカが更新済みとみなして取り直さない
+        self.max_age = max(0.0, self.cache.ttl - self.interval - jitter)
+        self.runs = 0
+        self.refreshed = 0
+        self.last_run = None
+
+    def urls(self, today):
+        dates = [today + datetime.timedelta(days=i) for i in range(self.days)]
+        urls = [u for d in dates for u in forecast_data.weather_urls(d, d)]
+        tomorrow = today + datetime.timedelta(days=1)
+        urls += forecast_data.weather_urls(tomorrow, tomorrow + datetime.timedelta(days=RANGE_DAYS - 1))
+        return dates, urls
+
+    def run_once(self, today=None):
+        today = today or datetime.date.today()
+        dates, urls = self.urls(today)
+        refresh = lambda url: self.cache.refresh(url, upstream.fetch_json, self.max_age)
+        self.refreshed += sum(bool(r) for r in upstream.fetch_many(refresh, urls))
+
+        # 潮汐表は利用者の要求の経路では作らないので、ここで用意する（年が替わったときも）
+        tide_table.load_default(today)
+
+        # 潮流予測のページも取り直しておく（変わっていなければ解析しない）。画面・API は取り込み済みの表を引くだけ
+        forecast_data.fetch_currents(max_age=0)
+
+        # 先読みした日付は run_day のメモまで温めておく（キャッシュから読むので通信なし）
+        for d in dates:
+            pipeline.run_day(d)
+
+        # スナップショットを使う設定なら、取り直した直後に書き出しておく
+        if snapshots.SNAPSHOT_DIR:
+            snapshots.generate(today, self.days)
+        self.runs += 1
+        self.last_run = datetime.datetime.now()
+
+class TableMaintainer(_Loop):
+    """先読みを使わないときの代わり。潮汐表を用意し、潮流予測を REFRESH 秒ごとに取り直す"""
+
+    def __init__(self, interval=tidal_current.REFRESH):
+        super().__init__("matsuri-tide-table")
+        self.interval = interval
+
+    def run_once(self, today=None):
+        tide_table.load_default(today or datetime.date.today())
+        forecast_data.fetch_currents(max_age=0)
+
+
+def start_default():
+    """
+    既定設定で先読みを開始し、そのスレッドを返す（stop() で止まる）。
+    無効化されているか永続キャッシュが使えなければ、潮汐表の生成と潮流予測の取り込みだけを続ける TableMaintainer
+    """
+    if not PREFETCH_ENABLED or forecast_data.disk_cache() is None:
+        worker = TableMaintainer()
+    else:
+        worker = Prefetcher()
+    worker.start()
+    return worker
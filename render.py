@@ -0,0 +1,253 @@
+"""
+魔釣 表示部品（HTML表・グラフ）
+
+main() から切り出した描画処理。Streamlit に依存しないため、
+ベンチマークや静的出力からも同じ見た目で生成できる。
+
+グラフは pyplot を通さず Figure を直接作る（グローバルな図の登録簿に溜まらない）。
+画面には PNG にしたものを入力ごとにメモリキャッシュして渡す（上限 CHART_CACHE_MB）。
+matplotlib は最初にグラフを描くときに読み込む（起動時・表だけの利用では読み込まない）。
+"""
+import collections
+import io
+import os
+import threading
+
+import astronomy
+import forecast_engine
+import strategy_rules
+import telemetry
+
+CHART_CACHE_MB = float(os.environ.get("MATSURI_CHART_CACHE_MB", 8))
+CHART_DPI = 150
+
+HOURLY_HEADERS = ("時間", "本命", "抑え", "戦術", "備考")
+RANKING_HEADERS = ("順位", "日付", "ベスト時間", "スコア", "備考")
+SPOT_HEADERS = ("順位", "ポイント", "ベスト時間", "スコア", "備考")
+WINDOW_HEADERS = ("順位", "日付", "時間帯", "スコア", "備考")
+WHATIF_HEADERS = ("重み", "ベスト時間帯", "スコア", "時間別 (5〜15時)", "今の設定との差")
+_COL_CLASSES = ("col-time", "col-honmei", "col-osae", "col-tac", "col-note")
+
+
+def _row(cells):
+    return "<tr>" + "".join(f"<td class='{cls}'>{v}</td>" for cls, v in zip(_COL_CLASSES, cells)) + "</tr>"
+
+
+def age_label(seconds):
+    """データの古さ[秒] → 'N分前' など（不明なら空文字）"""
+    if seconds is None:
+        return ""
+    if seconds < 60:
+        return "たった今"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}分前"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)}時間前"
+    return f"{int(seconds // 86400)}日前"
+
+
+def table_html(headers, rows_html):
+    head = "".join(f"<th>{h}</th>" for h in headers)
+    return f"""<div style="overflow-x:auto;">
+<table class="matsuri-table">
+<thead><tr>{head}</tr></thead>
+<tbody>
+{rows_html}
+</tbody>
+</table>
+</div>"""
+
+
+def hour_notes(fc, i, day_trend_label):
+    """i 時間目の備考（転流・低水温・濁り・前日比）"""
+    low_temp_alert = forecast_engine.LOW_TEMP_LABELS[fc.low_temp_code[i]]
+    notes = []
+    if bool(fc.slack[i]): notes.append("★転流")
+    if low_temp_alert: notes.append(f"⚠️{low_temp_alert}")
+    if float(fc.rain[i]) >= 0.5: notes.append("濁り")
+    if day_trend_label and not low_temp_alert: notes.append(day_trend_label)
+    return notes
+
+
+def hourly_rows_html(fc, codes, day_trend_label):
+    """1日分の Forecast と戦術コードから時間別攻略データの行を作る"""
+    rows = []
+    for i, h in enumerate(forecast_engine.HOURS.tolist()):
+        w_icon = forecast_engine.WEATHER_ICONS[fc.weather_code[i]]
+        wind_text = forecast_engine.WIND_LABELS[fc.wind_code[i]]
+
+        tie1, tie2, spd, hk, tactics = strategy_rules.EVALUATOR.format_row(codes, i)
+
+        time_display = f"{h}:00<br>{w_icon} {wind_text}"
+        tac_display = f"{spd}・{hk}"
+        if tactics: tac_display += f"<br><span style='color:#ff4757; font-weight:bold;'>{tactics}</span>"
+
+        rows.append(_row((time_display, tie1, tie2, tac_display, " ".join(hour_notes(fc, i, day_trend_label)))))
+    return "".join(rows)
+
+
+def ranking_rows_html(dates, mages, fc):
+    """期間予報をベストスコア順に並べた行を作る"""
+    hours = forecast_engine.HOURS
+    best = fc.score.max(axis=1)
+    mean = fc.score.mean(axis=1)
+    order = sorted(range(len(dates)), key=lambda i: (-best[i], -mean[i], dates[i]))
+
+    rows = []
+    for rank, i in enumerate(order, 1):
+        wd_label = "月火水木金土日"[dates[i].weekday()]
+        top_hours = [f"{hours[j]}:00" for j in range(len(hours)) if fc.score[i, j] == best[i]]
+        temp_note = "平年値" if fc.use_historical[i] else f"{fc.min_temp[i]:.1f}℃"
+        trend = forecast_engine.TREND_LABELS[fc.trend_code[i]]
+        rows.append(_row((
+            rank, f"{dates[i].strftime('%m/%d')}({wd_label})", " / ".join(top_hours[:3]),
+            f"{best[i]}点 (平均{mean[i]:.0f})", f"月齢{mages[i]:.1f} {temp_note} {trend}",
+        )))
+    return "".join(rows)
+
+
+def spot_rows_html(spot_list, fc):
+    """全ポイントをベストスコア順に並べた行を作る"""
+    hours = forecast_engine.HOURS
+    best = fc.score.max(axis=1)
+    mean = fc.score.mean(axis=1)
+    order = sorted(range(len(spot_list)), key=lambda i: (-best[i], -mean[i]))
+
+    rows = []
+    for rank, i in enumerate(order, 1):
+        top_hours = [f"{hours[j]}:00" for j in range(len(hours)) if fc.score[i, j] == best[i]]
+        temp_note = "平年値" if fc.use_historical[i] else f"{fc.min_temp[i]:.1f}℃"
+        slack_hours = [f"{hours[j]}時" for j in range(len(hours)) if fc.slack[i, j]]
+        rows.append(_row((
+            rank, spot_list[i].name, " / ".join(top_hours[:3]),
+            f"{best[i]}点 (平均{mean[i]:.0f})", f"{temp_note} 転流 {'・'.join(slack_hours) or '-'}",
+        )))
+    return "".join(rows)
+
+
+def window_rows_html(windows):
+    """fishing_windows の結果（順位順）から行を作る"""
+    rows = []
+    for rank, w in enumerate(windows, 1):
+        wd_label = "月火水木金土日"[w.date.weekday()]
+        notes = []
+        if w.slack: notes.append("★転流")
+        if w.sunrise: notes.append("🌅日の出")
+        rows.append(_row((
+            rank, f"{w.date.strftime('%m/%d')}({wd_label})",
+            f"{astronomy.sunrise_label(w.start)}〜{astronomy.sunrise_label(w.end)}",
+            f"平均{w.score:.0f}点 (最高{w.peak})", " ".join(notes) or "-",
+        )))
+    return "".join(rows)
+
+
+def whatif_rows_html(labels, scores, windows, baseline):
+    """
+    what-if の組ごとの行。scores は組ごとの1日分 (P, H)、windows は組ごとのベスト時間帯のリスト、
+    baseline は今の設定の時間別スコア (H,)
+    """
+    rows = []
+    for label, sc, wins in zip(labels, scores, windows):
+        w = wins[0] if wins else None
+        span = f"{astronomy.sunrise_label(w.start)}〜{astronomy.sunrise_label(w.end)}" if w else "-"
+        score = f"平均{w.score:.0f}点 (最高{w.peak})" if w else "-"
+        delta = sc.astype(int) - baseline
+        up, down = int((delta > 0).sum()), int((delta < 0).sum())
+        change = f"↑{up}時間 ↓{down}時間 (合計{int(delta.sum()):+d})" if up or down else "変化なし"
+        rows.append(_row((label, span, score, " ".join(str(int(v)) for v in sc), change)))
+    return "".join(rows)
+
+
+def score_chart(hours, scores, temps, title):
+    """スコア(棒)と水温(折れ線)の2軸グラフ"""
+    from matplotlib.figure import Figure
+
+    TITLE_SIZE = 14; LABEL_SIZE = 10; TICK_SIZE = 9
+
+    # グラフ背景を透明にしてデザインに馴染ませる
+    fig = Figure(figsize=(10, 5))
+    ax1 = fig.subplots()
+    fig.patch.set_alpha(0)
+    ax1.patch.set_alpha(0)
+
+    color = '#0984e3'
+    ax1.set_ylabel('Score', color=color, fontsize=LABEL_SIZE)
+    ax1.bar(hours, scores, color=color, alpha=0.3, label='Score')
+    ax1.set_ylim(0, 100)
+    ax1.tick_params(axis='y', labelcolor=color, labelsize=TICK_SIZE)
+
+    ax2 = ax1.twinx()
+    color = '#d63031'
+    ax2.set_ylabel('Temp (C)', color=color, fontsize=LABEL_SIZE)
+    ax2.plot(hours, temps, color=color, marker='o', linewidth=2, markersize=6, label='Temp')
+
+    vt = [t for t in temps if t > 0]
+    if vt:
+        margin = 1.0 if max(vt) == min(vt) else 0.5
+        ax2.set_ylim(min(vt) - margin, max(vt) + margin)
+    ax2.tick_params(axis='y', labelcolor=color, labelsize=TICK_SIZE)
+
+    ax2.set_title(title, fontsize=TITLE_SIZE)
+    ax2.grid(axis='x', linestyle='--', alpha=0.3)
+    return fig
+
+
+class PngCache:
+    """グラフPNGのLRUキャッシュ。合計バイト数で上限を掛ける"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._items.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._items[key] = png
+            self.bytes += len(png)
+            while self.bytes > self.max_bytes:
+                _, dropped = self._items.popitem(last=False)
+                self.bytes -= len(dropped)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+CHART_CACHE = PngCache(int(CHART_CACHE_MB * 1024 * 1024))
+
+
+def score_chart_png(hours, scores, temps, title):
+    """score_chart を PNG バイト列にしたもの。同じ入力なら描画し直さずキャッシュから返す"""
+    key = (tuple(hours), tuple(scores), tuple(round(t, 3) for t in temps), title)
+    png = CHART_CACHE.get(key)
+    if png is None:
+        fig = score_chart(hours, scores, temps, title)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=CHART_DPI, bbox_inches="tight")
+        png = buf.getvalue()
+        CHART_CACHE.put(key, png)
+        telemetry.annotate(chart_cache="miss", bytes=len(png))
+    else:
+        telemetry.annotate(chart_cache="hit", bytes=len(png))
+    return png
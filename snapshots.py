@@ -0,0 +1,245 @@
+"""
+魔釣 予報スナップショット（事前生成した静的ファイル）
+
+同じ日付・同じ上流データなら予報の中身は誰が見ても同じなので、今日から N 日分を
+pipeline.run_day で一度だけ作り、ディレクトリに書き出しておく。画面・API はここにある日付を
+計算せずに返し、範囲外（または古い）日付だけその場で計算する。
+
+    python snapshots.py --days 7 --out /srv/matsuri/snapshots   # 1回だけ生成
+    python snapshots.py --watch                                # 先読み間隔ごとに作り直す
+
+出力（日付ごとに取得データの fingerprint 付きのディレクトリ YYYY-MM-DD.<fingerprint>/）:
+    forecast.json   API の /forecast と同じ内容
+    chart.png       スコア・水温グラフ
+    parts.json      画面用の HTML 断片（時間別の表・ベスト時間帯の表）
+    index.html      単体で開けるページ（静的ファイルサーバー向け）
+index.json          日付ごとの fingerprint・生成時刻・ディレクトリ名。最後に書く
+
+日付ごとの4ファイルは一時ディレクトリに書いてから os.replace 1回で差し替えるので、
+読み手が書きかけや別の版の組み合わせを見ることはない。index.json も一時ファイルから差し替え、
+前の index.json が指していた版は次の生成まで残す（読んでいる途中の読み手のため）。
+取得データの fingerprint が前回と同じ日付は書き直さない。
+上流の取得状況（データの古さ）は生成時ではなく、load で返すときに求め直す。
+MATSURI_SNAPSHOT_DIR を設定すると画面・API・先読みがそのディレクトリを使う（未設定なら無効）。
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+
+import fishing_windows
+import forecast_data
+import page_assets
+import pipeline
+import render
+import telemetry
+
+# --- 設定（環境変数で上書き可） ---
+SNAPSHOT_DIR = os.environ.get("MATSURI_SNAPSHOT_DIR", "")
+SNAPSHOT_DAYS = int(os.environ.get("MATSURI_SNAPSHOT_DAYS", 7))
+SNAPSHOT_MAX_AGE = float(os.environ.get("MATSURI_SNAPSHOT_MAX_AGE", 7200))  # これより古い index は使わない
+
+Snapshot = collections.namedtuple("Snapshot", "payload chart_png rows_html windows_html fingerprint")
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _json_bytes(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def page_html(payload, rows_html, windows_html, png_name):
+    """単体で開ける1日分のページ（画面の結果カードと同じ内容）"""
+    wt = payload["water_temp"]
+    if wt["source"] == "historical":
+        temp = f"約{wt['min']:.1f}℃ (平年値)"
+    else:
+        temp = f"{wt['min']:.1f}℃" + ("" if wt["diff_day"] is None else f" ({wt['diff_day']:+.1f}℃)")
+    sinker = payload["sinker"]
+    warning = "<p>⚠️ 前日より水温が低下しています。活性ダウンに注意。</p>" if wt["trend"] == "⚠️前日比↓" else ""
+    return f"""<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{page_assets.PAGE_TITLE} {payload['date']}</title>
+{page_assets.CSS}
+</head><body class="stApp" style="max-width:736px; margin:0 auto; padding:16px;">
+{page_assets.HEADER_HTML}
+<div class="glass-card">
+<div class="highlight-box"><strong>{payload['date']}</strong><br>
+月齢 <b>{payload['moon_age']:.1f}</b> {payload['tide_name']} / 水温 <b>{temp}</b> / 🌅 日の出 <b>{payload['sunrise']}</b></div>
+<div style='text-align: center; font-size: 13px; color: #555;'>
+<strong>⚓ 推奨シンカー (水深目安)</strong><br>
+15m:<b>{sinker['15m']}</b> / 30m:<b>{sinker['30m']}</b> / 45m:<b>{sinker['45m']}</b></div>
+{warning}
+</div>
+<img src="{png_name}" style="width:100%;" alt="score chart">
+<h3>📝 時間別攻略データ</h3>
+{render.table_html(render.HOURLY_HEADERS, rows_html)}
+<h3>🎯 ベスト時間帯</h3>
+{render.table_html(render.WINDOW_HEADERS, windows_html)}
+{page_assets.DISCLAIMER_HTML}
+<p style="font-size:11px; color:#888;">generated {payload['generated_at']}</p>
+</body></html>
+"""
+
+
+def _read_index(directory):
+    try:
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"days": {}}
+
+
+def _write_version(directory, name, files):
+    """files {ファイル名: bytes} を一時ディレクトリに書き、directory/name に os.replace で差し替える"""
+    final = os.path.join(directory, name)
+    tmp = f"{final}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(tmp)
+    for filename, data in files.items():
+        with open(os.path.join(tmp, filename), "wb") as f:
+            f.write(data)
+    if os.path.isdir(final):
+        # 同じ fingerprint の書きかけ（index に載る前に止まった回）。index からは参照されていない
+        shutil.rmtree(final)
+    os.replace(tmp, final)
+
+
+def generate(start_date=None, days=SNAPSHOT_DAYS, directory=None, fetch=None):
+    """
+    start_date から days 日分のスナップショットを書き出す。書き直した日付のリストを返す
+    fetch は pipeline.run_day にそのまま渡す（省略時は forecast_data から取得）
+    """
+    directory = directory or SNAPSHOT_DIR
+    start_date = start_date or datetime.date.today()
+    os.makedirs(directory, exist_ok=True)
+    index = _read_index(directory)
+    entries = {}
+    written = []
+    with telemetry.run("snapshots", date=str(start_date), days=days):
+        for i in range(days):
+            d = start_date + datetime.timedelta(days=i)
+            key = d.isoformat()
+            day = pipeline.run_day(d, fetch)
+            old = index["days"].get(key)
+            if (old and old.get("fingerprint") == day.fingerprint and old.get("dir")
+                    and os.path.isdir(os.path.join(directory, old["dir"]))):
+                entries[key] = old
+                continue
+            with telemetry.span("snapshot_write"):
+                windows = fishing_windows.for_day(d, day.fc, day.moon_age, day.spot)
+                windows_html = render.window_rows_html(windows)
+                payload = pipeline.payload(day, windows)
+                name = f"{key}.{day.fingerprint}"
+                _write_version(directory, name, {
+                    "forecast.json": _json_bytes(payload),
+                    "chart.png": day.chart_png,
+                    "parts.json": _json_bytes({"hourly": day.rows_html, "windows": windows_html}),
+                    "index.html": page_html(payload, day.rows_html, windows_html, "chart.png").encode(),
+                })
+            entries[key] = {"fingerprint": day.fingerprint, "generated_at": payload["generated_at"], "dir": name}
+            written.append(d)
+
+        # index は最後に差し替える（読み手は index に載った版しか見ない）
+        _write_atomic(os.path.join(directory, "index.json"),
+                      _json_bytes({"generated_at": time.time(), "start": start_date.isoformat(), "days": entries}))
+        keep = {e.get("dir") for e in list(entries.values()) + list(index["days"].values())}
+        _prune(directory, start_date, keep)
+    return written
+
+
+def _prune(directory, start_date, keep=()):
+    """start_date より前の日付と、今回・前回の index のどちらにも載っていない版を消す"""
+    for name in os.listdir(directory):
+        head = name.split(".", 1)[0]
+        try:
+            stale = datetime.date.fromisoformat(head) < start_date or name not in keep
+        except ValueError:
+            continue
+        if stale:
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class _Reader:
+    """index.json を mtime が変わったときだけ読み直す"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._index = {"days": {}}
+
+    def index(self, directory):
+        path = os.path.join(directory, "index.json")
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+        with self._lock:
+            if key != self._key:
+                self._index = _read_index(directory)
+                self._key = key
+            return self._index
+
+
+_READER = _Reader()
+
+
+def load(target_date, directory=None, max_age=SNAPSHOT_MAX_AGE):
+    """target_date のスナップショット。無い・古い・読めないときは None（呼び出し側でその場で計算する）"""
+    directory = directory or SNAPSHOT_DIR
+    if not directory:
+        return None
+    index = _READER.index(directory)
+    if not index or time.time() - index.get("generated_at", 0) > max_age:
+        return None
+    entry = index["days"].get(target_date.isoformat())
+    if entry is None or not entry.get("dir"):
+        return None
+    base = os.path.join(directory, entry["dir"])
+    try:
+        with open(os.path.join(base, "forecast.json"), encoding="utf-8") as f:
+            payload = json.load(f)
+        with open(os.path.join(base, "parts.json"), encoding="utf-8") as f:
+            parts = json.load(f)
+        with open(os.path.join(base, "chart.png"), "rb") as f:
+            png = f.read()
+    except (OSError, ValueError):
+        return None
+    # データの古さ・遮断器の状態は今の値にする（取れなかった API は生成時のまま）
+    missing = tuple(api for api, v in payload.get("upstream", {}).items() if not v["ok"])
+    payload["upstream"] = forecast_data.data_status(target_date, target_date, missing)
+    telemetry.annotate(snapshot="hit")
+    return Snapshot(payload, png, parts["hourly"], parts["windows"], entry["fingerprint"])
+
+
+if __name__ == "__main__":
+    import prefetch
+
+    parser = argparse.ArgumentParser(description="今日から N 日分の予報スナップショットを書き出す")
+    parser.add_argument("--days", type=int, default=SNAPSHOT_DAYS)
+    parser.add_argument("--out", default=SNAPSHOT_DIR or "snapshots")
+    parser.add_argument("--watch", action="store_true", help="先読み間隔ごとに作り直し続ける")
+    args = parser.parse_args()
+    while True:
+        forecast_data.fetch_currents(max_age=0)
+        written = generate(days=args.days, directory=args.out)
+        print(f"{args.out}: {len(written)} 日分を更新 ({', '.join(str(d) for d in written) or '変更なし'})")
+        if not args.watch:
+            break
+        time.sleep(prefetch.PREFETCH_INTERVAL)
@@ -0,0 +1,36 @@
+"""
+魔釣 ポイント登録簿（瀬戸内海の釣り場）
+
+各ポイントは 座標・潮時差・月別の平年水温 を持つ。
+潮時差は下津井の潮汐表に対する満干潮のずれ[分]（+ は下津井より遅い）で、
+潮汐表を引く時刻をずらして使う。値は港湾の潮時差表から取った概略値。
+"""
+import collections
+
+Spot = collections.namedtuple("Spot", "key name lat lon tide_offset historical_temps")
+
+SPOTS = collections.OrderedDict((s.key, s) for s in (
+    Spot("shimotsui", "下津井", 34.43, 133.80, 0, {
+        1: 9.5, 2: 9.0, 3: 10.0, 4: 13.5, 5: 18.0, 6: 22.0,
+        7: 26.5, 8: 28.0, 9: 26.0, 10: 22.5, 11: 17.5, 12: 13.0}),
+    Spot("naoshima", "直島", 34.46, 133.99, -10, {
+        1: 9.8, 2: 9.2, 3: 10.2, 4: 13.6, 5: 18.0, 6: 22.0,
+        7: 26.3, 8: 27.8, 9: 26.0, 10: 22.6, 11: 17.8, 12: 13.3}),
+    Spot("ushimado", "牛窓", 34.61, 134.16, -30, {
+        1: 9.6, 2: 9.0, 3: 10.0, 4: 13.3, 5: 17.6, 6: 21.6,
+        7: 26.0, 8: 27.6, 9: 25.8, 10: 22.4, 11: 17.6, 12: 13.2}),
+    Spot("kasaoka", "笠岡諸島", 34.40, 133.52, 15, {
+        1: 10.0, 2: 9.5, 3: 10.5, 4: 13.8, 5: 18.2, 6: 22.2,
+        7: 26.6, 8: 28.0, 9: 26.2, 10: 22.8, 11: 18.0, 12: 13.6}),
+    Spot("tomo", "鞆の浦", 34.38, 133.38, 30, {
+        1: 10.2, 2: 9.7, 3: 10.6, 4: 13.9, 5: 18.3, 6: 22.3,
+        7: 26.6, 8: 28.0, 9: 26.3, 10: 23.0, 11: 18.2, 12: 13.8}),
+))
+
+DEFAULT_SPOT = SPOTS["shimotsui"]
+
+
+def get(key):
+    """キーからポイントを引く。未登録なら KeyError"""
+    return SPOTS[key]
+
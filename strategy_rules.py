@@ -0,0 +1,345 @@
+"""
+魔釣 戦術ルールエンジン（岡山・下津井特化ロジック v1.9 のテーブル化）
+
+ネクタイカラー・形状・巻き速度・フック・戦術を宣言的な決定表で持ち、
+起動時に一度だけ配列演算の評価器へコンパイルする（要素数が少ないときに使う if/elif に展開した版も同時に作る）。
+評価結果はカテゴリコード（整数）で、日本語ラベルへの変換は表示時に行う。
+
+決定表の各行は (条件のタプル, ラベル)。上から順に最初に一致した行を採用する。
+条件は (特徴量, 演算子, 値) の AND。値に特徴量名（文字列）を書くと特徴量どうしを比較する。
+先に評価した出力（color, shape）も後の表の特徴量として使える。
+
+    python strategy_rules.py   # 従来の suggest_strategy との網羅的な一致確認
+"""
+import itertools
+import math
+import operator
+
+import numpy as np
+
+WINTER = (12, 1, 2, 3)
+DEEP_WINTER = (1, 2)
+
+RAIN = ("rain", ">=", 0.5)
+EVEN = ("h_mod2", "==", 0)
+DARK = ("h", "<=", "sun_h")
+
+RULES = {
+    # --- ネクタイカラー選定 ---
+    "color": [
+        ((RAIN, EVEN), "チャート"),
+        ((RAIN,), "シマシマピンク"),
+        ((DARK, EVEN), "ゴールド"),
+        ((DARK,), "蛍光ピンク"),
+        ((("t_diff", "<=", -0.5), EVEN), "レッド"),
+        ((("t_diff", "<=", -0.5),), "黒/海苔"),
+        ((("month", "in", WINTER), ("temp", "<", 12.0), EVEN), "シマシマオレンジ"),
+        ((("month", "in", WINTER), ("temp", "<", 12.0)), "海苔グリーン"),
+        # 低光量（ここまでで雨・日の出前は処理済みなので曇天のみ）
+        ((("cloud", ">", 70), EVEN), "チャート"),
+        ((("cloud", ">", 70),), "赤オレ"),
+        ((("h_mod3", "==", 0),), "定番ピンク"),
+        ((("h_mod3", "==", 1),), "赤オレ"),
+        ((), "オレンジゼブラ"),
+    ],
+    # --- 形状選定 ---
+    "shape": [
+        ((RAIN,), "ワイド強波動"),
+        ((("sc", ">=", 50),), "極太ビッグ"),
+        ((("sc", ">=", 30),), "ビッグカーリー"),
+        ((("sc", ">=", 15),), "ショートカーリー"),
+        ((), "ストレート"),
+    ],
+    # --- 巻き速度 ---
+    "speed": [
+        ((("temp", ">=", 18.0), ("sc", ">=", 40)), "早巻"),
+        ((("temp", "<=", 10.0),), "デッドスロー"),
+        ((("temp", "<=", 12.0),), "激遅"),
+        ((("sc", "<=", 20),), "激遅"),
+        ((("sc", ">=", 30),), "普通"),
+        ((), "遅め"),
+    ],
+    # --- フックサイズ ---
+    "hook": [
+        ((("shape", "==", "極太ビッグ"),), "L"),
+        ((("month", "in", DEEP_WINTER), ("temp", "<", 10.0)), "3S"),
+        ((("month", "in", WINTER),), "SS"),
+        ((("temp", "<", 12.0),), "SS"),
+        ((("sc", ">=", 60), ("temp", ">=", 18.0)), "M"),
+        ((), "S"),
+    ],
+    # --- 戦術オプション ---
+    "tactics": [
+        ((("is_slack", "==", True), ("temp", ">", 12.0)), "底(アコウ)"),
+        ((("sc", "<", 40), ("is_slack", "==", False)), "投(キャスト)"),
+        ((), ""),
+    ],
+    # --- 抑えパターン ---
+    "color2": [
+        ((("color", "==", "定番ピンク"),), "赤オレ"),
+        ((("color", "==", "赤オレ"),), "オレンジゼブラ"),
+        ((("color", "==", "オレンジゼブラ"),), "海老茶"),
+        ((("color", "==", "チャート"),), "ゴールド"),
+        ((("color", "==", "黒/海苔"),), "コーラ"),
+        ((("color", "==", "レッド"),), "オレンジ"),
+        ((), "赤オレ"),
+    ],
+    "shape2": [
+        ((("shape", "in", ("極太ビッグ", "ビッグカーリー", "ワイド強波動")),), "ショート"),
+        ((("shape", "==", "ショートカーリー"),), "極細ストレート"),
+        ((), "カーリー"),
+    ],
+}
+
+INPUTS = ("h", "sun_h", "sc", "t_diff", "month", "temp", "cloud", "rain", "is_slack")
+
+_OPS = {
+    "==": operator.eq, "!=": operator.ne,
+    ">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt,
+    "in": lambda a, b: np.isin(a, b),
+}
+
+# 要素数がこれ以下なら配列演算ではなく、表を if/elif に展開した関数で1要素ずつ引く
+# （1日11時間ぶんなどは配列の条件を作る手間の方が大きい）
+SCALAR_MAX = 256
+
+
+class StrategyEvaluator:
+    """RULES をコンパイルした評価器。同じ条件はまとめて1回だけ評価する"""
+
+    def __init__(self, rules):
+        self.outputs = list(rules)
+        self.labels = {}
+        self.atoms = []       # (特徴量, 演算関数, 比較値, 比較値が特徴量か)
+        self.tables = {}      # 出力名 → ([行ごとの条件番号タプル], [コード])
+        atom_index = {}
+        sources = []          # 条件番号 → 1要素用の Python の式
+
+        for name, rows in rules.items():
+            labels = list(dict.fromkeys(label for _, label in rows))
+            self.labels[name] = tuple(labels)
+            conds, codes = [], []
+            for cond, label in rows:
+                ids = []
+                for feature, op, value in cond:
+                    # 先に評価済みの出力との比較はラベルをコードに置き換える
+                    if feature in self.labels and feature != name:
+                        table = self.labels[feature]
+                        value = tuple(table.index(v) for v in value) if op == "in" else table.index(value)
+                    is_ref = isinstance(value, str)
+                    key = (feature, op, value)
+                    if key not in atom_index:
+                        atom_index[key] = len(self.atoms)
+                        self.atoms.append((feature, _OPS[op], value, is_ref))
+                        sources.append(f"{feature} {op} {value if is_ref else repr(value)}")
+                    ids.append(atom_index[key])
+                conds.append(tuple(ids))
+                codes.append(labels.index(label))
+            self.tables[name] = (conds, codes)
+        self._walk_rows = self._compile_rows(sources)
+
+    def _compile_rows(self, sources):
+        """決定表を1要素ずつの if/elif の連鎖に展開した関数 (入力の列...) → [出力コードのタプル] を作る"""
+        lines = [f"def walk({', '.join(INPUTS)}):", "    out = []",
+                 f"    for {', '.join(INPUTS)} in zip({', '.join(INPUTS)}):",
+                 "        h_mod2 = h % 2", "        h_mod3 = h % 3"]
+        for name in self.outputs:
+            conds, codes = self.tables[name]
+            for k, (ids, code) in enumerate(zip(conds[:-1], codes)):
+                test = " and ".join(f"({sources[i]})" for i in ids)
+                lines += [f"        {'if' if k == 0 else 'elif'} {test}:", f"            {name} = {code}"]
+            lines += ["        else:" if len(conds) > 1 else "        if True:", f"            {name} = {codes[-1]}"]
+        lines += [f"        out.append(({', '.join(self.outputs)},))", "    return out"]
+        namespace = {}
+        exec("\n".join(lines), namespace)
+        return namespace["walk"]
+
+    def __call__(self, **inputs):
+        """各入力は配列（同じ形にブロードキャスト）。出力名 → コード配列 の dict を返す"""
+        feats = {k: np.asarray(inputs[k]) for k in INPUTS}
+        shape = np.broadcast(*feats.values()).shape
+        if math.prod(shape) <= SCALAR_MAX:
+            return self._walk(feats, shape)
+        feats["h_mod2"] = feats["h"] % 2
+        feats["h_mod3"] = feats["h"] % 3
+
+        masks = {}
+
+        def atom(i):
+            if i not in masks:
+                feature, fn, value, is_ref = self.atoms[i]
+                masks[i] = fn(feats[feature], feats[value] if is_ref else value)
+            return masks[i]
+
+        out = {}
+        for name in self.outputs:
+            conds, codes = self.tables[name]
+            choices = []
+            for ids in conds[:-1]:
+                m = np.ones(shape, dtype=bool)
+                for i in ids:
+                    m = m & atom(i)
+                choices.append(m)
+            out[name] = np.broadcast_to(np.select(choices, codes[:-1], codes[-1]), shape)
+            feats[name] = out[name]
+        return out
+
+    def _walk(self, feats, shape):
+        """少ない要素数向け。展開した関数で1要素ずつ引く（結果は配列版と同じ）"""
+        n = math.prod(shape)
+        cols = [[v.item()] * n if v.size == 1 else (v if v.shape == shape else np.broadcast_to(v, shape)).ravel().tolist()
+                for v in map(feats.get, INPUTS)]
+        rows = np.array(self._walk_rows(*cols), dtype=int).reshape(shape + (len(self.outputs),))
+        return {name: rows[..., i] for i, name in enumerate(self.outputs)}
+
+    def label(self, name, code):
+        return self.labels[name][code]
+
+    def format_row(self, codes, i):
+        """suggest_strategy と同じ (本命, 抑え, 速度, フック, 戦術) の文字列に変換"""
+        c = {name: self.labels[name][codes[name][i]] for name in self.outputs}
+        return f"{c['color']}×{c['shape']}", f"{c['color2']}×{c['shape2']}", c["speed"], c["hook"], c["tactics"]
+
+
+EVALUATOR = StrategyEvaluator(RULES)
+
+
+def evaluate(h, sun_h, sc, t_diff, month, temp, cloud_cover, rain, is_slack):
+    return EVALUATOR(h=h, sun_h=sun_h, sc=sc, t_diff=t_diff, month=month,
+                     temp=temp, cloud=cloud_cover, rain=rain, is_slack=is_slack)
+
+
+def suggest_strategy(h, sun_h, sc, t_diff, month, temp, cloud_cover, rain, is_slack):
+    """
+    岡山・下津井特化ロジック v1.9（1行ずつ評価する従来版。決定表の検証用の基準）
+    """
+    c1 = "赤オレ"
+    s1 = "カーリー"
+    speed = "普通"
+    hook = "S"
+
+    # --- ネクタイカラー選定 ---
+    is_low_light = (h <= sun_h) or (cloud_cover > 70) or (rain >= 0.5)
+
+    if rain >= 0.5:
+        c1 = "チャート" if h % 2 == 0 else "シマシマピンク"
+    elif h <= sun_h:
+        c1 = "ゴールド" if h % 2 == 0 else "蛍光ピンク"
+    elif t_diff <= -0.5:
+        c1 = "レッド" if h % 2 == 0 else "黒/海苔"
+    elif month in [12, 1, 2, 3] and (temp < 12.0):
+        c1 = "シマシマオレンジ" if h % 2 == 0 else "海苔グリーン"
+    elif is_low_light:
+        c1 = "チャート" if h % 2 == 0 else "赤オレ"
+    else:
+        rem = h % 3
+        if rem == 0:
+            c1 = "定番ピンク"
+        elif rem == 1:
+            c1 = "赤オレ"
+        else:
+            c1 = "オレンジゼブラ"
+
+    # --- 形状選定 ---
+    if rain >= 0.5:
+        s1 = "ワイド強波動"
+    elif sc >= 50:
+        s1 = "極太ビッグ"
+    elif sc >= 30:
+        s1 = "ビッグカーリー"
+    elif sc >= 15:
+        s1 = "ショートカーリー"
+    else:
+        s1 = "ストレート"
+
+    # --- 巻き速度 ---
+    if temp >= 18.0 and sc >= 40:
+        speed = "早巻"
+    elif temp <= 10.0:
+        speed = "デッドスロー"
+    elif temp <= 12.0 or sc <= 20:
+        speed = "激遅"
+    elif sc >= 30:
+        speed = "普通"
+    else:
+        speed = "遅め"
+
+    # --- フックサイズ ---
+    if s1 == "極太ビッグ":
+        hook = "L"
+    elif month in [1, 2] and temp < 10.0:
+        hook = "3S"
+    elif month in [12, 1, 2, 3] or temp < 12.0:
+        hook = "SS"
+    elif sc >= 60 and temp >= 18.0:
+        hook = "M"
+    else:
+        hook = "S"
+
+    # --- 戦術オプション ---
+    tactics_note = ""
+    if sc < 40 and not is_slack:
+        tactics_note = "投(キャスト)"
+    if is_slack and temp > 12.0:
+        tactics_note = "底(アコウ)"
+
+    # --- 抑えパターン ---
+    if c1 == "定番ピンク": c2 = "赤オレ"
+    elif c1 == "赤オレ": c2 = "オレンジゼブラ"
+    elif c1 == "オレンジゼブラ": c2 = "海老茶"
+    elif c1 == "チャート": c2 = "ゴールド"
+    elif "黒" in c1: c2 = "コーラ"
+    elif "レッド" in c1: c2 = "オレンジ"
+    else: c2 = "赤オレ"
+
+    if "ビッグ" in s1 or "強波動" in s1:
+        s2 = "ショート"
+    elif "ショート" in s1:
+        s2 = "極細ストレート"
+    else:
+        s2 = "カーリー"
+
+    return f"{c1}×{s1}", f"{c2}×{s2}", speed, hook, tactics_note
+
+
+# 各しきい値の直前・ちょうど・直後を網羅する検証用の値（入力空間の同値類をすべて含む）
+VERIFY_GRID = {
+    "h": range(3, 11),  # 日の出前後 × h%2, h%3 の全パターン
+    "sun_h": (5, 6, 7),
+    "sc": (0, 14, 15, 16, 19, 20, 21, 29, 30, 31, 39, 40, 41, 49, 50, 51, 59, 60, 61, 100),
+    "t_diff": (-0.5, -0.49),
+    "month": range(1, 13),
+    "temp": (9.99, 10.0, 10.01, 11.99, 12.0, 12.01, 17.99, 18.0, 25.0),
+    "cloud": (70, 70.01),
+    "rain": (0.49, 0.5),
+    "is_slack": (False, True),
+}
+
+
+def verify(grid=None, chunk=200000):
+    """決定表の評価結果が suggest_strategy と全組み合わせで一致するか確認。(件数, 不一致リスト)"""
+    grid = grid or VERIFY_GRID
+    keys = list(grid)
+    combos = itertools.product(*(grid[k] for k in keys))
+    total, mismatches = 0, []
+    while True:
+        block = list(itertools.islice(combos, chunk))
+        if not block:
+            break
+        cols = {k: np.array([row[i] for row in block]) for i, k in enumerate(keys)}
+        codes = evaluate(cols["h"], cols["sun_h"], cols["sc"], cols["t_diff"], cols["month"],
+                         cols["temp"], cols["cloud"], cols["rain"], cols["is_slack"])
+        for i, row in enumerate(block):
+            expected = suggest_strategy(*row)
+            if EVALUATOR.format_row(codes, i) != expected:
+                mismatches.append((row, expected, EVALUATOR.format_row(codes, i)))
+        total += len(block)
+    return total, mismatches
+
+
+if __name__ == "__main__":
+    n, bad = verify()
+    for row, expected, got in bad[:20]:
+        print("NG", dict(zip(VERIFY_GRID, row)), expected, got)
+    print(f"{n} 通り中 不一致 {len(bad)} 件")
+    raise SystemExit(1 if bad else 0)
@@ -1,330 +1,316 @@
 import streamlit as st
-import pandas as pd
-import json
-import urllib.request
-import urllib.parse
 import datetime
 import math
-import ssl
-import matplotlib.pyplot as plt
+import os
 import warnings
 
+import astronomy
+import forecast_data
+import fishing_windows
+import forecast_engine
+import page_assets
+import pipeline
+import prefetch
+import render
+import snapshots
+import spots
+import telemetry
+import tidal_current
+import upstream
+import whatif
+
 # --- 設定 ---
 warnings.filterwarnings("ignore")
-st.set_page_config(page_title="魔釣 - 岡山・下津井タイラバ予報 v1.9", page_icon="🍑", layout="centered")
-
-# --- CSS (プレミアムデザイン設定) ---
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+JP:wght@400;700;900&family=Roboto:wght@500;700&display=swap');
-
-    /* 全体の背景：桃色グラデーション */
-    .stApp {
-        background: linear-gradient(180deg, #fff0f5 0%, #ffffff 100%);
-        font-family: 'Noto Sans JP', sans-serif;
-    }
-
-    /* タイトルロゴ風デザイン（修正：漢字で見やすく） */
-    .title-logo {
-        font-family: 'Noto Sans JP', sans-serif;
-        font-weight: 900;
-        font-size: 2.4rem; /* 少し大きく */
-        background: linear-gradient(45deg, #ff6b81, #ff9f43);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
-        margin-bottom: 0;
-        line-height: 1.2;
-    }
-    
-    .subtitle {
-        font-size: 0.9rem;
-        color: #777;
-        margin-top: -5px;
-        margin-bottom: 25px;
-        font-weight: 700;
-        letter-spacing: 1px;
-    }
-
-    /* カード（グラスモーフィズム） */
-    .glass-card {
-        background: rgba(255, 255, 255, 0.7);
-        backdrop-filter: blur(10px);
-        -webkit-backdrop-filter: blur(10px);
-        border-radius: 16px;
-        border: 1px solid rgba(255, 255, 255, 0.8);
-        box-shadow: 0 8px 32px 0 rgba(255, 105, 135, 0.10);
-        padding: 20px;
-        margin-bottom: 20px;
-    }
-
-    /* 注目情報の強調 */
-    .highlight-box {
-        background: linear-gradient(135deg, #fff5f7 0%, #ffeef2 100%);
-        border-left: 5px solid #ff6b81;
-        padding: 15px;
-        border-radius: 8px;
-        color: #444;
-        margin-bottom: 15px;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-    }
-
-    /* テーブルデザイン（モダン） */
-    table.matsuri-table {
-        width: 100%;
-        border-collapse: separate;
-        border-spacing: 0;
-        border-radius: 12px;
-        overflow: hidden;
-        font-family: 'Roboto', 'Noto Sans JP', sans-serif;
-        font-size: 13px;
-        color: #333;
-        margin-bottom: 20px;
-        background-color: #ffffff;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.05);
-    }
-    table.matsuri-table th {
-        background: linear-gradient(to bottom, #ffe6eb, #ffccd5);
-        color: #444;
-        font-weight: 700;
-        padding: 12px 6px;
-        text-align: center;
-        border-bottom: 1px solid #ffccd5;
-        white-space: nowrap;
-    }
-    table.matsuri-table td {
-        padding: 10px 6px;
-        text-align: center;
-        border-bottom: 1px solid #f0f0f0;
-        vertical-align: middle;
-        line-height: 1.4;
-        transition: background-color 0.2s;
-    }
-    /* 行のホバーエフェクト */
-    table.matsuri-table tr:hover td {
-        background-color: #fff0f5;
-    }
-    table.matsuri-table tr:last-child td {
-        border-bottom: none;
-    }
-
-    /* 列ごとのスタイル */
-    .col-time { width: 15%; font-weight: bold; font-size: 12px; color: #555; }
-    .col-honmei { width: 25%; color: #d63031; font-weight: bold; font-size: 14px; }
-    .col-osae { width: 25%; color: #0984e3; font-size: 13px; }
-    .col-tac { width: 15%; font-size: 12px; font-weight: 500; }
-    .col-note { width: 20%; font-size: 11px; text-align: left; color: #666; }
-
-    /* ボタンのカスタマイズ */
-    div.stButton > button {
-        background: linear-gradient(45deg, #ff6b81, #ff4757);
-        color: white;
-        border: none;
-        border-radius: 50px;
-        padding: 10px 24px;
-        font-weight: bold;
-        box-shadow: 0 4px 10px rgba(255, 71, 87, 0.3);
-        transition: all 0.3s ease;
-    }
-    div.stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 15px rgba(255, 71, 87, 0.4);
-    }
-
-    /* スマホ調整 */
-    @media (max-width: 640px) {
-        table.matsuri-table { font-size: 11px; }
-        .col-time { font-size: 10px; }
-        .col-tac { font-size: 10px; }
-        .col-honmei { font-size: 12px; }
-    }
-    </style>
-""", unsafe_allow_html=True)
 
 # --- 定数（岡山・下津井エリア設定） ---
-OKAYAMA_LAT = 34.43
-OKAYAMA_LON = 133.80
-
-HISTORICAL_TEMPS = {
-    1: 9.5, 2: 9.0, 3: 10.0, 4: 13.5, 5: 18.0, 6: 22.0,
-    7: 26.5, 8: 28.0, 9: 26.0, 10: 22.5, 11: 17.5, 12: 13.0
-}
-
-KAIHO_URL = "https://www6.kaiho.mlit.go.jp/bisan/currenttide.html"
+KAIHO_URL = tidal_current.PAGE_URL
 SEAT_CHECKER_URL = "" 
 
+# 診断パネル（処理時間の内訳）は ?diag=1 または MATSURI_DIAGNOSTICS=1 のときだけ表示
+DIAGNOSTICS = os.environ.get("MATSURI_DIAGNOSTICS", "0") == "1"
+
 # --- 関数群 ---
+get_moon_age = forecast_data.get_moon_age
+
+get_sinker_fixed = forecast_data.get_sinker_fixed
+
+get_seasonal_bait = forecast_data.get_seasonal_bait
+
 @st.cache_data(ttl=3600)
-def make_request(url):
-    req = urllib.request.Request(url)
-    req.add_header('User-Agent', 'Mozilla/5.0 (App; CPU iPhone OS 15_0)')
-    ctx = ssl.create_default_context()
-    ctx.check_hostname = False
-    ctx.verify_mode = ssl.CERT_NONE
-    try:
-        with urllib.request.urlopen(req, context=ctx) as res:
-            return json.loads(res.read().decode())
-    except:
-        return None
-
-def get_moon_age(date):
-    year, month, day = date.year, date.month, date.day
-    if month < 3: year -= 1; month += 12
-    p = math.floor(year / 4)
-    age = (year + p + month * 9 / 25 + day + 11) % 30
-    return int(age)
-
-def get_sinker_fixed():
-    return {
-        "15m": "30g",
-        "20m": "30g",
-        "30m": "45g",
-        "45m": "60g"
-    }
-
-def estimate_okayama_tide(moon_age, hour):
-    base_high = 9.0; delay = 0.8
-    high_tide = (base_high + (moon_age % 15) * delay) % 12
-    diff = abs(hour - high_tide)
-    if diff > 6: diff = 12 - diff
-    level = math.cos(diff * (math.pi / 6))
-    is_slack = (diff < 1.0 or abs(diff - 6.0) < 1.0)
-    return level, is_slack
-
-def get_seasonal_bait(month):
-    if month in [12, 1, 2, 3]:
-        return "海苔・アミ", "定番ピンク・黒・緑"
-    elif month in [4, 5]:
-        return "真鯛の乗っ込み", "赤オレ・オレンジ・ピンク"
-    elif month in [6, 7, 8]:
-        return "イワシ・イカ", "ゴールド・チャート・グロー"
-    elif month in [9, 10, 11]:
-        return "広範囲ベイト", "赤オレ・オレンジ・エビオレ"
-    else:
-        return "混合", "赤オレ"
-
-def suggest_strategy(h, sun_h, sc, t_diff, month, temp, cloud_cover, rain, is_slack):
+def get_weather_range(start_date, end_date):
+    """期間全体を海洋API・気象APIそれぞれ1回で取得"""
+    telemetry.annotate(st_cache="miss")
+    return forecast_data.fetch_weather_range(start_date, end_date)
+
+def cached_range(start_date, end_date):
+    with telemetry.span("get_weather_data", st_cache="hit", days=(end_date - start_date).days + 1):
+        return get_weather_range(start_date, end_date)
+
+@st.cache_data(ttl=3600)
+def get_spots_weather(start_date, end_date, keys):
+    """全ポイント分を海洋API・気象APIそれぞれ1回（複数座標指定）で取得"""
+    telemetry.annotate(st_cache="miss")
+    return forecast_data.fetch_spots_weather([spots.get(k) for k in keys], start_date, end_date)
+
+def cached_spots(spot_list, start_date, end_date):
+    with telemetry.span("get_weather_data", st_cache="hit", spots=len(spot_list)):
+        return get_spots_weather(start_date, end_date, tuple(s.key for s in spot_list))
+
+@st.cache_resource
+def start_prefetcher():
+    # プロセスごとに1つだけ起動（セッション・再実行をまたいで共有）
+    return prefetch.start_default()
+
+def show_diagnostics():
+    """処理段階ごとの所要時間 (直近の実行の p50/p95) とキャッシュ状況"""
+    with st.expander("🛠 診断（処理時間の内訳）"):
+        rows = telemetry.summary()
+        if rows:
+            import pandas as pd  # 診断パネルを開いたときだけ読み込む
+            st.dataframe(pd.DataFrame(rows).set_index("stage"))
+        else:
+            st.caption("まだ計測データがありません。予報を解析すると表示されます。")
+        st.markdown("**永続キャッシュ**")
+        cache = forecast_data.disk_cache()
+        st.json(cache.stats() if cache else {"enabled": False})
+        st.markdown("**同時リクエストの集約 (single-flight)**")
+        st.json(upstream.SINGLE_FLIGHT.stats())
+        st.markdown("**上流の遮断器**")
+        st.json(upstream.BREAKERS.stats())
+        st.markdown("**潮流予測（海保）の取り込み**")
+        st.json(tidal_current.INGEST.stats())
+        st.markdown("**グラフ画像キャッシュ**")
+        st.json(render.CHART_CACHE.stats())
+        st.markdown("**段階ごとのメモ（整形・スコア・戦術・表示）**")
+        st.json(pipeline.stats())
+
+def fetch_day(target_date):
+    telemetry.annotate(st_cache="hit")  # get_weather_range の本体が動けば miss に上書きされる
+    sd, wd = get_weather_range(target_date, target_date)
+    if not sd or not wd:
+        # 取れなかった結果を1時間抱え込まないよう、この日付の分だけ捨てる（他の日付・期間のキャッシュは残す）
+        get_weather_range.clear(target_date, target_date)
+    return sd, wd
+
+DEGRADED_NOTES = {
+    "marine": "海洋APIに接続できないため、水温は平年値で推定しています",
+    "forecast": "気象APIに接続できないため、風・雨・雲はスコアに反映されていません",
+}
+
+def show_data_status(status):
+    """上流に障害があるときだけ、どのデータが代替・古いのかを知らせる"""
+    notes = []
+    for api, s in status.items():
+        if not s["ok"]:
+            notes.append(f"⚠️ {DEGRADED_NOTES.get(api, api)}")
+        elif s["state"] != "closed":
+            notes.append(f"⚠️ {api} API が不安定なため、{render.age_label(s['age']) or '以前'}に取得したデータを使っています")
+    if notes:
+        st.warning("  \n".join(notes))
+
+@st.fragment
+def show_forecast(target_date):
     """
-    岡山・下津井特化ロジック v1.9
+    1日分の解析結果。スナップショット (snapshots) があれば計算せずに表示し、
+    無ければ段階ごとのメモ (pipeline) から組み立てる（同じ取得データなら再計算しない）
     """
-    c1 = "赤オレ"
-    s1 = "カーリー"
-    speed = "普通"
-    hook = "S"
+    try:
+        with st.spinner('瀬戸大橋の潮を解析中...'), telemetry.run("forecast", date=str(target_date)):
+            snap = snapshots.load(target_date)
+            day = None if snap else pipeline.run_day(target_date, fetch_day)
+            if snap:
+                info = snap.payload
+                moon_age, tide_name, sunrise = info["moon_age"], info["tide_name"], info["sunrise"]
+                use_historical = info["water_temp"]["source"] == "historical"
+                min_t, diff_day = info["water_temp"]["min"], info["water_temp"]["diff_day"]
+                trend_label, chart_png, rows_html = info["water_temp"]["trend"], snap.chart_png, snap.rows_html
+                missing = tuple(api for api, v in info.get("upstream", {}).items() if not v["ok"])
+            else:
+                fc = day.fc
+                moon_age, tide_name, sunrise = day.moon_age, day.tide_name, astronomy.sunrise_label(day.sun_min)
+                use_historical = bool(fc.use_historical)
+                min_t, diff_day = float(fc.min_temp), None if math.isnan(fc.diff_day) else float(fc.diff_day)
+                trend_label, chart_png, rows_html = day.trend_label, day.chart_png, day.rows_html
+                missing = day.missing
+            status = forecast_data.data_status(target_date, target_date, missing)
+            sinker_dict = get_sinker_fixed()
+            
+            # --- 結果表示 ---
+            st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+            
+            # メトリクス表示
+            m_col1, m_col2, m_col3 = st.columns(3)
+            m_col1.metric("月齢", f"{moon_age:.1f}", tide_name)
+            
+            if use_historical:
+                m_col2.metric("推測水温", f"約{min_t:.1f}℃", "平年値")
+            else:
+                delta_t = None if diff_day is None else f"{diff_day:+.1f}℃"
+                m_col2.metric("水温", f"{min_t:.1f}℃", delta_t)
+            
+            weather = status["forecast"]
+            if weather["ok"]:
+                m_col3.metric("天気", "解析済", f"{render.age_label(weather['age'])}のデータ" if weather["age"] else "風/雨/雲")
+            else:
+                m_col3.metric("天気", "取得不可", "未反映", delta_color="off")
+            show_data_status(status)
+            
+            st.markdown("---")
+            
+            # シンカー情報
+            st.markdown(f"""
+            <div style='text-align: center; font-size: 13px; color: #555;'>
+                <strong>⚓ 推奨シンカー (水深目安)</strong><br>
+                15m:<b>{sinker_dict['15m']}</b> / 
+                30m:<b>{sinker_dict['30m']}</b> / 
+                45m:<b>{sinker_dict['45m']}</b><br>
+                <span style='font-size:11px; color:#888;'>※ビッグネクタイ使用時は+1ランク重く</span><br>
+                🌅 日の出 <b>{sunrise}</b>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            if trend_label == "⚠️前日比↓":
+                 st.warning("⚠️ 前日より水温が低下しています。活性ダウンに注意。")
+            
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            # --- グラフ描画 ---
+            with telemetry.span("st_image"):
+                st.image(chart_png, width="stretch")
+
+            st.markdown("### 📝 時間別攻略データ", unsafe_allow_html=True)
+            with telemetry.span("st_table"):
+                st.markdown(render.table_html(render.HOURLY_HEADERS, rows_html), unsafe_allow_html=True)
+            
+            st.caption("※「投」=キャスティング推奨、「底」=潮止まりアコウ狙い")
+
+            # --- ベスト時間帯（分単位） ---
+            st.markdown("### 🎯 ベスト時間帯", unsafe_allow_html=True)
+            length = st.select_slider("時間帯の長さ（分）", [30, 60, 90, 120, 180], fishing_windows.WINDOW_MINUTES, key="window_day")
+            if snap and length == fishing_windows.WINDOW_MINUTES:
+                windows_html = snap.windows_html
+            else:
+                day = day or pipeline.run_day(target_date, fetch_day)
+                windows_html = render.window_rows_html(fishing_windows.for_day(target_date, day.fc, day.moon_age, day.spot, length=length))
+            st.markdown(render.table_html(render.WINDOW_HEADERS, windows_html), unsafe_allow_html=True)
+
+            st.markdown("---")
+            st.subheader("🔗 関連ツール")
+            
+            col_link1, col_link2 = st.columns(2)
+            
+            with col_link1:
+                st.markdown("##### 🌊 公式データ")
+                st.link_button("備讃瀬戸の潮流情報", KAIHO_URL)
+                
+            with col_link2:
+                st.markdown("##### 🚤 釣り座")
+                st.write("Coming Soon...")
+
+            st.markdown("---")
+            st.markdown(page_assets.DISCLAIMER_HTML, unsafe_allow_html=True)
+            
+    except Exception as e:
+        st.error(f"予期せぬエラーが発生しました: {e}")
+        st.warning("日付を変更するか、しばらく時間を置いてから再度お試しください。")
+
+@st.fragment
+def range_card(target_date):
+    # カード2: 期間予報（ベスト日ランキング）。スライダーやボタンの操作ではこのカードだけ再実行する
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    n_days = st.slider("期間予報（日数）", 7, 16, 7)
+    if st.button("📅 期間のベスト日を探す"):
+        st.session_state["range_request"] = (target_date, n_days)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-    # --- ネクタイカラー選定 ---
-    is_low_light = (h <= sun_h) or (cloud_cover > 70) or (rain >= 0.5)
-    
-    if rain >= 0.5:
-        c1 = "チャート" if h % 2 == 0 else "シマシマピンク"
-    elif h <= sun_h:
-        c1 = "ゴールド" if h % 2 == 0 else "蛍光ピンク"
-    elif t_diff <= -0.5:
-        c1 = "レッド" if h % 2 == 0 else "黒/海苔"
-    elif month in [12, 1, 2, 3] and (temp < 12.0):
-        c1 = "シマシマオレンジ" if h % 2 == 0 else "海苔グリーン"
-    elif is_low_light:
-        c1 = "チャート" if h % 2 == 0 else "赤オレ"
-    else:
-        rem = h % 3
-        if rem == 0:
-            c1 = "定番ピンク"
-        elif rem == 1:
-            c1 = "赤オレ"
-        else:
-            c1 = "オレンジゼブラ"
-    
-    # --- 形状選定 ---
-    if rain >= 0.5:
-        s1 = "ワイド強波動"
-    elif sc >= 50: 
-        s1 = "極太ビッグ"
-    elif sc >= 30: 
-        s1 = "ビッグカーリー"
-    elif sc >= 15:
-        s1 = "ショートカーリー"
-    else:
-        s1 = "ストレート"
-    
-    # --- 巻き速度 ---
-    if temp >= 18.0 and sc >= 40:
-        speed = "早巻"
-    elif temp <= 10.0:
-        speed = "デッドスロー"
-    elif temp <= 12.0 or sc <= 20:
-        speed = "激遅"
-    elif sc >= 30:
-        speed = "普通"
-    else:
-        speed = "遅め"
-
-    # --- フックサイズ ---
-    if s1 == "極太ビッグ":
-        hook = "L"
-    elif month in [1, 2] and temp < 10.0:
-        hook = "3S"
-    elif month in [12, 1, 2, 3] or temp < 12.0:
-        hook = "SS"
-    elif sc >= 60 and temp >= 18.0:
-        hook = "M"
-    else:
-        hook = "S"
-
-    # --- 戦術オプション ---
-    tactics_note = ""
-    if sc < 40 and not is_slack:
-        tactics_note = "投(キャスト)"
-    if is_slack and temp > 12.0:
-        tactics_note = "底(アコウ)"
-
-    # --- 抑えパターン ---
-    if c1 == "定番ピンク": c2 = "赤オレ"
-    elif c1 == "赤オレ": c2 = "オレンジゼブラ"
-    elif c1 == "オレンジゼブラ": c2 = "海老茶"
-    elif c1 == "チャート": c2 = "ゴールド"
-    elif "黒" in c1: c2 = "コーラ"
-    elif "レッド" in c1: c2 = "オレンジ"
-    else: c2 = "赤オレ"
-    
-    if "ビッグ" in s1 or "強波動" in s1:
-        s2 = "ショート"
-    elif "ショート" in s1:
-        s2 = "極細ストレート"
-    else:
-        s2 = "カーリー"
-    
-    return f"{c1}×{s1}", f"{c2}×{s2}", speed, hook, tactics_note
+    if st.session_state.get("range_request") != (target_date, n_days):
+        return
 
-@st.cache_data(ttl=3600)
-def get_weather_data(target_date):
-    bm = "https://marine-api.open-meteo.com/v1/marine"
-    bw = "https://api.open-meteo.com/v1/forecast"
-    d_str = target_date.strftime("%Y-%m-%d")
-    y_str = (target_date - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-    
-    p_temp = {"latitude": OKAYAMA_LAT, "longitude": OKAYAMA_LON, "hourly": "sea_surface_temperature", "start_date": y_str, "end_date": d_str}
-    
-    p_weather = {
-        "latitude": OKAYAMA_LAT, 
-        "longitude": OKAYAMA_LON, 
-        "daily": "sunrise", 
-        "hourly": "cloud_cover,wind_speed_10m,rain",
-        "start_date": d_str, 
-        "end_date": d_str, 
-        "timezone": "Asia/Tokyo"
-    }
-    
-    return make_request(f"{bm}?{urllib.parse.urlencode(p_temp)}"), make_request(f"{bw}?{urllib.parse.urlencode(p_weather)}")
+    try:
+        with st.spinner('期間の潮と天気をまとめて解析中...'), telemetry.run("forecast_range", date=str(target_date), days=n_days):
+            dates, mages, fc = forecast_data.forecast_range(target_date, n_days, fetch=cached_range)
+            with telemetry.span("ranking_html_rows"):
+                rows = render.ranking_rows_html(dates, mages, fc)
+            
+            st.markdown("### 📅 期間ベスト日ランキング", unsafe_allow_html=True)
+            st.markdown(render.table_html(render.RANKING_HEADERS, rows), unsafe_allow_html=True)
+
+            st.markdown("### 🎯 期間のベスト時間帯", unsafe_allow_html=True)
+            length = st.select_slider("時間帯の長さ（分）", [30, 60, 90, 120, 180], fishing_windows.WINDOW_MINUTES, key="window_range")
+            windows = fishing_windows.for_range(dates, mages, fc, length=length, k=5)
+            st.markdown(render.table_html(render.WINDOW_HEADERS, render.window_rows_html(windows)), unsafe_allow_html=True)
+            
+    except Exception as e:
+        st.error(f"予期せぬエラーが発生しました: {e}")
+        st.warning("期間を短くするか、しばらく時間を置いてから再度お試しください。")
+
+@st.fragment
+def spots_card(target_date):
+    # カード3: ポイント比較（同じ日の瀬戸内各ポイント）
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    if st.button("🗺 ポイントを比較する"):
+        st.session_state["spots_date"] = target_date
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    if st.session_state.get("spots_date") != target_date:
+        return
+
+    try:
+        with st.spinner('各ポイントの潮と天気をまとめて解析中...'), telemetry.run("forecast_spots", date=str(target_date)):
+            spot_list, mage, fc = forecast_data.forecast_spots(target_date, fetch=cached_spots)
+            with telemetry.span("spot_html_rows"):
+                rows = render.spot_rows_html(spot_list, fc)
+
+            st.markdown(f"### 🗺 {target_date.strftime('%m/%d')} ポイント別ランキング", unsafe_allow_html=True)
+            st.markdown(render.table_html(render.SPOT_HEADERS, rows), unsafe_allow_html=True)
+            st.caption("※潮時差・平年水温は各ポイントの概略値です")
+
+    except Exception as e:
+        st.error(f"予期せぬエラーが発生しました: {e}")
+        st.warning("しばらく時間を置いてから再度お試しください。")
+
+
+@st.fragment
+def whatif_card(target_date):
+    # カード4: スコアの重みの感度。スライダーを動かすとこのカードだけ再実行し、重みの組をまとめて採点し直す
+    with st.expander("🧪 スコアの重みを変えてみる（what-if）"):
+        names = list(whatif.LABELS)
+        axis = st.selectbox("感度を見る項目", names, names.index("slack"), format_func=whatif.LABELS.get, key="whatif_axis")
+        cols = st.columns(3)
+        base = forecast_engine.WEIGHTS._replace(**{
+            name: cols[i % 3].slider(whatif.LABELS[name], *whatif.slider_range(name)[:2],
+                                     getattr(forecast_engine.WEIGHTS, name), whatif.slider_range(name)[2], key=f"whatif_{name}")
+            for i, name in enumerate(whatif.MAIN)
+        })
+        length = st.select_slider("時間帯の長さ（分）", [30, 60, 90, 120, 180], fishing_windows.WINDOW_MINUTES, key="window_whatif")
+
+        try:
+            with telemetry.run("whatif", date=str(target_date)):
+                day = pipeline.run_day(target_date, fetch_day)
+                sets = whatif.sweep(axis, base=base)
+                # 今の設定（最後の1組）も同じ配列演算で採点する
+                result = whatif.evaluate(whatif.for_day(day), sets + [base], length)
+                value = getattr(base, axis)
+                labels = [f"{whatif.LABELS[axis]} {getattr(w, axis):g}" + (" ◀" if getattr(w, axis) == value else "")
+                          for w in sets]
+                rows = render.whatif_rows_html(labels, result.scores[:-1, 0], result.windows[:-1], result.scores[-1, 0])
+            st.markdown(render.table_html(render.WHATIF_HEADERS, rows), unsafe_allow_html=True)
+            st.caption("※ ◀ は今の設定。差は今の設定（スライダーの値）の時間別スコアとの比較です")
+        except Exception as e:
+            st.error(f"予期せぬエラーが発生しました: {e}")
+
+def setup_page():
+    # ページ設定と CSS。文字列は page_assets にあり、プロセスに1回だけ読み込まれる
+    st.set_page_config(page_title=page_assets.PAGE_TITLE, page_icon=page_assets.PAGE_ICON, layout="centered")
+    st.markdown(page_assets.CSS, unsafe_allow_html=True)
 
 # --- メイン画面 ---
 def main():
+    setup_page()
+    start_prefetcher()
+
     # ヘッダー（修正：漢字で見やすく）
-    st.markdown("""
-        <div style='text-align: center; margin-bottom: 20px;'>
-            <h1 class="title-logo">🍑 魔釣 <span style='font-size:1.6rem; color:#444;'>岡山</span></h1>
-            <p class="subtitle">下津井タイラバ予報 | 潮流×独自理論</p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(page_assets.HEADER_HTML, unsafe_allow_html=True)
 
     # カード1: 日付選択とシーズナルパターン
     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
@@ -343,269 +329,18 @@ def main():
         """, unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # 解析結果はセッションに残し、他のウィジェット操作による再実行でも表示を保つ
     if st.button("🌊 予報を解析する"):
-        try:
-            with st.spinner('瀬戸大橋の潮を解析中...'):
-                mage = get_moon_age(target_date)
-                
-                # 月齢による潮名判定
-                age_norm = mage % 15
-                if age_norm <= 2 or age_norm >= 13: tide_name = "大潮(激)"
-                elif 3 <= age_norm <= 5 or 10 <= age_norm <= 12: tide_name = "中潮(速)"
-                else: tide_name = "小潮(緩)"
+        st.session_state["forecast_date"] = target_date
+    if st.session_state.get("forecast_date") == target_date:
+        show_forecast(target_date)
+        whatif_card(target_date)
 
-                sinker_dict = get_sinker_fixed()
-                
-                sd, wd = get_weather_data(target_date)
-                sun_h = int(wd["daily"]["sunrise"][0].split('T')[1].split(':')[0]) if wd else 7
-                
-                r_temps = sd["hourly"]["sea_surface_temperature"] if sd else []
-                r_clouds = wd["hourly"]["cloud_cover"] if (wd and "cloud_cover" in wd["hourly"]) else []
-                r_winds = wd["hourly"]["wind_speed_10m"] if (wd and "wind_speed_10m" in wd["hourly"]) else []
-                r_rains = wd["hourly"]["rain"] if (wd and "rain" in wd["hourly"]) else []
-                
-                OFF = 15
-                use_historical = False
-                valid_data_list = [t for t in r_temps if t is not None and t > 0]
-                
-                day_trend_score = 0
-                day_trend_label = ""
-
-                if not valid_data_list:
-                    use_historical = True
-                    avg_temp = HISTORICAL_TEMPS.get(target_date.month, 15.0)
-                    r_temps = [avg_temp] * 48
-                else:
-                    if len(r_temps) >= 48:
-                        temps_yesterday = [t for t in r_temps[0:24] if t is not None]
-                        temps_today = [t for t in r_temps[24:48] if t is not None]
-
-                        if temps_yesterday and temps_today:
-                            avg_yesterday = sum(temps_yesterday) / len(temps_yesterday)
-                            avg_today = sum(temps_today) / len(temps_today)
-                            diff_day = avg_today - avg_yesterday
-                            
-                            if diff_day <= -0.5:
-                                day_trend_score = -20
-                                day_trend_label = "⚠️前日比↓"
-                            elif diff_day >= 0.5:
-                                day_trend_score = 10
-                                day_trend_label = "前日比↑"
-
-                day_temps = []
-                for h in range(5, 16):
-                    idx = OFF + h
-                    if idx < len(r_temps) and r_temps[idx] is not None:
-                         day_temps.append(r_temps[idx])
-                
-                min_t = min(day_temps) if day_temps else 0
-                max_t = max(day_temps) if day_temps else 0
-                
-                # --- 結果表示 ---
-                st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-                
-                # メトリクス表示
-                m_col1, m_col2, m_col3 = st.columns(3)
-                m_col1.metric("月齢", f"{mage:.1f}", tide_name)
-                
-                if use_historical:
-                    m_col2.metric("推測水温", f"約{min_t}℃", "平年値")
-                else:
-                    delta_t = f"{diff_day:+.1f}℃" if 'diff_day' in locals() else None
-                    m_col2.metric("水温", f"{min_t:.1f}℃", delta_t)
-                
-                m_col3.metric("天気", "解析済", "風/雨/雲")
-                
-                st.markdown("---")
-                
-                # シンカー情報
-                st.markdown(f"""
-                <div style='text-align: center; font-size: 13px; color: #555;'>
-                    <strong>⚓ 推奨シンカー (水深目安)</strong><br>
-                    15m:<b>{sinker_dict['15m']}</b> / 
-                    30m:<b>{sinker_dict['30m']}</b> / 
-                    45m:<b>{sinker_dict['45m']}</b><br>
-                    <span style='font-size:11px; color:#888;'>※ビッグネクタイ使用時は+1ランク重く</span>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if day_trend_label == "⚠️前日比↓":
-                     st.warning("⚠️ 前日より水温が低下しています。活性ダウンに注意。")
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-
-                hl, sl, tl, tll = [], [], [], []
-                table_html_rows = ""
-                
-                for h in range(5, 16):
-                    idx = OFF + h
-                    ct = r_temps[idx] if (idx < len(r_temps) and r_temps[idx] is not None) else (day_temps[0] if day_temps else 15.0)
-                    pt = ct
-                    if idx > 0 and r_temps[idx-1] is not None:
-                        pt = r_temps[idx-1]
-                    
-                    tdiff = ct - pt
-                    if use_historical: tdiff = 0
-                    
-                    cloud = r_clouds[h] if (h < len(r_clouds) and r_clouds[h] is not None) else 0
-                    wind = r_winds[h] if (h < len(r_winds) and r_winds[h] is not None) else 0
-                    rain = r_rains[h] if (h < len(r_rains) and r_rains[h] is not None) else 0
-                    
-                    tlev, slack = estimate_okayama_tide(mage, h)
-                    
-                    # --- スコア計算 ---
-                    sc = 40 # 基礎点
-                    if h == sun_h: sc += 30
-                    if slack: sc += 40 
-                    elif h>5 and abs(tlev - tll[-1]) > 0.3: sc += 30
-                    
-                    if not use_historical:
-                        if tdiff >= 0.1: sc += 20
-                        elif tdiff <= -0.1: sc -= 20
-                    
-                    sc += day_trend_score
-                    
-                    w_icon = ""
-                    if rain >= 0.5:
-                        sc += 10; w_icon = "☔"
-                    elif cloud >= 60: 
-                        sc += 10; w_icon = "☁️"
-                    elif cloud <= 20:
-                        sc -= 5; w_icon = "☀️"
-                    else:
-                        w_icon = "⛅"
-                    
-                    wind_text = ""
-                    if wind >= 10.0:
-                        sc = 0; wind_text = "爆風"
-                    elif wind >= 7.0:
-                        sc -= 10; wind_text = "強風"
-                    elif wind >= 5.0:
-                        sc += 5; wind_text = "やや強"
-                    elif wind >= 2.0:
-                        sc += 20; wind_text = "最適"
-                    else:
-                        sc -= 20; wind_text = "静穏"
-                    
-                    low_temp_alert = ""
-                    if ct <= 10.0:
-                        sc = int(sc * 0.2); low_temp_alert = "激渋"
-                    elif ct <= 12.0:
-                        sc = int(sc * 0.5); low_temp_alert = "低水温"
-                    
-                    if sc < 0: sc = 0
-                    if sc > 100: sc = 100
-                    
-                    tie1, tie2, spd, hk, tactics = suggest_strategy(h, sun_h, sc, tdiff, target_date.month, ct, cloud, rain, slack)
-                    
-                    time_display = f"{h}:00<br>{w_icon} {wind_text}"
-                    tac_display = f"{spd}・{hk}"
-                    if tactics: tac_display += f"<br><span style='color:#ff4757; font-weight:bold;'>{tactics}</span>"
-
-                    notes = []
-                    if slack: notes.append("★転流")
-                    if low_temp_alert: notes.append(f"⚠️{low_temp_alert}")
-                    if rain >= 0.5: notes.append("濁り")
-                    if day_trend_label and not low_temp_alert: notes.append(day_trend_label)
-                    note_str = " ".join(notes)
-                    
-                    hl.append(h); sl.append(sc); tl.append(ct); tll.append(tlev)
-                    
-                    row_html = f"<tr><td class='col-time'>{time_display}</td><td class='col-honmei'>{tie1}</td><td class='col-osae'>{tie2}</td><td class='col-tac'>{tac_display}</td><td class='col-note'>{note_str}</td></tr>"
-                    table_html_rows += row_html
-
-                # --- グラフ描画 ---
-                TITLE_SIZE = 14; LABEL_SIZE = 10; TICK_SIZE = 9
-                title_txt = f"{target_date} Okayama Forecast (Moon:{mage:.1f})"
-                
-                # グラフ背景を透明にしてデザインに馴染ませる
-                fig, ax1 = plt.subplots(figsize=(10, 5))
-                fig.patch.set_alpha(0) 
-                ax1.patch.set_alpha(0)
-                
-                color = '#0984e3'
-                ax1.set_ylabel('Score', color=color, fontsize=LABEL_SIZE)
-                ax1.bar(hl, sl, color=color, alpha=0.3, label='Score')
-                ax1.set_ylim(0, 100)
-                ax1.tick_params(axis='y', labelcolor=color, labelsize=TICK_SIZE)
-                
-                ax2 = ax1.twinx()
-                color = '#d63031'
-                ax2.set_ylabel('Temp (C)', color=color, fontsize=LABEL_SIZE)
-                ax2.plot(hl, tl, color=color, marker='o', linewidth=2, markersize=6, label='Temp')
-                
-                vt = [t for t in tl if t > 0]
-                if vt:
-                     margin = 1.0 if max(vt) == min(vt) else 0.5
-                     ax2.set_ylim(min(vt)-margin, max(vt)+margin)
-                ax2.tick_params(axis='y', labelcolor=color, labelsize=TICK_SIZE)
-                
-                plt.title(title_txt, fontsize=TITLE_SIZE)
-                plt.grid(axis='x', linestyle='--', alpha=0.3)
-                
-                st.pyplot(fig)
+    range_card(target_date)
+    spots_card(target_date)
 
-                st.markdown("### 📝 時間別攻略データ", unsafe_allow_html=True)
-                
-                full_table_html = f"""
-                <div style="overflow-x:auto;">
-                <table class="matsuri-table">
-                    <thead>
-                        <tr>
-                            <th>時間</th>
-                            <th>本命</th>
-                            <th>抑え</th>
-                            <th>戦術</th>
-                            <th>備考</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {table_html_rows}
-                    </tbody>
-                </table>
-                </div>
-                """
-                st.markdown(full_table_html, unsafe_allow_html=True)
-                
-                st.caption("※「投」=キャスティング推奨、「底」=潮止まりアコウ狙い")
-
-                st.markdown("---")
-                st.subheader("🔗 関連ツール")
-                
-                col_link1, col_link2 = st.columns(2)
-                
-                with col_link1:
-                    st.markdown("##### 🌊 公式データ")
-                    st.link_button("備讃瀬戸の潮流情報", KAIHO_URL)
-                    
-                with col_link2:
-                    st.markdown("##### 🚤 釣り座")
-                    st.write("Coming Soon...")
-
-                st.markdown("---")
-                st.markdown("""
-                <div style='background-color: #fff0f5; padding: 15px; border-radius: 8px; color: #666; font-size: 11px; border: 1px solid #ffccd5;'>
-                    <strong>【⚠️ 免責事項・利用規約】</strong><br><br>
-                    <strong>1. 情報の正確性</strong><br>
-                    本アプリの予報は独自の計算ロジックに基づく推測値であり、実際の気象・海況とは異なる場合があります。<br><br>
-                    <strong>2. 安全の確保（重要）</strong><br>
-                    出船の可否や現場での安全判断については、必ず<strong>海上保安庁の警報</strong>や<strong>船長の指示</strong>を最優先してください。<br>
-                    本アプリを航海用海図（ナビゲーション）の代わりに使用することは絶対にお止めください。<br><br>
-                    <strong>3. 責任の所在</strong><br>
-                    本アプリの利用に起因するいかなる損失・損害についても、開発者は一切の責任を負わず、補償等は行いません。<br><br>
-                    <strong>4. 営利利用の禁止</strong><br>
-                    本アプリのデータを<strong>第三者へ販売、再配布、または営利目的で利用することを固く禁じます。</strong><br>
-                    本アプリは個人の趣味の範囲でご利用ください。<br><br>
-                    <div style='text-align: right; margin-top: 10px;'>
-                        <a href="https://open-meteo.com/" target="_blank" style="text-decoration: none; color: #555;">Weather data by Open-Meteo.com</a><br>
-                        © 2026 魔釣 - Matsuri Fishing Forecast (Okayama Edition)
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-        except Exception as e:
-            st.error(f"予期せぬエラーが発生しました: {e}")
-            st.warning("日付を変更するか、しばらく時間を置いてから再度お試しください。")
+    if DIAGNOSTICS or st.query_params.get("diag") == "1":
+        show_diagnostics()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,131 @@
+"""
+魔釣 計測（処理段階ごとの所要時間）
+
+    with telemetry.run("forecast"):
+        with telemetry.span("fetch", api="marine"):
+            ...
+        with telemetry.span("scoring", days=1) as attrs:
+            attrs["rows"] = 11
+
+段階ごとの直近 HISTORY 件の所要時間を保持して p50/p95 を集計できるようにする。
+MATSURI_TELEMETRY_LOG=1 のときは、各 span を終了時に JSON 1行のログ（logger "matsuri.telemetry"）としても出力する。
+下位の処理（キャッシュ・通信）は annotate() で実行中の span に属性を足す。
+"""
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+
+# --- 設定（環境変数で上書き可） ---
+LOG_ENABLED = os.environ.get("MATSURI_TELEMETRY_LOG", "0") == "1"  # span ごとの JSON ログ（既定は出さない）
+HISTORY = int(os.environ.get("MATSURI_TELEMETRY_HISTORY", 200))
+
+logger = logging.getLogger("matsuri.telemetry")
+if LOG_ENABLED and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_run_id = contextvars.ContextVar("matsuri_run_id", default=None)
+_stack = contextvars.ContextVar("matsuri_span_stack", default=())
+
+_lock = threading.Lock()
+_durations = collections.defaultdict(lambda: collections.deque(maxlen=HISTORY))
+
+
+def _emit(record):
+    if LOG_ENABLED:
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def _record(name, ms):
+    with _lock:
+        _durations[name].append(ms)
+
+
+@contextlib.contextmanager
+def run(name, **attrs):
+    """1回の画面処理（ボタン押下など）。中の span はこの run_id でまとまる"""
+    run_id = uuid.uuid4().hex[:12]
+    token = _run_id.set(run_id)
+    t0 = time.perf_counter()
+    error = None
+    try:
+        with span(name, **attrs) as a:
+            yield a
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _run_id.reset(token)
+        _emit({"event": "run", "run": run_id, "name": name,
+               "ms": round((time.perf_counter() - t0) * 1000, 3), "error": error})
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """処理段階1つ分の計測。yield した dict に属性を書き足せる"""
+    attrs = dict(attrs)
+    parent = _stack.get()
+    token = _stack.set(parent + ((name, attrs),))
+    t0 = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        _stack.reset(token)
+        run_id = _run_id.get()
+        # 集計は画面処理（run）内の span だけ。先読みなどの裏処理はログのみ
+        if run_id is not None:
+            _record(name, ms)
+        record = {"event": "span", "run": run_id, "name": name,
+                  "parent": parent[-1][0] if parent else None, "ms": round(ms, 3)}
+        if error:
+            record["error"] = error
+        record.update(attrs)
+        _emit(record)
+
+
+def annotate(**attrs):
+    """実行中の一番内側の span に属性を追加（span 外では何もしない）"""
+    stack = _stack.get()
+    if stack:
+        stack[-1][1].update(attrs)
+
+
+def percentile(values, q):
+    """線形補間なしの最近傍順位法（件数が少なくても実測値のどれかを返す）"""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    k = max(0, min(len(ordered) - 1, math.ceil(q / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def summary():
+    """段階ごとの [{stage, runs, p50_ms, p95_ms, last_ms}]（直近 HISTORY 件）"""
+    with _lock:
+        snapshot = {name: list(d) for name, d in _durations.items()}
+    return [
+        {"stage": name, "runs": len(v), "p50_ms": round(percentile(v, 50), 2),
+         "p95_ms": round(percentile(v, 95), 2), "last_ms": round(v[-1], 2)}
+        for name, v in snapshot.items() if v
+    ]
+
+
+def reset():
+    with _lock:
+        _durations.clear()
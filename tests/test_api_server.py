@@ -0,0 +1,105 @@
+import datetime
+import gzip
+import http.client
+import json
+import logging
+import threading
+
+import pytest
+
+import api_server
+
+TOMORROW = datetime.date.today() + datetime.timedelta(days=1)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(build, **options):
+        server = api_server.ApiServer(("127.0.0.1", 0), api_server.ResponseCache(build=build, **options))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+        def get(path, **headers):
+            con = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+            con.request("GET", path, headers=headers)
+            res = con.getresponse()
+            body = res.read()
+            con.close()
+            return res, body
+
+        return server, get
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _build(calls):
+    def build(d):
+        calls.append(d)
+        return {"date": d.isoformat(), "build": len(calls)}
+    return build
+
+
+def test_etag_and_not_modified(serve):
+    calls = []
+    server, get = serve(_build(calls))
+    res, body = get(f"/forecast?date={TOMORROW}")
+    assert res.status == 200 and json.loads(body) == {"date": TOMORROW.isoformat(), "build": 1}
+    etag = res.getheader("ETag")
+    assert etag and res.getheader("Vary") == "Accept-Encoding"
+
+    res, body = get(f"/forecast?date={TOMORROW}", **{"If-None-Match": etag})
+    assert res.status == 304 and body == b""
+    res, _ = get(f"/forecast?date={TOMORROW}", **{"If-None-Match": '"other"'})
+    assert res.status == 200
+    assert server.cache.stats() == {"entries": 1, "hits": 2, "builds": 1}
+
+
+def test_gzip_only_when_accepted(serve):
+    _, get = serve(_build([]))
+    plain, plain_body = get("/forecast")  # 省略時は明日
+    assert plain.getheader("Content-Encoding") is None
+    res, body = get("/forecast", **{"Accept-Encoding": "gzip, deflate"})
+    assert res.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == plain_body
+    assert res.getheader("ETag") == plain.getheader("ETag")
+
+
+def test_response_cache_expires_and_evicts():
+    calls = []
+    cache = api_server.ResponseCache(ttl=60, entries=2, build=_build(calls))
+    days = [TOMORROW + datetime.timedelta(days=i) for i in range(3)]
+    first = cache.get(days[0])
+    assert cache.get(days[0]) is first
+    cache.get(days[1])
+    cache.get(days[2])  # days[0] が追い出される
+    cache.get(days[0])
+    assert calls == [days[0], days[1], days[2], days[0]]
+
+    expired = api_server.ResponseCache(ttl=0, build=_build(calls))
+    expired.get(days[0])
+    expired.get(days[0])
+    assert expired.stats()["builds"] == 2
+
+
+def test_bad_requests(serve):
+    _, get = serve(_build([]))
+    assert get("/forecast?date=2026-13-01")[0].status == 400
+    assert get(f"/forecast?date={TOMORROW + datetime.timedelta(days=30)}")[0].status == 400
+    assert get("/nope")[0].status == 404
+
+
+def test_internal_error_is_generic_and_logged(serve, caplog):
+    def build(d):
+        raise RuntimeError("/srv/secret/path exploded")
+
+    _, get = serve(build)
+    with caplog.at_level(logging.ERROR, logger="matsuri.api"):
+        res, body = get(f"/forecast?date={TOMORROW}")
+    assert res.status == 500
+    assert b"secret" not in body and json.loads(body) == {"error": "予期せぬエラーが発生しました"}
+    assert any("secret" in r.exc_text for r in caplog.records if r.exc_text)
@@ -0,0 +1,33 @@
+import datetime
+
+import numpy as np
+
+import climatology
+import spots
+
+DATES = [datetime.date(2026, 10, 17), datetime.date(2026, 1, 1), datetime.date(2024, 12, 31), datetime.date(2024, 3, 1)]
+
+
+def _diurnal_table():
+    """季節変化（0時UTC基準）+ 日内変化の表"""
+    seasonal = 20 + 6 * np.sin(2 * np.pi * np.arange(climatology.DAYS)[:, None] / climatology.DAYS)
+    diurnal = 0.3 * np.cos(2 * np.pi * (np.arange(24) - 6) / 24)
+    return climatology.Climatology(seasonal + diurnal, np.zeros((climatology.DAYS, 24)))
+
+
+def test_monthly_window_has_no_step_at_midnight():
+    window = climatology.Climatology.from_monthly(spots.DEFAULT_SPOT.historical_temps).window(DATES)
+    diff = np.diff(window, axis=1)
+    # 日内変化の無い代用品は 0時UTC(添字24) をまたいでも1時間ぶんの季節変化しか動かない
+    np.testing.assert_allclose(diff[:, 23], diff[:, 22], atol=1e-3)
+    np.testing.assert_allclose(diff[:, 23], diff[:, 24], atol=1e-3)
+    assert np.abs(diff).max() < 0.02
+
+
+def test_window_keeps_diurnal_shape_across_days():
+    clim = _diurnal_table()
+    window = clim.window(DATES)
+    diff = np.diff(window, axis=1)
+    # 23時→0時 の変化は前後の時間と同じ大きさ（前日と当日の行の継ぎ目に段差が無い）
+    assert np.abs(diff[:, 23]).max() <= np.abs(diff[:, [22, 24]]).max() + 1e-3
+    assert np.abs(diff).max() < 0.1
@@ -0,0 +1,67 @@
+import datetime
+
+import numpy as np
+
+import astronomy
+import fishing_windows
+import forecast_engine
+import spots
+
+DATES = [datetime.date(2026, 10, 17) + datetime.timedelta(days=i) for i in range(3)]
+
+
+def _forecast():
+    temps = np.stack([np.r_[np.full(24, a), np.full(24, b)] for a, b in ((18.0, 18.8), (19.0, 18.2), (18.5, 18.5))])
+    clouds = np.tile(np.linspace(0, 90, 24), (3, 1))
+    winds = np.tile(np.linspace(1, 9, 24), (3, 1))
+    rains = np.zeros((3, 24))
+    mages = astronomy.moon_age(DATES).tolist()
+    sun_h = astronomy.sunrise_hour(DATES, spots.DEFAULT_SPOT.lat, spots.DEFAULT_SPOT.lon)
+    return mages, forecast_engine.forecast(temps, clouds, winds, rains, mages, sun_h, [18.0] * 3)
+
+
+def test_window_means_match_sliding_mean():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 101, size=(4, 50)).astype(float)
+    for n in (1, 7, 18, 50):
+        expected = np.array([[scores[d, s:s + n].mean() for s in range(50 - n + 1)] for d in range(4)])
+        np.testing.assert_allclose(fishing_windows.window_means(scores, n), expected)
+
+
+def test_top_windows_do_not_overlap_within_a_day():
+    rng = np.random.default_rng(1)
+    n = 6
+    means = fishing_windows.window_means(rng.random((3, 60)), n)
+    picks = fishing_windows.top_windows(means, n, 8)
+    assert len(picks) == 8
+    values = [v for _, _, v in picks]
+    assert values == sorted(values, reverse=True)
+    for i, (d, s, _) in enumerate(picks):
+        for d2, s2, _ in picks[i + 1:]:
+            assert d != d2 or abs(s - s2) >= n
+    # 選ばれた窓の値は、外されていない位置の中で最大（貪欲に取る）
+    first_d, first_s, first_v = picks[0]
+    assert first_v == means.max() and means[first_d, first_s] == first_v
+
+
+def test_top_windows_ties_prefer_earlier_and_stop_when_exhausted():
+    means = np.zeros((2, 5))
+    assert fishing_windows.top_windows(means, 3, 10) == [(0, 0, 0.0), (0, 3, 0.0), (1, 0, 0.0), (1, 3, 0.0)]
+
+
+def test_for_range_uses_the_given_spot():
+    mages, fc = _forecast()
+    spot = spots.get("tomo")
+    got = fishing_windows.for_range(DATES, mages, fc, spot, k=5)
+    minutes = fishing_windows.minute_grid()
+    expected = fishing_windows.search(
+        DATES, mages, fc, astronomy.sunrise_minutes(DATES, spot.lat, spot.lon),
+        fishing_windows._tide(DATES, spot.tide_offset, minutes), k=5, minutes=minutes)
+    assert got == expected
+    assert got != fishing_windows.for_range(DATES, mages, fc, k=5)  # 日の出・潮の時刻がずれる
+    assert fishing_windows.for_range(DATES, mages, fc, k=5) == fishing_windows.for_range(
+        DATES, mages, fc, spots.DEFAULT_SPOT, k=5)
+    # 1日だけなら for_day と同じ
+    one = forecast_engine.Forecast._make(np.asarray(f)[0] for f in fc)
+    assert fishing_windows.for_range(DATES[:1], mages[:1], forecast_engine.Forecast._make(
+        np.asarray(f)[:1] for f in fc), spot) == fishing_windows.for_day(DATES[0], one, mages[0], spot)
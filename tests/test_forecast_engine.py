@@ -0,0 +1,117 @@
+"""ベクトル化したエンジン・決定表と、従来の main() の1時間ずつのループとの突き合わせ"""
+import random
+
+import numpy as np
+import pytest
+
+import forecast_engine
+import strategy_rules
+
+
+def legacy_day(r_temps, r_clouds, r_winds, r_rains, mage, sun_h, month, avg_temp):
+    """従来の main() の 5〜15時 ループ（表示を除いたもの）。(時間別スコア, 水温, 水温差, 転流, 戦術) を返す"""
+    OFF = 15
+    use_historical = False
+    valid_data_list = [t for t in r_temps if t is not None and t > 0]
+    day_trend_score = 0
+    if not valid_data_list:
+        use_historical = True
+        r_temps = [avg_temp] * 48
+    elif len(r_temps) >= 48:
+        temps_yesterday = [t for t in r_temps[0:24] if t is not None]
+        temps_today = [t for t in r_temps[24:48] if t is not None]
+        if temps_yesterday and temps_today:
+            diff_day = sum(temps_today) / len(temps_today) - sum(temps_yesterday) / len(temps_yesterday)
+            if diff_day <= -0.5:
+                day_trend_score = -20
+            elif diff_day >= 0.5:
+                day_trend_score = 10
+
+    day_temps = [r_temps[OFF + h] for h in range(5, 16) if OFF + h < len(r_temps) and r_temps[OFF + h] is not None]
+    rows, tll = [], []
+    for h in range(5, 16):
+        idx = OFF + h
+        ct = r_temps[idx] if (idx < len(r_temps) and r_temps[idx] is not None) else (day_temps[0] if day_temps else 15.0)
+        pt = ct
+        if idx > 0 and r_temps[idx - 1] is not None:
+            pt = r_temps[idx - 1]
+        tdiff = ct - pt
+        if use_historical:
+            tdiff = 0
+        cloud = r_clouds[h] if (h < len(r_clouds) and r_clouds[h] is not None) else 0
+        wind = r_winds[h] if (h < len(r_winds) and r_winds[h] is not None) else 0
+        rain = r_rains[h] if (h < len(r_rains) and r_rains[h] is not None) else 0
+        tlev, slack = forecast_engine.estimate_okayama_tide(mage, h)
+
+        sc = 40
+        if h == sun_h: sc += 30
+        if slack: sc += 40
+        elif h > 5 and abs(tlev - tll[-1]) > 0.3: sc += 30
+        if not use_historical:
+            if tdiff >= 0.1: sc += 20
+            elif tdiff <= -0.1: sc -= 20
+        sc += day_trend_score
+        if rain >= 0.5: sc += 10
+        elif cloud >= 60: sc += 10
+        elif cloud <= 20: sc -= 5
+        if wind >= 10.0: sc = 0
+        elif wind >= 7.0: sc -= 10
+        elif wind >= 5.0: sc += 5
+        elif wind >= 2.0: sc += 20
+        else: sc -= 20
+        if ct <= 10.0: sc = int(sc * 0.2)
+        elif ct <= 12.0: sc = int(sc * 0.5)
+        sc = min(max(sc, 0), 100)
+
+        strategy = strategy_rules.suggest_strategy(h, sun_h, sc, tdiff, month, ct, cloud, rain, slack)
+        rows.append((sc, ct, tdiff, slack, strategy))
+        tll.append(tlev)
+    return rows
+
+
+def _maybe_none(rng, values, rate):
+    return [None if rng.random() < rate else v for v in values]
+
+
+def _case(seed):
+    rng = random.Random(seed)
+    level = rng.uniform(8.0, 24.0)
+    step = (0.0, 0.7, -0.7)[seed % 3]  # 前日比 横ばい・上昇・低下
+    temps = [round(level + rng.uniform(-0.8, 0.8) + (step if i >= 24 else 0), 2) for i in range(48)]
+    kind = seed % 7
+    if kind == 0:
+        temps = [None] * 48                           # 水温が取れない日（平年値）
+    elif kind == 1:
+        temps = temps[:44]                            # 48時間揃っていない（前日比なし）
+    else:
+        temps = _maybe_none(rng, temps, 0.1 if kind == 2 else 0.02)
+    clouds = _maybe_none(rng, [rng.choice((0, 15, 20, 21, 59, 60, 85)) for _ in range(24)], 0.05)
+    winds = _maybe_none(rng, [rng.choice((0.5, 2.0, 4.9, 5.0, 7.0, 9.9, 10.0, 12.0)) for _ in range(24)], 0.05)
+    rains = _maybe_none(rng, [rng.choice((0.0, 0.0, 0.49, 0.5, 2.0)) for _ in range(24)], 0.05)
+    return temps, clouds, winds, rains, rng.uniform(0, 29.5), rng.randint(4, 8), rng.randint(1, 12), level
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_engine_and_decision_table_match_legacy_loop(seed):
+    temps, clouds, winds, rains, mage, sun_h, month, avg = _case(seed)
+    expected = legacy_day(temps, clouds, winds, rains, mage, sun_h, month, avg)
+
+    fc = forecast_engine.forecast_day(temps, clouds, winds, rains, mage, sun_h, avg)
+    codes = strategy_rules.evaluate(forecast_engine.HOURS, sun_h, fc.score, fc.tdiff, month,
+                                    fc.temp, fc.cloud, fc.rain, fc.slack)
+    assert fc.score.tolist() == [r[0] for r in expected]
+    np.testing.assert_allclose(fc.temp, [r[1] for r in expected])
+    np.testing.assert_allclose(fc.tdiff, [r[2] for r in expected], atol=1e-12)
+    assert fc.slack.tolist() == [r[3] for r in expected]
+    assert [strategy_rules.EVALUATOR.format_row(codes, i) for i in range(len(expected))] == [r[4] for r in expected]
+
+
+def test_tide_level_matches_scalar_estimate():
+    ages = np.linspace(0, 29.5, 60)
+    hours = np.arange(4, 17)
+    level, slack = forecast_engine.tide_level(ages[:, None], hours)
+    for i, age in enumerate(ages):
+        for j, h in enumerate(hours):
+            lv, sl = forecast_engine.estimate_okayama_tide(age, h)
+            assert level[i, j] == pytest.approx(lv, abs=1e-12)
+            assert slack[i, j] == sl
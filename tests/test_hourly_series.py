@@ -0,0 +1,78 @@
+import datetime
+
+import numpy as np
+
+import forecast_engine
+import hourly_series
+
+JST = 9 * 3600
+DAY = datetime.date(2026, 10, 17)
+
+
+def _iso(start, n):
+    base = np.datetime64(start, "h")
+    return [str(base + i) for i in range(n)]
+
+
+def test_merge_aligns_utc_and_local_times():
+    # 海洋API は UTC、気象API は現地時刻 (JST) で返る。同じ瞬間は同じ位置に並ぶ
+    marine = {"utc_offset_seconds": 0, "hourly": {"time": _iso("2026-10-16T15", 24),
+                                                  "sea_surface_temperature": list(range(24))}}
+    weather = {"utc_offset_seconds": JST, "hourly": {"time": _iso("2026-10-17T00", 24),
+                                                     "cloud_cover": list(range(100, 124))}}
+    s = hourly_series.HourlySeries.from_response(marine, weather)
+    assert s.start_hour == hourly_series.date_hours([DAY])[0] - 9
+    np.testing.assert_array_equal(s.series["sea_surface_temperature"], np.arange(24))
+    np.testing.assert_array_equal(s.series["cloud_cover"], np.arange(100, 124))
+
+    # 現地 0時から24時間を切り出すと両方とも先頭から
+    sst, inside = s.days("sea_surface_temperature", [DAY], 24, tz_hours=9)
+    np.testing.assert_array_equal(sst[0], np.arange(24))
+    assert inside.tolist() == [True]
+    cloud, _ = s.days("cloud_cover", [DAY], 3, start=5, tz_hours=9)
+    assert cloud[0].tolist() == [105, 106, 107]
+
+
+def test_unixtime_and_overlap_prefers_later_record():
+    t0 = int(hourly_series.date_hours([DAY])[0]) * 3600
+    first = {"hourly": {"time": [t0 + 3600 * i for i in range(4)], "wind_speed_10m": [1, 2, 3, 4]}}
+    second = {"hourly": {"time": [t0 + 3600 * i for i in range(2, 6)], "wind_speed_10m": [30, 40, None, 60]}}
+    s = hourly_series.HourlySeries.merge([first, None, {"hourly": None}, second])
+    np.testing.assert_array_equal(s.series["wind_speed_10m"], [1, 2, 30, 40, np.nan, 60])
+
+
+def test_missing_days_and_fields_are_nan_and_outside():
+    s = hourly_series.HourlySeries.merge([{"hourly": {"time": _iso("2026-10-17T00", 24), "rain": [0.5] * 24}}])
+    values, inside = s.days("rain", [DAY, DAY + datetime.timedelta(days=1), DAY - datetime.timedelta(days=3)], 24)
+    assert inside.tolist() == [True, False, False]
+    assert np.isnan(values[1:]).all() and (values[0] == 0.5).all()
+    # 項目が無い
+    values, inside = s.days("sea_surface_temperature", [DAY], 24)
+    assert np.isnan(values).all() and not inside.any()
+    # 応答が1つも無い
+    empty = hourly_series.HourlySeries.merge([None], fields=("rain",))
+    assert len(empty) == 0 and not empty.days("rain", [DAY], 24)[1].any()
+
+    # 間の日が欠けた2つの応答を結合すると、その日は NaN
+    two = hourly_series.HourlySeries.merge([
+        {"hourly": {"time": _iso("2026-10-17T00", 24), "rain": [1.0] * 24}},
+        {"hourly": {"time": _iso("2026-10-19T00", 24), "rain": [2.0] * 24}},
+    ]).fill_gaps("rain", forecast_engine.SST_MAX_GAP)
+    values, inside = two.days("rain", [DAY + datetime.timedelta(days=i) for i in range(3)], 24)
+    assert inside.all()
+    assert np.isnan(values[1]).all()  # 24時間の欠損は補間しない
+    assert (values[0] == 1.0).all() and (values[2] == 2.0).all()
+
+
+def test_fill_gaps_up_to_the_limit():
+    assert forecast_engine.SST_MAX_GAP == 3
+    nan = np.nan
+    arr = [nan, 10, nan, nan, nan, 14, nan, nan, nan, nan, 19, 20, nan]
+    s = hourly_series.HourlySeries(0, {"sst": np.array(arr, dtype=float)})
+    s.fill_gaps("sst", forecast_engine.SST_MAX_GAP)
+    out = s.series["sst"]
+    np.testing.assert_array_equal(out[1:6], [10, 11, 12, 13, 14])  # 3時間の欠損は直線で埋まる
+    assert np.isnan(out[6:10]).all()  # 4時間は埋めない
+    assert np.isnan(out[0]) and np.isnan(out[-1])  # 両端は埋めない
+    assert out[10:12].tolist() == [19, 20]
+    assert s.fill_gaps("missing", 3) is s
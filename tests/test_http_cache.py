@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import http_cache
+
+URL = "https://marine-api.open-meteo.com/v1/marine?b=2&a=1"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(http_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return http_cache.DiskCache(str(tmp_path), ttl=100, stale=1000, max_bytes=1 << 20)
+
+
+def _wait_refreshed(cache):
+    end = time.monotonic() + 2
+    while cache._refreshing and time.monotonic() < end:
+        time.sleep(0.005)
+    assert not cache._refreshing
+
+
+def test_hit_within_ttl_and_miss_after_stale(cache, clock):
+    calls = []
+    fetcher = lambda url: calls.append(url) or {"n": len(calls)}
+    assert cache.fetch(URL, fetcher) == {"n": 1}
+    clock[0] += 99
+    assert cache.fetch(URL.replace("b=2&a=1", "a=1&b=2"), fetcher) == {"n": 1}  # 正規化で同じキー
+    clock[0] += 1 + 1000
+    assert cache.fetch(URL, fetcher) == {"n": 2}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_stale_value_is_served_while_refreshing_once(cache, clock):
+    cache.fetch(URL, lambda url: {"v": "old"})
+    clock[0] += 150
+    release = threading.Event()
+    calls = []
+
+    def slow(url):
+        calls.append(url)
+        release.wait(2)
+        return {"v": "new"}
+
+    assert cache.fetch(URL, slow) == {"v": "old"}
+    assert cache.fetch(URL, slow) == {"v": "old"}  # 取り直し中の同じキーは2本目を出さない
+    release.set()
+    _wait_refreshed(cache)
+    assert calls == [URL]
+    assert cache.fetch(URL, slow) == {"v": "new"}
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_expired_entry_is_served_when_upstream_fails(cache, clock):
+    cache.fetch(URL, lambda url: {"v": 1})
+    clock[0] += 5000
+    assert cache.fetch(URL, lambda url: None) == {"v": 1}
+    assert cache.stats()["expired_hits"] == 1
+    assert cache.fetch("https://x/v1/forecast", lambda url: None) is None
+
+
+def test_lru_eviction_drops_least_recently_used(tmp_path, clock):
+    value = {"pad": "x" * 100}
+    size = len(http_cache.json.dumps(value, separators=(",", ":")))
+    cache = http_cache.DiskCache(str(tmp_path), ttl=100, stale=0, max_bytes=2 * size)
+    for i, name in enumerate("abc"):
+        clock[0] += 1
+        cache.set(name, value)
+        if name == "b":
+            clock[0] += 1
+            cache.get("a")  # a を使ったので、次に追い出されるのは b
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_connection_is_reused_per_thread(cache):
+    con = cache._connect()
+    assert cache._connect() is con
+    other = []
+    t = threading.Thread(target=lambda: other.append(cache._connect()))
+    t.start()
+    t.join()
+    assert other[0] is not con
+
+
+def test_forecast_data_opens_the_disk_cache_lazily(tmp_path):
+    code = ("import os, forecast_data; d = os.environ['MATSURI_CACHE_DIR']; assert not os.path.exists(d); "
+            "assert forecast_data.disk_cache() is forecast_data.disk_cache(); assert os.listdir(d)")
+    env = dict(os.environ, MATSURI_CACHE_DIR=str(tmp_path / "cache"), MATSURI_TELEMETRY_LOG="0")
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   env=env, check=True)
@@ -0,0 +1,84 @@
+import datetime
+import json
+import os
+
+import pytest
+
+import forecast_data
+import snapshots
+
+START = datetime.date(2026, 10, 20)
+CHANGED = (None, {"hourly": {"time": []}})  # 気象APIの応答だけ変わった（fingerprint が変わる）
+
+
+@pytest.fixture
+def source(monkeypatch):
+    monkeypatch.setattr(forecast_data, "_disk_cache", None)  # load の data_status でキャッシュを開かない
+    data = {}
+    return data, (lambda d: data.get(d, (None, None)))
+
+
+def _index(directory):
+    with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+        return json.load(f)["days"]
+
+
+def test_generate_writes_each_version_atomically(tmp_path, source):
+    _, fetch = source
+    written = snapshots.generate(START, 2, str(tmp_path), fetch)
+    assert written == [START, START + datetime.timedelta(days=1)]
+    days = _index(tmp_path)
+    assert sorted(days) == ["2026-10-20", "2026-10-21"]
+    for entry in days.values():
+        assert sorted(os.listdir(tmp_path / entry["dir"])) == ["chart.png", "forecast.json", "index.html", "parts.json"]
+        assert entry["dir"].endswith(entry["fingerprint"])
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+    snap = snapshots.load(START, str(tmp_path))
+    assert snap.fingerprint == days["2026-10-20"]["fingerprint"]
+    assert snap.payload["date"] == "2026-10-20"
+    assert snap.chart_png.startswith(b"\x89PNG")
+
+
+def test_unchanged_fingerprint_is_not_rewritten(tmp_path, source):
+    data, fetch = source
+    snapshots.generate(START, 2, str(tmp_path), fetch)
+    before = _index(tmp_path)
+    data[START + datetime.timedelta(days=1)] = CHANGED
+    assert snapshots.generate(START, 2, str(tmp_path), fetch) == [START + datetime.timedelta(days=1)]
+    after = _index(tmp_path)
+    assert after["2026-10-20"] == before["2026-10-20"]
+    assert after["2026-10-21"]["dir"] != before["2026-10-21"]["dir"]
+
+
+def test_prune_keeps_current_and_previous_versions(tmp_path, source):
+    data, fetch = source
+    snapshots.generate(START, 1, str(tmp_path), fetch)
+    first = _index(tmp_path)["2026-10-20"]["dir"]
+    data[START] = CHANGED
+    snapshots.generate(START, 1, str(tmp_path), fetch)
+    second = _index(tmp_path)["2026-10-20"]["dir"]
+    # 前の index が指していた版は、読んでいる途中の読み手のために残る
+    assert {first, second} <= set(os.listdir(tmp_path))
+
+    data[START] = (None, {"hourly": {"time": ["2026-10-20T00:00"]}})
+    snapshots.generate(START, 1, str(tmp_path), fetch)
+    third = _index(tmp_path)["2026-10-20"]["dir"]
+    names = set(os.listdir(tmp_path))
+    assert {second, third} <= names and first not in names
+
+    # 開始日より前の日付は消える
+    snapshots.generate(START + datetime.timedelta(days=1), 1, str(tmp_path), fetch)
+    assert not [n for n in os.listdir(tmp_path) if n.startswith("2026-10-20")]
+
+
+def test_load_returns_none_for_missing_or_stale(tmp_path, source):
+    _, fetch = source
+    assert snapshots.load(START, str(tmp_path)) is None  # index が無い
+    snapshots.generate(START, 1, str(tmp_path), fetch)
+    assert snapshots.load(START, str(tmp_path)) is not None
+    assert snapshots.load(START + datetime.timedelta(days=1), str(tmp_path)) is None  # 範囲外の日付
+    assert snapshots.load(START, str(tmp_path), max_age=-1) is None  # index が古い
+    os.remove(tmp_path / _index(tmp_path)["2026-10-20"]["dir"] / "chart.png")
+    assert snapshots.load(START, str(tmp_path)) is None  # 版のファイルが欠けている
+    assert snapshots.load(START, "") is None
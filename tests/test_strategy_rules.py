@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import strategy_rules
+
+# VERIFY_GRID のしきい値の前後を残して間引いたもの
+SMALL_GRID = {
+    "h": range(4, 10),
+    "sun_h": (6,),
+    "sc": (14, 15, 20, 29, 30, 40, 49, 50, 60),
+    "t_diff": (-0.5, -0.49),
+    "month": (1, 3, 6, 12),
+    "temp": (9.99, 10.0, 11.99, 12.0, 12.01, 18.0),
+    "cloud": (70, 70.01),
+    "rain": (0.49, 0.5),
+    "is_slack": (False, True),
+}
+
+
+@pytest.mark.parametrize("chunk", [strategy_rules.SCALAR_MAX, 100000], ids=["walk", "array"])
+def test_decision_table_matches_suggest_strategy(chunk):
+    n, bad = strategy_rules.verify(SMALL_GRID, chunk)
+    assert n == np.prod([len(v) for v in SMALL_GRID.values()])
+    assert bad == []
+
+
+@pytest.mark.slow
+def test_decision_table_matches_suggest_strategy_exhaustively():
+    n, bad = strategy_rules.verify(strategy_rules.VERIFY_GRID)
+    assert n == np.prod([len(v) for v in strategy_rules.VERIFY_GRID.values()])
+    assert bad[:5] == []
+
+
+def test_walk_and_array_paths_agree_on_2d_inputs(monkeypatch):
+    rng = np.random.default_rng(0)
+    h = np.arange(5, 16)
+    args = (h, rng.integers(5, 8, (3, 1)), rng.integers(0, 100, (3, 11)), rng.normal(0, 0.5, (3, 11)),
+            np.array([[1], [6], [12]]), rng.uniform(8, 25, (3, 11)), rng.uniform(0, 100, (3, 11)),
+            rng.uniform(0, 1, (3, 11)), rng.random((3, 11)) < 0.3)
+    walk = strategy_rules.evaluate(*args)
+    monkeypatch.setattr(strategy_rules, "SCALAR_MAX", 0)
+    vector = strategy_rules.evaluate(*args)
+    for name in strategy_rules.EVALUATOR.outputs:
+        assert walk[name].shape == (3, 11)
+        np.testing.assert_array_equal(walk[name], vector[name])
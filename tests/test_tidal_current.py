@@ -0,0 +1,83 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+import tidal_current
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "bench", "fixtures", "kaiho_currenttide.html")
+
+
+def jst(*args):
+    """現地時刻 → 1970年UTCからの経過分"""
+    t = datetime.datetime(*args) - datetime.timedelta(hours=tidal_current.TZ_HOURS)
+    return int((t - datetime.datetime(1970, 1, 1)).total_seconds() // 60)
+
+
+@pytest.fixture(scope="module")
+def table():
+    return tidal_current.parse_page(tidal_current.read_local(FIXTURE), "下津井")
+
+
+def events(table):
+    return dict(zip(table.minutes.tolist(), table.speed.tolist()))
+
+
+def test_picks_the_station_table(table):
+    assert "下津井" in table.title
+    assert table.minutes[0] == jst(2026, 10, 16, 4, 39)
+    assert np.all(np.diff(table.minutes) > 0)
+    other = tidal_current.parse_page(tidal_current.read_local(FIXTURE), "男木島")
+    assert other.speed[1] == -2.8  # 先頭の表（東部）: 09:17 西流 2.8
+
+
+def test_rowspan_rows_are_shifted_into_place(table):
+    ev = events(table)
+    # 日付のセルが省かれた2行目以降も、転流・最強・流向・流速の列が合う
+    assert ev[jst(2026, 10, 16, 11, 56)] == 0.0
+    assert ev[jst(2026, 10, 16, 15, 14)] == 3.7
+    assert ev[jst(2026, 10, 17, 12, 36)] == 0.0
+    assert ev[jst(2026, 10, 17, 16, 5)] == 3.0
+    assert ev[jst(2026, 10, 17, 21, 59)] == -0.7
+
+
+def test_starred_times_are_next_day(table):
+    ev = events(table)
+    assert ev[jst(2026, 10, 17, 2, 25)] == 2.0    # 10月16日の行の 02:25*
+    assert ev[jst(2026, 10, 20, 1, 30)] == -0.4   # 10月19日の行の 01:30*
+    assert jst(2026, 10, 16, 2, 25) not in ev
+
+
+def test_year_rolls_over_from_december_to_january():
+    page = """<p>2026年12月31日から2日間</p><h3>下津井瀬戸</h3><table>
+    <tr><th>月日</th><th>転流時刻</th><th>最強時刻</th><th>流向</th><th>最強流速(kt)</th></tr>
+    <tr><td rowspan="2">12月31日</td><td>20:00</td><td>23:10</td><td>東流</td><td>2.0</td></tr>
+    <tr><td>02:30*</td><td>05:00*</td><td>西流</td><td>1.0</td></tr>
+    <tr><td>1月1日</td><td>08:00</td><td>11:00</td><td>東流</td><td>3.0</td></tr>
+    </table>"""
+    table = tidal_current.parse_page(page, "下津井")
+    assert table.minutes.tolist() == [jst(2026, 12, 31, 20, 0), jst(2026, 12, 31, 23, 10), jst(2027, 1, 1, 2, 30),
+                                      jst(2027, 1, 1, 5, 0), jst(2027, 1, 1, 8, 0), jst(2027, 1, 1, 11, 0)]
+    assert table.speed.tolist() == [0.0, 2.0, 0.0, -1.0, 0.0, 3.0]
+
+
+def test_unreadable_page_gives_none():
+    assert tidal_current.parse_page("<table><tr><td>x</td></tr></table>", "下津井") is None
+
+
+def test_hourly_interpolates_between_events(table):
+    slack, peak = jst(2026, 10, 16, 11, 56), jst(2026, 10, 16, 15, 14)
+    mid = (slack + peak) / 2
+    speed, is_slack, covered = table.lookup(np.array([slack, mid, peak]))
+    np.testing.assert_allclose(speed, [0.0, 3.7 / 2, 3.7])  # cos 曲線の中点は半分
+    assert is_slack.tolist() == [True, False, False]
+
+    speed, is_slack, covered = table.hourly([datetime.date(2026, 10, 16)], [12.0, 15.0 + 14 / 60])
+    np.testing.assert_allclose(speed[0], table.speed_at([slack + 4, peak]))
+    assert is_slack[0].tolist() == [True, False]
+    assert covered.all()
+
+    _, _, covered = table.hourly([datetime.date(2026, 10, 16), datetime.date(2026, 11, 30)], [3.0])
+    assert covered[:, 0].tolist() == [False, False]  # 最初の転流より前 / 表の後
@@ -0,0 +1,88 @@
+import datetime
+import json
+
+import numpy as np
+import pytest
+
+import tide_table
+
+YEAR = 2026
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tide") / "shimotsui")
+    tide_table.generate(YEAR, 1, path)
+    return tide_table.TideTable(path)
+
+
+def _minutes(dt):
+    return tide_table.to_minutes(dt)
+
+
+def test_round_trip_matches_build(table):
+    start = _minutes(datetime.datetime(YEAR, 1, 1))
+    assert table.start == start
+    assert len(table) == 365 * 1440
+    assert table.signature == tide_table._signature()
+    assert table.source == tide_table.CONSTANTS_SOURCE
+    fresh = tide_table.build(start + 200 * 1440, 1440)
+    np.testing.assert_array_equal(table.data[200 * 1440:201 * 1440], fresh)
+
+
+def test_lookup_levels_follow_prediction(table):
+    minutes = _minutes(datetime.datetime(YEAR, 6, 1)) + np.arange(0, 1440, 7)
+    level, _ = table.lookup(minutes)
+    np.testing.assert_allclose(level, tide_table.predict(minutes), atol=0.0006)  # mm に丸めて保存
+
+
+def test_hourly_at_hour_and_minute_resolution(table):
+    dates = [datetime.date(YEAR, 3, 1), datetime.date(YEAR, 10, 17)]
+    hours = np.array([5.0, 9.0, 15.0])
+    level, slack = table.hourly(dates, hours)
+    # 現地9時 = 0時UTC
+    minutes = np.array([[_minutes(datetime.datetime(d.year, d.month, d.day)) + (h - 9) * 60 for h in hours] for d in dates])
+    expect_level, expect_slack = table.lookup(minutes)
+    np.testing.assert_allclose(level, expect_level / table.norm)
+    np.testing.assert_array_equal(slack, expect_slack)
+
+    fine = 5 + np.arange(0, 120, 5) / 60.0
+    level, _ = table.hourly(dates[:1], fine)
+    base = _minutes(datetime.datetime(YEAR, 3, 1)) - 9 * 60
+    np.testing.assert_allclose(level[0] * table.norm, tide_table.predict(base + fine * 60), atol=0.0006)
+
+
+def test_slack_flags_surround_each_turn(table):
+    rec = table.data[:20 * 1440]
+    turns = np.nonzero(rec["flags"] & (tide_table.FLAG_HIGH | tide_table.FLAG_LOW))[0]
+    assert 60 < len(turns) < 90  # 1日に満干潮が約4回
+    slack = (rec["flags"] & tide_table.FLAG_SLACK) > 0
+    for t in turns[1:-1]:
+        assert slack[t - tide_table.SLACK_MINUTES + 1:t + tide_table.SLACK_MINUTES].all()
+    # 極値どうしの中ほどは転流ではない
+    for a, b in zip(turns[:-1], turns[1:]):
+        if b - a > 2 * tide_table.SLACK_MINUTES + 2:
+            assert not slack[(a + b) // 2]
+    # 満潮と干潮は交互
+    kinds = rec["flags"][turns] & tide_table.FLAG_HIGH
+    assert (kinds[1:] != kinds[:-1]).all()
+
+
+def test_outside_the_table_falls_back_to_prediction(table):
+    inside = _minutes(datetime.datetime(YEAR, 12, 31, 23, 0))
+    outside = _minutes(datetime.datetime(YEAR + 3, 5, 2, 6, 30))
+    level, slack = table.lookup(np.array([inside, outside, outside + 1440]))
+    day = tide_table.build(outside // 1440 * 1440, 1440)
+    assert level[1] == day["level"][outside % 1440] / 1000.0
+    assert slack[1] == bool(day["flags"][outside % 1440] & tide_table.FLAG_SLACK)
+    assert level[0] == table.data[-60]["level"] / 1000.0
+
+
+def test_load_constants(tmp_path):
+    path = tmp_path / "constants.json"
+    path.write_text(json.dumps({"source": "test", "msl": 1.2, "constituents": {"M2": [0.9, 10], "K1": [0.3, 200]}}))
+    constituents, msl, source = tide_table.load_constants(str(path))
+    assert constituents == {"M2": (0.9, 10.0), "K1": (0.3, 200.0)} and msl == 1.2 and source == "test"
+    path.write_text(json.dumps({"constituents": {"M2": [0.9, 10], "XX": [1, 0]}}))
+    with pytest.raises(ValueError):
+        tide_table.load_constants(str(path))
@@ -0,0 +1,217 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+import upstream
+
+
+def _breaker(probe, cooldown=0.0):
+    return upstream.CircuitBreaker("marine", failures=3, slow=1.0, cooldown=cooldown, probe=probe)
+
+
+def _wait_for_probe(breaker):
+    for t in threading.enumerate():
+        if t.name == f"breaker-{breaker.name}":
+            t.join(2)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = _breaker(lambda url: (None, True), cooldown=60.0)
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    breaker.record(True, 0.1)  # 成功で連続失敗数は戻る
+    assert breaker.state == upstream.CLOSED and breaker.consecutive == 0
+    breaker.record(False, 0.1)
+    breaker.record(True, 2.0)  # 遅すぎる応答も失敗に数える
+    assert breaker.state == upstream.CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == upstream.OPEN and breaker.trips == 1
+    assert breaker.allow("https://x/v1/marine") is False
+    assert breaker.allow("https://x/v1/marine") is False
+    assert breaker.state == upstream.OPEN  # クールダウン中は試行しない
+    assert breaker.short_circuits == 2
+
+
+def test_half_open_probe_closes_on_success():
+    started, release = threading.Event(), threading.Event()
+    probed = []
+
+    def probe(url):
+        probed.append(url)
+        started.set()
+        release.wait(2)
+        return b"{}", True
+
+    breaker = _breaker(probe)
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.allow("https://x/v1/marine?a") is False
+    assert started.wait(2)
+    assert breaker.state == upstream.HALF_OPEN
+    assert breaker.allow("https://x/v1/marine?b") is False  # 試行は1本だけ
+    release.set()
+    _wait_for_probe(breaker)
+    assert probed == ["https://x/v1/marine?a"]
+    assert breaker.state == upstream.CLOSED and breaker.consecutive == 0
+    assert breaker.allow("https://x/v1/marine") is True
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = _breaker(lambda url: (None, False))
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    breaker.allow("https://x/v1/marine")
+    _wait_for_probe(breaker)
+    assert breaker.state == upstream.OPEN and breaker.trips == 2
+
+
+def test_breakers_are_per_endpoint():
+    breakers = upstream.Breakers(failures=1, cooldown=60.0)
+    breakers.get("https://a/v1/marine").record(False, 0.1)
+    assert breakers.state("https://a/v1/marine?x=1") == upstream.OPEN
+    assert breakers.state("https://a/v1/forecast") == upstream.CLOSED
+    assert set(breakers.stats()) == {"marine", "forecast"}
+
+
+def test_fetch_body_reports_transport_errors(monkeypatch):
+    def fail(url, headers=None):
+        raise ConnectionResetError()
+
+    monkeypatch.setattr(upstream.POOL, "get", fail)
+    assert upstream._fetch_body("https://x/v1/marine") == (None, False)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ports = []
+
+    def do_GET(self):
+        _Handler.ports.append(self.client_address[1])
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body) if self.path != "/drip" else 100))
+        self.end_headers()
+        if self.path == "/drip":
+            # 1バイトずつ遅れて届く応答（受信1回ごとのタイムアウトには掛からない）
+            try:
+                for _ in range(100):
+                    self.wfile.write(b" ")
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except OSError:
+                pass  # 締め切りで切られた
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.ports = []
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_pool_reuses_keep_alive_connections(server):
+    pool = upstream.ConnectionPool(size=2, timeout=2.0)
+    for _ in range(3):
+        status, _, body = pool.get(f"{server}/v1/marine?x=1")
+        assert (status, body) == (200, b'{"ok": true}')
+    assert len(_Handler.ports) == 3 and len(set(_Handler.ports)) == 1
+    pool.close()
+
+
+def test_pool_enforces_a_total_deadline_per_request(server):
+    pool = upstream.ConnectionPool(timeout=1.0, deadline=0.3)
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.get(f"{server}/drip")
+    assert time.monotonic() - t0 < 1.0
+    pool.close()
+
+
+def test_fetch_many_returns_none_past_the_deadline():
+    release = threading.Event()
+
+    def fetcher(url):
+        if url == "slow":
+            release.wait(2)
+        return url.upper()
+
+    t0 = time.monotonic()
+    try:
+        assert upstream.fetch_many(fetcher, ["a", "slow", "b"], deadline=0.2) == ["A", None, "B"]
+        assert time.monotonic() - t0 < 1.0
+    finally:
+        release.set()
+
+
+def _concurrently(n, target):
+    results, errors = [None] * n, [None] * n
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def _wait_for_waiters(flight, n):
+    end = time.monotonic() + 2
+    while flight.stats()["leaders"] + flight.stats()["shared"] < n and time.monotonic() < end:
+        time.sleep(0.005)
+
+
+def test_single_flight_shares_one_call():
+    flight = upstream.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return {"v": 1}
+
+    threads, results, errors = _concurrently(8, lambda: flight.do("k", fn))
+    _wait_for_waiters(flight, 8)
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results) and results[0] == {"v": 1}
+    assert errors == [None] * 8
+    assert flight.stats() == {"leaders": 1, "shared": 7, "in_flight": 0}
+    assert flight.do("k", lambda: 2) == 2  # 終わった後は新しく実行する
+
+
+def test_single_flight_waiters_get_the_same_error():
+    flight = upstream.SingleFlight()
+    release = threading.Event()
+    error = ConnectionResetError("upstream")
+
+    def fn():
+        release.wait(2)
+        raise error
+
+    threads, results, errors = _concurrently(5, lambda: flight.do("k", fn))
+    _wait_for_waiters(flight, 5)
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert all(e is error for e in errors)
+    assert results == [None] * 5
+    assert flight.stats()["in_flight"] == 0
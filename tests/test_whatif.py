@@ -0,0 +1,40 @@
+import datetime
+
+import numpy as np
+
+import astronomy
+import fishing_windows
+import forecast_engine
+import spots
+import whatif
+
+DATES = [datetime.date(2026, 10, 17) + datetime.timedelta(days=i) for i in range(3)]
+
+
+def _inputs():
+    # 前日比 上昇・低下・横ばい の3日
+    temps = np.stack([np.r_[np.full(24, a), np.full(24, b)] for a, b in ((18.0, 18.8), (19.0, 18.2), (18.5, 18.5))])
+    temps[:, 24:] += np.linspace(0, 0.3, 24)
+    clouds = np.tile(np.linspace(0, 90, 24), (3, 1))
+    winds = np.tile(np.linspace(1, 9, 24), (3, 1))
+    rains = np.zeros((3, 24))
+    mages = astronomy.moon_age(DATES).tolist()
+    spot = spots.DEFAULT_SPOT
+    sun_h = astronomy.sunrise_hour(DATES, spot.lat, spot.lon)
+    return (temps, clouds, winds, rains, mages, sun_h, [18.0] * 3), astronomy.sunrise_minutes(DATES, spot.lat, spot.lon)
+
+
+def test_custom_weights_match_forecast():
+    args, sun_min = _inputs()
+    base = forecast_engine.forecast(*args)
+    assert sorted(base.trend_code.tolist()) == [0, 1, 2]
+    custom = forecast_engine.WEIGHTS._replace(trend_rise=35, trend_drop=-5, slack=10, wind_light=0)
+    expected = forecast_engine.forecast(*args, weights=custom)
+
+    minutes = fishing_windows.minute_grid()
+    sc = whatif.Scenario(DATES, np.asarray(args[4]), base, args[5], sun_min, None, minutes, None,
+                         fishing_windows.STEP_MINUTES)
+    result = whatif.evaluate(sc, [forecast_engine.WEIGHTS, custom])
+    np.testing.assert_array_equal(result.scores[0], base.score)
+    np.testing.assert_array_equal(result.scores[1], expected.score)
+    np.testing.assert_array_equal(expected.trend_score, forecast_engine.trend_points(base.trend_code, custom))
@@ -0,0 +1,343 @@
+"""
+魔釣 潮流予測の取り込み（海上保安庁 備讃瀬戸の潮流情報）
+
+海保のページ（転流時刻・最強時刻・流向・流速の表）を解析し、潮流イベントを時刻順に並べた
+索引 (CurrentTable) にする。時刻からの参照は二分探索 (O(log n)) で、スコアの転流・潮の動き加点に使う。
+
+- ページ本文の digest が前回と同じなら解析し直さない (Ingest)
+- 取得は forecast_data.fetch_currents（永続キャッシュ・遮断器経由、REFRESH 秒に1回まで）。
+  取り直しは先読み (prefetch) が受け持ち、スコア計算は latest() で取り込み済みの表を引くだけ。
+  MATSURI_KAIHO_URL に保存したページのパスを渡すと、その場で読む（オフラインの計測・確認用）
+- 表の見出し（転流・最強・流向・流速）で列を探すので、列の並びが変わっても読める。
+  読めなければ空の扱いになり、潮汐表（tide_table）の推算だけで計算する
+- 表の範囲外の時刻は covered=False（呼び出し側で潮汐表の値を使う）
+
+    python tidal_current.py bench/fixtures/kaiho_currenttide.html   # 解析結果の確認
+"""
+import argparse
+import datetime
+import hashlib
+import html.parser
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+import telemetry
+import tide_table
+
+PAGE_URL = "https://www6.kaiho.mlit.go.jp/bisan/currenttide.html"
+
+# --- 設定（環境変数で上書き可） ---
+SOURCE = os.environ.get("MATSURI_KAIHO_URL", PAGE_URL)
+STATION = os.environ.get("MATSURI_KAIHO_STATION", "下津井")  # 見出しにこの文字を含む表を使う（空なら最初の表）
+REFRESH = float(os.environ.get("MATSURI_KAIHO_REFRESH", 3600))  # ページを取り直す最短の間隔[s]
+
+SLACK_MINUTES = tide_table.SLACK_MINUTES  # 転流時刻の前後この分数を転流とみなす（潮汐表と同じ幅）
+MOVING_KNOTS = 1.5                        # これ以上の流速を「潮が動いている」とみなす[kt]
+TZ_HOURS = 9
+
+_EPOCH = datetime.date(1970, 1, 1)
+_YEAR = re.compile(r"(\d{4})\s*年")
+_DATE = re.compile(r"(\d{1,2})\s*[月/]\s*(\d{1,2})")
+_TIME = re.compile(r"(\d{1,2})\s*[:：]\s*(\d{2})")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+# 見出しの語 → 列の種類（「最強流速」が流速になるよう、流速を先に見る）
+_HEADERS = (
+    ("speed", ("流速", "kt", "ノット")),
+    ("max", ("最強",)),
+    ("slack", ("転流",)),
+    ("direction", ("流向", "方向")),
+    ("date", ("月日", "日付")),
+)
+# 流向 → 符号（備讃瀬戸は東西の流れ。東流を +）
+_DIRECTIONS = (("東", 1.0), ("E", 1.0), ("北", 1.0), ("西", -1.0), ("W", -1.0), ("南", -1.0))
+
+
+class CurrentTable:
+    """潮流イベント（転流=流速0・最強=符号付き流速[kt]）を時刻順に並べた索引"""
+
+    def __init__(self, minutes, speed, digest="", title=""):
+        order = np.argsort(np.asarray(minutes, dtype=np.int64), kind="stable")
+        self.minutes = np.asarray(minutes, dtype=np.int64)[order]   # 1970年UTCからの経過分
+        self.speed = np.asarray(speed, dtype=float)[order]
+        self.slack_minutes = self.minutes[self.speed == 0]
+        self.digest = digest
+        self.title = title
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def covers(self, minutes):
+        """表の最初と最後のイベントの間か"""
+        m = np.asarray(minutes)
+        return (m >= self.minutes[0]) & (m <= self.minutes[-1])
+
+    def speed_at(self, minutes):
+        """符号付き流速[kt]。前後のイベントの間を cos 曲線でなめらかにつなぐ"""
+        m = np.asarray(minutes, dtype=float)
+        i = np.clip(np.searchsorted(self.minutes, m, side="right"), 1, len(self.minutes) - 1)
+        t0, t1 = self.minutes[i - 1], self.minutes[i]
+        v0, v1 = self.speed[i - 1], self.speed[i]
+        f = np.clip((m - t0) / np.maximum(t1 - t0, 1), 0.0, 1.0)
+        return v0 + (v1 - v0) * (1 - np.cos(np.pi * f)) / 2
+
+    def slack_at(self, minutes, window=SLACK_MINUTES):
+        """最寄りの転流時刻まで window 分未満か"""
+        m = np.asarray(minutes, dtype=float)
+        s = self.slack_minutes
+        if not len(s):
+            return np.zeros(m.shape, dtype=bool)
+        i = np.searchsorted(s, m)
+        prev_s = s[np.clip(i - 1, 0, len(s) - 1)]
+        next_s = s[np.clip(i, 0, len(s) - 1)]
+        return np.minimum(np.abs(m - prev_s), np.abs(next_s - m)) < window
+
+    def lookup(self, minutes):
+        """(符号付き流速, 転流, 表の範囲内か) を返す。minutes は 1970年UTCからの経過分（配列可）"""
+        return self.speed_at(minutes), self.slack_at(minutes), self.covers(minutes)
+
+    def hourly(self, dates, hours, tz_hours=TZ_HOURS):
+        """日付 (D,) × 現地時刻 hours (H,) の (流速, 転流, 範囲内か) を (D, H) で。TideTable.hourly と同じ引き方"""
+        days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+        minutes = days[:, None] * 1440 + (np.asarray(hours, dtype=float)[None, :] - tz_hours) * 60
+        return self.lookup(minutes)
+
+    def stats(self):
+        if not len(self):
+            return {"events": 0}
+        first, last = (datetime.datetime(1970, 1, 1) + datetime.timedelta(minutes=int(m) + TZ_HOURS * 60)
+                       for m in (self.minutes[0], self.minutes[-1]))
+        return {"title": self.title, "events": len(self), "slacks": len(self.slack_minutes),
+                "first": first.isoformat(timespec="minutes"), "last": last.isoformat(timespec="minutes")}
+
+
+class _Tables(html.parser.HTMLParser):
+    """ページ内の表を [見出し, 行のリスト] で集める。見出しは caption か直前の h1〜h4"""
+
+    _TEXT_TAGS = ("h1", "h2", "h3", "h4", "caption", "td", "th")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables = []
+        self._heading = ""
+        self._tag = None
+        self._text = None
+        self._row = None
+
+    def _flush(self):
+        if self._text is None:
+            return
+        text = " ".join("".join(self._text).split())
+        tag, self._tag, self._text = self._tag, None, None
+        if tag in ("td", "th"):
+            if self._row is not None:
+                self._row.append(text)
+        elif tag == "caption":
+            if self.tables:
+                self.tables[-1][0] = text
+        else:
+            self._heading = text
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._TEXT_TAGS:
+            self._flush()  # 閉じタグを省いたセルもここで区切る
+            self._tag, self._text = tag, []
+        elif tag == "br" and self._text is not None:
+            self._text.append(" ")
+        elif tag == "table":
+            self._flush()
+            self.tables.append([self._heading, []])
+        elif tag == "tr":
+            self._flush()
+            self._end_row()
+            self._row = []
+
+    def handle_endtag(self, tag):
+        if tag == self._tag:
+            self._flush()
+        elif tag in ("tr", "table"):
+            self._flush()
+            self._end_row()
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def _end_row(self):
+        if self._row and self.tables:
+            self.tables[-1][1].append(self._row)
+        self._row = None
+
+
+def _columns(header):
+    cols = {}
+    for i, name in enumerate(header):
+        for key, words in _HEADERS:
+            if any(w in name for w in words):
+                cols.setdefault(key, i)
+                break
+    return cols
+
+
+def _clock(text):
+    """"HH:MM" → 0時からの分。「*」「翌」付きは翌日の時刻"""
+    m = _TIME.search(text or "")
+    if m is None:
+        return None
+    return int(m.group(1)) * 60 + int(m.group(2)) + (1440 if "*" in text or "翌" in text else 0)
+
+
+def _sign(text):
+    for word, sign in _DIRECTIONS:
+        if word in (text or ""):
+            return sign
+    return None
+
+
+def _events(rows, year):
+    """1つの表の行から (経過分, 符号付き流速) のリスト。見出し行が無ければ空"""
+    header = next((r for r in rows if any("転流" in c for c in r)), None)
+    if header is None:
+        return []
+    cols = _columns(header)
+    out = []
+    day = None
+    last_month = None
+    for row in rows[rows.index(header) + 1:]:
+        # rowspan で日付のセルが省かれた行は右に寄せて列を合わせる
+        shift = len(header) - len(row)
+        cell = lambda key: row[cols[key] - shift] if key in cols and cols[key] - shift >= 0 else None
+        m = _DATE.search(cell("date") or "")
+        if m:
+            month, dom = int(m.group(1)), int(m.group(2))
+            if last_month is not None and month < last_month:
+                year += 1  # 12月 → 1月
+            last_month = month
+            try:
+                day = datetime.date(year, month, dom)
+            except ValueError:
+                day = None
+        if day is None:
+            continue
+        base = (day - _EPOCH).days * 1440 - TZ_HOURS * 60
+        slack = _clock(cell("slack"))
+        if slack is not None:
+            out.append((base + slack, 0.0))
+        peak = _clock(cell("max"))
+        number = _NUMBER.search(cell("speed") or "")
+        sign = _sign(cell("direction")) or _sign(cell("speed"))
+        if peak is not None and number and sign:
+            out.append((base + peak, sign * float(number.group())))
+    return out
+
+
+def parse_page(text, station=STATION, digest="", today=None):
+    """
+    潮流情報ページの HTML → CurrentTable。station を見出しに含む表（空なら最初に読めた表）を使う。
+    年はページ中の「YYYY年」（無ければ today の年）。読めなければ None
+    """
+    parser = _Tables()
+    parser.feed(text)
+    parser.close()
+    m = _YEAR.search(text)
+    year = int(m.group(1)) if m else (today or datetime.date.today()).year
+    for title, rows in parser.tables:
+        if station and station not in title:
+            continue
+        events = _events(rows, year)
+        if len(events) >= 2:
+            minutes, speed = zip(*events)
+            return CurrentTable(minutes, speed, digest, title)
+    return None
+
+
+def is_local(source):
+    """URL ではなく保存したページのパスか"""
+    return not source.startswith(("http://", "https://"))
+
+
+def read_local(path):
+    if path.startswith("file://"):
+        path = path[len("file://"):]
+    try:
+        with open(path, "rb") as f:
+            body = f.read()
+    except OSError:
+        return None
+    try:
+        return body.decode()
+    except UnicodeDecodeError:
+        return body.decode("cp932", errors="replace")
+
+
+class Ingest:
+    """最後に取り込んだページの digest と解析結果。本文が変わったときだけ解析し直す"""
+
+    def __init__(self, station=STATION):
+        self.station = station
+        self.digest = None
+        self.table = None
+        self.parses = 0
+        self.unchanged = 0
+        self.checked = None   # 最後に取りに行った時刻 (monotonic)
+        self._lock = threading.Lock()
+
+    def claim(self, max_age=REFRESH):
+        """前回の取得から max_age 秒以上たっていれば、取りに行く番を取って True（同時に呼ばれても1つだけ）"""
+        now = time.monotonic()
+        with self._lock:
+            if self.checked is not None and now - self.checked < max_age:
+                return False
+            self.checked = now
+            return True
+
+    def update(self, text):
+        """ページ本文を取り込んで最新の CurrentTable を返す。text が None（取得失敗）なら前回の表のまま"""
+        if not text:
+            return self.table
+        digest = hashlib.blake2b(text.encode(), digest_size=12).hexdigest()
+        with self._lock:
+            if digest == self.digest:
+                self.unchanged += 1
+                telemetry.annotate(currents="unchanged")
+                return self.table
+        with telemetry.span("currents_parse", bytes=len(text)):
+            table = parse_page(text, self.station, digest)
+        with self._lock:
+            self.digest, self.table = digest, table
+            self.parses += 1
+        return table
+
+    def stats(self):
+        with self._lock:
+            table = self.table
+            out = {"digest": self.digest, "parses": self.parses, "unchanged": self.unchanged,
+                   "checked_ago": None if self.checked is None else round(time.monotonic() - self.checked)}
+        out.update(table.stats() if table is not None else {"events": 0})
+        return out
+
+
+INGEST = Ingest()
+
+
+def latest():
+    """最後に取り込んだ潮流表（無ければ None）。通信しない"""
+    return INGEST.table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="潮流情報ページを解析して転流・最強時刻を表示する")
+    parser.add_argument("path", help="保存したページ (HTML)")
+    parser.add_argument("--station", default=STATION)
+    args = parser.parse_args()
+    table = parse_page(read_local(args.path) or "", args.station)
+    if table is None:
+        raise SystemExit("潮流の表が見つかりません")
+    print(table.title)
+    for m, v in zip(table.minutes.tolist(), table.speed.tolist()):
+        t = datetime.datetime(1970, 1, 1) + datetime.timedelta(minutes=m + TZ_HOURS * 60)
+        print(f"{t:%Y-%m-%d %H:%M}  {'転流' if v == 0 else f'最強 {v:+.1f}kt'}")
@@ -0,0 +1,358 @@
+"""
+魔釣 上流API取得レイヤー
+
+- ホストごとに keep-alive 接続をプールして再利用（SSLコンテキストはプロセスで1つ）
+- 1リクエストごとのソケットタイムアウトと締め切り（接続〜本文の受信まで）、複数リクエスト全体の締め切り
+- 独立したリクエスト（海洋API / 気象API）はスレッドプールで並列に発行
+- 同じURLへの同時リクエストは1本にまとめる（single-flight）
+- エンドポイント（海洋API / 気象API）ごとの遮断器。失敗や遅延が続いたら一定時間は
+  取りに行かずに即 None を返し（呼び出し側はキャッシュ・平年値で代替）、裏で1本だけ試して復旧を確かめる
+"""
+import concurrent.futures
+import contextvars
+import gzip
+import http.client
+import json
+import os
+import queue
+import ssl
+import threading
+import time
+import urllib.parse
+import zlib
+
+import telemetry
+
+# --- 設定 ---
+REQUEST_TIMEOUT = 8.0   # 1リクエストあたり（接続・受信の各操作）
+REQUEST_DEADLINE = 10.0  # 1リクエスト全体（少しずつ届く応答でも、これを過ぎたら打ち切る）
+TOTAL_DEADLINE = 12.0   # fetch_many 全体
+POOL_SIZE = 4           # ホストあたりの保持接続数
+USER_AGENT = 'Mozilla/5.0 (App; CPU iPhone OS 15_0)'
+
+# 遮断器（環境変数で上書き可）
+BREAKER_FAILURES = int(os.environ.get("MATSURI_BREAKER_FAILURES", 3))       # 連続失敗でオープン
+BREAKER_SLOW = float(os.environ.get("MATSURI_BREAKER_SLOW", 5.0))           # これより遅い応答は失敗に数える[秒]
+BREAKER_COOLDOWN = float(os.environ.get("MATSURI_BREAKER_COOLDOWN", 30.0))  # オープンしてから試行までの秒数
+
+# 従来の make_request と同じ設定のSSLコンテキストを使い回す
+SSL_CONTEXT = ssl.create_default_context()
+SSL_CONTEXT.check_hostname = False
+SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+
+# 通信・応答の不良として扱う例外（それ以外はバグなので握りつぶさずに上げる）。
+# gzip の壊れた本文は OSError 以外に EOFError / zlib.error でも来る
+FETCH_ERRORS = (OSError, http.client.HTTPException, ValueError, EOFError, zlib.error)
+
+
+class ConnectionPool:
+    """(scheme, host) ごとのアイドル接続プール"""
+
+    def __init__(self, size=POOL_SIZE, timeout=REQUEST_TIMEOUT, deadline=REQUEST_DEADLINE):
+        self.size = size
+        self.timeout = timeout
+        self.deadline = deadline
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, key):
+        with self._lock:
+            return self._idle.setdefault(key, queue.LifoQueue(self.size))
+
+    def _acquire(self, key):
+        try:
+            return self._queue(key).get_nowait(), True
+        except queue.Empty:
+            scheme, host = key
+            if scheme == "https":
+                return http.client.HTTPSConnection(host, timeout=self.timeout, context=SSL_CONTEXT), False
+            return http.client.HTTPConnection(host, timeout=self.timeout), False
+
+    def _release(self, key, conn):
+        try:
+            self._queue(key).put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _remaining(self, end):
+        """締め切りまでの秒数（ソケット操作1回ぶんの上限 timeout も超えない）。過ぎていれば TimeoutError"""
+        left = end - time.monotonic()
+        if left <= 0:
+            raise TimeoutError(f"request deadline {self.deadline}s exceeded")
+        return min(self.timeout, left)
+
+    def _read(self, res, sock, end):
+        # ソケットのタイムアウトは受信1回ごとなので、締め切りまでの残りを毎回かけ直す
+        chunks = []
+        while True:
+            sock.settimeout(self._remaining(end))
+            chunk = res.read1(65536)
+            if not chunk:
+                res.close()  # read1 は Content-Length ぶん読み終えても閉じないので、接続を再利用できるよう閉じる
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def get(self, url, headers=None):
+        """
+        GET して (status, headers, body) を返す。切れていた再利用接続は1回だけ張り直す。
+        接続から本文の受信までが deadline 秒を超えたら TimeoutError
+        """
+        end = time.monotonic() + self.deadline
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.timeout = self._remaining(end)  # 新しい接続の connect に使われる
+                if conn.sock is not None:
+                    conn.sock.settimeout(conn.timeout)
+                conn.request("GET", path, headers=headers or {})
+                sock = conn.sock  # will_close の応答では getresponse が conn.sock を外すので先に持っておく
+                sock.settimeout(self._remaining(end))
+                res = conn.getresponse()
+                body = self._read(res, sock, end)
+            except TimeoutError:
+                conn.close()
+                raise
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            if res.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return res.status, res.headers, body
+
+    def close(self):
+        with self._lock:
+            queues, self._idle = list(self._idle.values()), {}
+        for q in queues:
+            while not q.empty():
+                q.get_nowait().close()
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    同じキーの処理が実行中なら、後から来た呼び出しはその完了を待って同じ結果を受け取る。
+    TTL切れ直後に複数セッションが一斉に同じ日付を取りに行く「サンダリングハード」対策
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0   # 実際に実行した回数
+        self.shared = 0    # 相乗りで節約できた回数
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+        telemetry.annotate(single_flight="leader" if leader else "shared")
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def endpoint(url):
+    """遮断器・計測の単位になるエンドポイント名（/v1/marine → marine）"""
+    return urllib.parse.urlsplit(url).path.rsplit("/", 1)[-1]
+
+
+class CircuitBreaker:
+    """
+    1エンドポイントの遮断器。失敗（通信エラー・5xx・BREAKER_SLOW 秒超）が failures 回続くとオープンし、
+    cooldown 秒のあいだ allow() は False を返す。期限後に最初に来たURLで裏で1本だけ試し (half_open)、
+    成功すればクローズ、失敗すれば再びオープン
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, slow=BREAKER_SLOW, cooldown=BREAKER_COOLDOWN, probe=None):
+        self.name = name
+        self.failures = failures
+        self.slow = slow
+        self.cooldown = cooldown
+        self.probe = probe or _fetch_body
+        self.state = CLOSED
+        self.consecutive = 0
+        self.trips = 0
+        self.short_circuits = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self, url):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            self.short_circuits += 1
+            start = self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown
+            if start:
+                self.state = HALF_OPEN
+        if start:
+            threading.Thread(target=self._probe, args=(url,), name=f"breaker-{self.name}", daemon=True).start()
+        return False
+
+    def _probe(self, url):
+        t0 = time.monotonic()
+        _, healthy = self.probe(url)
+        self.record(healthy, time.monotonic() - t0)
+
+    def record(self, healthy, elapsed):
+        with self._lock:
+            if healthy and elapsed <= self.slow:
+                self.state = CLOSED
+                self.consecutive = 0
+                return
+            self.consecutive += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive >= self.failures):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive, "trips": self.trips,
+                    "short_circuits": self.short_circuits,
+                    "open_for": None if self.state == CLOSED else round(time.monotonic() - self.opened_at, 1)}
+
+
+class Breakers:
+    """エンドポイントごとの CircuitBreaker（初めて見たエンドポイントはその場で作る）"""
+
+    def __init__(self, **options):
+        self.options = options
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        name = endpoint(url)
+        with self._lock:
+            breaker = self._items.get(name)
+            if breaker is None:
+                breaker = self._items[name] = CircuitBreaker(name, **self.options)
+            return breaker
+
+    def state(self, url):
+        return self.get(url).state
+
+    def stats(self):
+        with self._lock:
+            items = list(self._items.values())
+        return {b.name: b.stats() for b in items}
+
+
+POOL = ConnectionPool()
+SINGLE_FLIGHT = SingleFlight()
+BREAKERS = Breakers()
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="upstream")
+
+
+def _fetch_body(url):
+    """(本文 bytes, エンドポイントが正常か)。4xx は要求側の問題なので正常に数える"""
+    try:
+        status, headers, body = POOL.get(url, {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"})
+        telemetry.annotate(status=status, bytes=len(body))
+        if status != 200:
+            return None, status < 500
+        if headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body, True
+    except FETCH_ERRORS as e:
+        telemetry.annotate(error=type(e).__name__)
+        return None, False
+
+
+def _fetch_json(url):
+    body, healthy = _fetch_body(url)
+    if body is None:
+        return None, healthy
+    try:
+        return json.loads(body.decode()), True
+    except ValueError:
+        return None, False
+
+
+def _fetch_text(url):
+    # 海保など国内のページは Shift_JIS のことがあるので、UTF-8 で読めなければ cp932 で読む
+    body, healthy = _fetch_body(url)
+    if body is None:
+        return None, healthy
+    try:
+        return body.decode(), True
+    except UnicodeDecodeError:
+        return body.decode("cp932", errors="replace"), True
+
+
+def _guarded(url, fetch):
+    breaker = BREAKERS.get(url)
+    if not breaker.allow(url):
+        telemetry.annotate(breaker=breaker.state)
+        return None
+    t0 = time.monotonic()
+    value, healthy = fetch(url)
+    breaker.record(healthy, time.monotonic() - t0)
+    return value
+
+
+def fetch_json(url):
+    """URLからJSONを取得。失敗時・遮断中は None（従来の make_request と同じ扱い）"""
+    return _guarded(url, _fetch_json)
+
+
+def fetch_text(url):
+    """URLからHTMLなどの文字列を取得。失敗時・遮断中は None"""
+    return _guarded(url, _fetch_text)
+
+
+def fetch_many(fetcher, urls, deadline=TOTAL_DEADLINE):
+    """
+    fetcher(url) を並列に実行し、URLと同じ順序で結果を返す。
+    締め切りまでに終わらなかったものは None
+    """
+    # 計測の run/span を引き継ぐため、呼び出し元のコンテキストをURLごとに複製して実行
+    futures = [_EXECUTOR.submit(contextvars.copy_context().run, fetcher, url) for url in urls]
+    end = time.monotonic() + deadline
+    results = []
+    for f in futures:
+        try:
+            results.append(f.result(timeout=max(0.0, end - time.monotonic())))
+        except (concurrent.futures.TimeoutError,) + FETCH_ERRORS as e:
+            telemetry.annotate(error=type(e).__name__)
+            results.append(None)
+    return results
@@ -0,0 +1,166 @@
+"""
+魔釣 what-if（スコアの重みの感度）
+
+forecast_engine.Weights の重み（基礎点・日の出・転流・風の区分・低水温の倍率など）を変えた組を
+いくつも並べ、同じ日（または期間）のデータで1回の配列演算にまとめて採点し直す。
+重みの組は日の次元に並べて (組数×日数, H) にし、重みは各行の (N, 1) の列として
+score_hours に渡す（ポイント比較で地点を日の次元に並べるのと同じ）。
+組ごとの時間別スコア・ベスト時間帯（分単位）・戦術（strategy_rules の決定表）を返す。
+
+入力は取得・スコア済みの Forecast から作る（通信しない）ので、画面の操作ごとに呼んでも軽い。
+
+    python whatif.py --date 2026-10-17 --sweep slack=0,20,40,60
+    python whatif.py --date 2026-10-17 --days 7 --sweep sunrise --sweep wind_light=10,20
+"""
+import argparse
+import collections
+import datetime
+import itertools
+
+import numpy as np
+
+import astronomy
+import fishing_windows
+import forecast_data
+import forecast_engine
+import spots
+import strategy_rules
+import telemetry
+
+LABELS = collections.OrderedDict((
+    ("base", "基礎点"), ("sunrise", "日の出"), ("slack", "転流"), ("tide_change", "潮の動き"),
+    ("temp_rise", "水温上昇"), ("temp_drop", "水温低下"), ("trend_drop", "前日比↓"), ("trend_rise", "前日比↑"),
+    ("rain", "雨"), ("cloudy", "曇り"), ("sunny", "快晴"),
+    ("wind_calm", "無風 (2m/s未満)"), ("wind_light", "風 2〜5m/s"), ("wind_moderate", "風 5〜7m/s"),
+    ("wind_strong", "風 7〜10m/s"), ("low_temp", "低水温の倍率"), ("very_low_temp", "激渋の倍率"),
+))
+MULTIPLIERS = ("low_temp", "very_low_temp")
+MAIN = ("base", "sunrise", "slack", "tide_change", "temp_rise", "wind_light")  # 画面でスライダーを出す項目
+
+Scenario = collections.namedtuple("Scenario", "dates moon_ages fc sun_h sun_min tide minutes fine_tide step")
+Result = collections.namedtuple("Result", "weights scores windows codes")
+
+
+def slider_range(name):
+    """(最小, 最大, 刻み)"""
+    return (0.0, 1.0, 0.1) if name in MULTIPLIERS else (-50, 100, 5)
+
+
+def sweep_values(name, base=forecast_engine.WEIGHTS):
+    """感度を見るときの候補値（base の値を含む）"""
+    value = getattr(base, name)
+    if name in MULTIPLIERS:
+        values = [round(float(v), 1) for v in np.linspace(0.0, 1.0, 6)] + [value]
+    else:
+        values = [value + d for d in range(-30, 31, 10)]
+    return sorted(dict.fromkeys(values))
+
+
+def grid(base=forecast_engine.WEIGHTS, **axes):
+    """base の一部の項目を axes の候補値の全組み合わせで置き換えた重みのリスト"""
+    names = list(axes)
+    return [base._replace(**dict(zip(names, values))) for values in itertools.product(*axes.values())]
+
+
+def sweep(name, values=None, base=forecast_engine.WEIGHTS):
+    """1項目だけ動かした重みのリスト"""
+    return grid(base, **{name: sweep_values(name, base) if values is None else values})
+
+
+def stack(weight_sets, n_days):
+    """重みの組 P 個を、組ごとに日数ぶん繰り返した (P*D, 1) の列にする"""
+    return forecast_engine.Weights._make(
+        np.repeat(np.asarray(col, dtype=float), n_days)[:, None] for col in zip(*weight_sets)
+    )
+
+
+def _tile(a, p):
+    a = np.asarray(a)
+    return np.tile(a, (p,) + (1,) * (a.ndim - 1))
+
+
+def scenario(dates, moon_ages, fc, spot=None, step=fishing_windows.STEP_MINUTES):
+    """スコア済みの D日分 (Forecast (D, H)) から入力を作る。潮・日の出はここで一度だけ引く"""
+    spot = spot or spots.DEFAULT_SPOT
+    minutes = fishing_windows.minute_grid(step)
+    return Scenario(
+        list(dates), np.asarray(moon_ages, dtype=float), fc,
+        astronomy.sunrise_hour(dates, spot.lat, spot.lon), astronomy.sunrise_minutes(dates, spot.lat, spot.lon),
+        forecast_data.tide_inputs(dates, spot.tide_offset), minutes,
+        forecast_data.tide_inputs(dates, spot.tide_offset, minutes / 60.0), step,
+    )
+
+
+def for_day(day, step=fishing_windows.STEP_MINUTES):
+    """pipeline.run_day の結果（日次元のない Forecast）から"""
+    fc = forecast_engine.Forecast._make(np.asarray(f)[None] for f in day.fc)
+    return scenario([day.date], [day.moon_age], fc, day.spot, step)
+
+
+def evaluate(sc, weight_sets, length=fishing_windows.WINDOW_MINUTES, k=1):
+    """
+    重みの組ごとに採点し直す。scores は (P, D, H)、windows は組ごとのベスト時間帯（全日通しての上位 k）、
+    codes は strategy_rules のコード (P, D, H)
+    """
+    p, d = len(weight_sets), len(sc.dates)
+    w = stack(weight_sets, d)
+    fc = sc.fc
+    tile = lambda a: _tile(a, p)
+    tide = None if sc.tide is None else tuple(tile(a) for a in sc.tide)
+    fine_tide = None if sc.fine_tide is None else tuple(tile(a) for a in sc.fine_tide)
+    trend = forecast_engine.trend_points(tile(fc.trend_code), w)
+    moon, temp, tdiff = tile(sc.moon_ages), tile(fc.temp), tile(fc.tdiff)
+
+    with telemetry.span("whatif", sets=p, days=d):
+        # 平年値の定数で埋めた日は tdiff が 0 なので、水温の時間差の判定は tdiff に任せてよい
+        hourly, _, slack, _, _, _ = forecast_engine.score_hours(
+            forecast_engine.HOURS, moon, tile(sc.sun_h), temp, tdiff, tile(fc.cloud), tile(fc.wind), tile(fc.rain),
+            np.zeros(p * d, dtype=bool), trend, tide, weights=w,
+        )
+        month = tile([dt.month for dt in sc.dates])[:, None]
+        codes = strategy_rules.evaluate(forecast_engine.HOURS, tile(sc.sun_h)[:, None], hourly, tdiff, month,
+                                        temp, tile(fc.cloud), tile(fc.rain), slack)
+
+        fine_fc = forecast_engine.Forecast._make(tile(f) for f in fc)._replace(trend_score=trend)
+        fine, fine_slack, sunrise = fishing_windows.fine_scores(fine_fc, moon, tile(sc.sun_min), sc.minutes, fine_tide, w)
+        n = fishing_windows.window_count(length, sc.step, sc.minutes)
+        means, ranked = fishing_windows.rank(fine, fine_slack, sunrise, n)
+        windows = []
+        for i in range(p):
+            rows = slice(i * d, (i + 1) * d)
+            picks = fishing_windows.top_windows(ranked[rows], n, k)
+            windows.append(fishing_windows.to_windows(sc.dates, sc.minutes, sc.step, n, picks,
+                                                      fine[rows], fine_slack[rows], sunrise[rows], means[rows]))
+
+    shape = (p, d, len(forecast_engine.HOURS))
+    return Result(list(weight_sets), hourly.reshape(shape), windows, {name: v.reshape(shape) for name, v in codes.items()})
+
+
+def _parse_sweep(text, base):
+    name, _, values = text.partition("=")
+    if name not in LABELS:
+        raise SystemExit(f"不明な項目: {name}（{', '.join(LABELS)}）")
+    cast = float if name in MULTIPLIERS else int
+    return name, [cast(v) for v in values.split(",")] if values else sweep_values(name, base)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="スコアの重みを変えた組をまとめて採点し直す")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=datetime.date.today() + datetime.timedelta(days=1))
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--sweep", action="append", default=[], help="項目=値,値,...（値を省くと既定の振り幅）")
+    parser.add_argument("--length", type=int, default=fishing_windows.WINDOW_MINUTES, help="時間帯の長さ（分）")
+    args = parser.parse_args()
+
+    base = forecast_engine.WEIGHTS
+    axes = dict(_parse_sweep(s, base) for s in args.sweep or ["slack"])
+    sets = grid(base, **axes)
+    forecast_data.fetch_currents()
+    dates, mages, fc = forecast_data.forecast_range(args.date, args.days)
+    result = evaluate(scenario(dates, mages, fc), sets, args.length)
+    print(f"{dates[0]}〜{dates[-1]}  時間別は {dates[0]} の {forecast_engine.START_HOUR}〜{forecast_engine.END_HOUR}時")
+    for weights, scores, windows in zip(result.weights, result.scores, result.windows):
+        label = " ".join(f"{LABELS[name]}={getattr(weights, name):g}" for name in axes)
+        best = (f"{windows[0].date:%m/%d} {astronomy.sunrise_label(windows[0].start)}〜"
+                f"{astronomy.sunrise_label(windows[0].end)} 平均{windows[0].score:.0f}") if windows else "-"
+        print(f"{label:<24} {best:<28} {' '.join(f'{s:3d}' for s in scores[0])}")